@@ -0,0 +1,129 @@
+from hydragame import (
+    GameState, get_hero_combat_power, apply,
+    Build, Recruit, Train, Quest, Battle, EndDay,
+)
+# Balance tables are read through the module (hydragame.BUILDING_INFO etc.)
+# so sweeps can swap them out at runtime.
+import hydragame
+
+"""
+AUTOPLAY
+--------
+
+A fixed, scripted policy that plays a whole game of SLAY THE HYDRA through
+the command API (hydragame.apply), with no prompts at all. The balance
+sweeps use it to replay thousands of games, so it's deliberately simple
+and deterministic (apart from the game's own dice rolls):
+
+1. Buy the next building in BUILD_ORDER whenever it's affordable.
+2. Recruit Rogue and Mage as soon as there's a free Town Center slot.
+3. Level up anyone with enough XP, putting the skill point in their
+   lowest-ranked skill.
+4. Spend every quest on the next Hydra prerequisite, or send the least
+   experienced hero gathering.
+5. Fight the Hydra once the team is strong enough.
+"""
+
+# (building, level to reach), bought strictly in this order
+BUILD_ORDER = [
+    ("Farm", 1),
+    ("Barracks", 1),
+    ("Arcane Tower", 1),
+    ("Town Center", 2),
+    ("Farm", 2),
+    ("Trading Hall", 1),
+    ("Town Center", 3),
+    ("Blacksmith", 1),
+    ("Blacksmith", 2),
+    ("Trading Hall", 2),
+    ("Farm", 3),
+    ("Trading Hall", 3),
+]
+
+# Don't bother fighting with less than this much total power
+BATTLE_POWER = 185
+
+# Give up on a game that hasn't killed the Hydra by this day
+MAX_DAYS = 400
+
+def can_afford(state, bld_name):
+    level = state.buildings[bld_name]
+    if level >= hydragame.BUILDING_INFO[bld_name]["max_level"]:
+        return False
+    gold, food, arcane = hydragame.BUILDING_INFO[bld_name]["upgrade_costs"][level]
+    resources = state.resources
+    return resources["Gold"] >= gold and resources["Food"] >= food and resources["Arcane"] >= arcane
+
+def team_power(state):
+    return sum(get_hero_combat_power(state, h) for h, d in state.heroes.items() if d["level"] > 0)
+
+def pick_quest(state):
+    """The next Hydra prerequisite we can make progress on, else gathering."""
+    progress = state.hydra_progress
+    if not progress["located"]:
+        return "Scout Hydra Location"
+    if not progress["access"]:
+        return "Build Hydra Access Route"
+    if not progress["gear"] and (state.buildings["Blacksmith"] >= 2 or state.buildings["Arcane Tower"] >= 2):
+        return "Craft Hydra-Slaying Gear"
+    return "Gather Resources"
+
+def play_day(state):
+    """Take every action the policy wants today, then end the day."""
+    take_turn(state)
+    apply(state, EndDay())
+
+def take_turn(state):
+    """Take every action the policy wants today, without ending the day."""
+    heroes = state.heroes
+    buildings = state.buildings
+
+    # 1) Buildings
+    for bld_name, level in BUILD_ORDER:
+        if buildings[bld_name] >= level:
+            continue
+        if not can_afford(state, bld_name) or not apply(state, Build(bld_name)).ok:
+            break
+
+    # 2) Recruits
+    active = sum(1 for d in heroes.values() if d["level"] > 0)
+    for hero_class in ("Rogue", "Mage"):
+        if active >= buildings["Town Center"]:
+            break
+        if heroes[hero_class]["level"] == 0 and apply(state, Recruit(hero_class)).ok:
+            active += 1
+
+    # 3) Training
+    for hero_class, data in heroes.items():
+        level = data["level"]
+        if 0 < level < hydragame.HERO_MAX_LEVEL and data["xp"] >= hydragame.HERO_XP_TABLE[level - 1]:
+            skills = data["skills"]
+            apply(state, Train(hero_class, min(skills, key=skills.get)))
+
+    # 4) Quests: the strongest hero takes the Hydra quests,
+    # the least experienced one goes gathering
+    active_heroes = [h for h, d in heroes.items() if d["level"] > 0]
+    if active_heroes:
+        strongest = max(active_heroes, key=lambda h: get_hero_combat_power(state, h))
+        while state.quests_today < state.quests_per_day:
+            quest_name = pick_quest(state)
+            if quest_name == "Gather Resources":
+                hero_class = min(active_heroes, key=lambda h: (heroes[h]["level"], heroes[h]["xp"]))
+            else:
+                hero_class = strongest
+            apply(state, Quest(quest_name, hero_class))
+
+    # 5) The Hydra
+    if state.hydra_progress["fight_unlocked"] and team_power(state) >= BATTLE_POWER:
+        apply(state, Battle())
+
+def play_game(state=None, max_days=MAX_DAYS):
+    """
+    Play until the Hydra is slain or max_days have passed.
+    Returns the finished GameState.
+    """
+    if state is None:
+        state = GameState()
+    while state.stats.hydras_slain == 0 and state.turn_count <= max_days:
+        play_day(state)
+    return state
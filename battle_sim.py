@@ -0,0 +1,163 @@
+import math
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+from hydragame import HYDRA_HP, HYDRA_DAMAGE
+
+"""
+BATTLE SIMULATOR
+----------------
+
+Resolves lots of Hydra battles at once with NumPy instead of calling
+attempt_final_battle() in a loop. The damage model is the same one the
+game uses:
+
+- Your team starts with total_power * 2 HP, the Hydra with HYDRA_HP.
+- Each round you deal int(uniform(total_power*0.8, total_power*1.2)) and
+  the Hydra deals int(uniform(HYDRA_DAMAGE*0.8, HYDRA_DAMAGE*1.2)).
+- Damage lands at the same time, but the Hydra is checked first, so a
+  round where both sides drop to 0 counts as a win.
+"""
+
+# -------------------------------------------------------------------
+# MONTE CARLO
+# -------------------------------------------------------------------
+
+def simulate_battles(total_power, hydra_hp=HYDRA_HP, hydra_damage=HYDRA_DAMAGE, rng=None):
+    """
+    Fight one battle per entry of `total_power` (an int or array of team
+    powers). `hydra_hp` and `hydra_damage` can be scalars or arrays that
+    broadcast against it. `rng` is a numpy Generator or a seed.
+
+    Returns (won, rounds, hydra_hp_left, team_hp_left) arrays. A team with
+    0 power never fights, same as the game: won=False, rounds=0.
+    """
+    if not isinstance(rng, np.random.Generator):
+        rng = np.random.default_rng(rng)
+
+    power, hydra_left, hydra_dmg = np.broadcast_arrays(
+        np.asarray(total_power, dtype=np.int64),
+        np.asarray(hydra_hp, dtype=np.int64),
+        np.asarray(hydra_damage, dtype=np.int64),
+    )
+    power = power.ravel()
+    hydra_dmg = hydra_dmg.ravel()
+    hydra_left = hydra_left.ravel().copy()
+    team_left = power * 2
+    rounds = np.zeros(power.size, dtype=np.int64)
+
+    # Only keep stepping the battles that are still going
+    active = np.flatnonzero((hydra_left > 0) & (team_left > 0))
+    while active.size:
+        p = power[active]
+        d = hydra_dmg[active]
+        dmg_to_hydra = rng.uniform(p * 0.8, p * 1.2).astype(np.int64)
+        dmg_from_hydra = rng.uniform(d * 0.8, d * 1.2).astype(np.int64)
+
+        hydra_left[active] -= dmg_to_hydra
+        team_left[active] -= dmg_from_hydra
+        rounds[active] += 1
+
+        still_fighting = (hydra_left[active] > 0) & (team_left[active] > 0)
+        active = active[still_fighting]
+
+    won = (hydra_left <= 0) & (rounds > 0)
+    return won, rounds, hydra_left, team_left
+
+def estimate_win_rate(total_power, battles=100000, hydra_hp=HYDRA_HP, hydra_damage=HYDRA_DAMAGE, rng=None):
+    """Fight `battles` battles at a single team power and return the win rate."""
+    powers = np.full(battles, total_power, dtype=np.int64)
+    won, _, _, _ = simulate_battles(powers, hydra_hp, hydra_damage, rng)
+    return float(won.mean())
+
+# -------------------------------------------------------------------
+# EXACT ODDS
+# -------------------------------------------------------------------
+
+# Dashboards keep asking about the same few hundred team powers
+BATTLE_ODDS_CACHE_SIZE = 1024
+
+def damage_distribution(base):
+    """
+    Exact distribution of int(random.uniform(base*0.8, base*1.2)).
+    Returns (lowest_damage, pmf) where pmf[i] is P(damage == lowest_damage + i).
+    """
+    low, high = base * 0.8, base * 1.2
+    if high <= low:
+        return int(low), np.ones(1)
+    first = int(low)
+    last = math.ceil(high) - 1
+    ks = np.arange(first, last + 1)
+    pmf = (np.minimum(ks + 1, high) - np.maximum(ks, low)) / (high - low)
+    return first, pmf
+
+def _take_round(alive, first, pmf):
+    """
+    One round of damage for one side. alive[i] is the chance this side has
+    taken exactly i damage and is still standing; anything that reaches
+    len(alive) damage falls off the end (dead).
+    """
+    hp = len(alive)
+    new_alive = np.zeros(hp)
+    if first < hp:
+        dealt = np.convolve(alive, pmf)[:hp - first]
+        new_alive[first:first + len(dealt)] = dealt
+    return new_alive
+
+@lru_cache(maxsize=BATTLE_ODDS_CACHE_SIZE)
+def battle_odds(total_power, hydra_hp=HYDRA_HP, hydra_damage=HYDRA_DAMAGE):
+    """
+    Exact (win_probability, expected_rounds) for one attempt_final_battle
+    at this team power. Each side's HP is tracked as a distribution over
+    damage taken so far, so there's no sampling noise.
+    """
+    team_hp = total_power * 2
+    if team_hp <= 0 or hydra_hp <= 0:
+        return 0.0, 0.0
+
+    hydra_first, hydra_pmf = damage_distribution(total_power)
+    team_first, team_pmf = damage_distribution(hydra_damage)
+    hydra_alive = np.zeros(hydra_hp)
+    hydra_alive[0] = 1.0
+    team_alive = np.zeros(team_hp)
+    team_alive[0] = 1.0
+
+    # P(hydra still up after n rounds), P(team still up after n rounds)
+    hydra_up, team_up = 1.0, 1.0
+    win_chance = 0.0
+    expected_rounds = 1.0  # Every battle lasts at least one round
+    while True:
+        hydra_alive = _take_round(hydra_alive, hydra_first, hydra_pmf)
+        team_alive = _take_round(team_alive, team_first, team_pmf)
+        next_hydra_up = hydra_alive.sum()
+        next_team_up = team_alive.sum()
+
+        # Hydra falls this round while the team was still standing.
+        # The Hydra is checked first, so a double KO is a win.
+        win_chance += (hydra_up - next_hydra_up) * team_up
+        expected_rounds += next_hydra_up * next_team_up
+
+        hydra_up, team_up = next_hydra_up, next_team_up
+        if hydra_up < 1e-15 or team_up < 1e-15:
+            break
+
+    # Clamp away float round-off from the subtraction above
+    win_chance = min(1.0, max(0.0, float(win_chance)))
+    return win_chance, float(expected_rounds)
+
+def battle_win_probability(total_power, hydra_hp=HYDRA_HP, hydra_damage=HYDRA_DAMAGE):
+    """Exact chance that one attempt_final_battle at this power slays the Hydra."""
+    return battle_odds(total_power, hydra_hp, hydra_damage)[0]
+
+def battle_expected_rounds(total_power, hydra_hp=HYDRA_HP, hydra_damage=HYDRA_DAMAGE):
+    """Exact expected number of rounds one attempt_final_battle lasts."""
+    return battle_odds(total_power, hydra_hp, hydra_damage)[1]
+
+if __name__ == "__main__":
+    # e.g. python battle_sim.py 100 150 200
+    for arg in sys.argv[1:] or ["100"]:
+        win_chance, rounds = battle_odds(int(arg))
+        print(f"Power {arg}: win rate {estimate_win_rate(int(arg)):.4f} "
+              f"(exact {win_chance:.4f}, {rounds:.2f} rounds)")
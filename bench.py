@@ -0,0 +1,253 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import hydragame
+from hydragame import (
+    GameState, derive_seed, end_turn, random_events, run_quest, get_hero_combat_power,
+    make_multi_column_status, attempt_final_battle, reset_messages,
+)
+from autoplay import play_game
+
+"""
+BENCHMARKS
+----------
+
+Repeatable timings for the engine's hot paths, plus how many whole games
+(start to Hydra kill, played by autoplay.py) we get through per second.
+
+Every function is timed in three scenarios:
+- early: day 1, a Farm and the starting Knight
+- mid:   every building at Lv 2, all three heroes at Lv 2
+- late:  every building maxed, all three heroes maxed, Hydra fight unlocked
+The battle is only timed late: it's the one scenario with the fight
+unlocked, anywhere else it would time the "prerequisites not met" return.
+
+Calls mutate their state (end_turn moves the calendar on, run_quest
+piles up XP), so every BATCH_CALLS calls start again from a fresh copy
+of the scenario, each batch with its own seed. The numbers are for the
+scenario as described, give or take BATCH_CALLS days or quests.
+
+    python bench.py                      # print a table
+    python bench.py --out before.json    # ...and save the numbers
+    python bench.py --compare before.json
+
+Scenarios use fixed seeds, so two runs on the same commit do the same work.
+"""
+
+SEED = 1234
+# Calls timed on one scenario state before starting from a fresh one
+BATCH_CALLS = 50
+
+# -------------------------------------------------------------------
+# SCENARIOS
+# -------------------------------------------------------------------
+
+def early_game(seed=SEED):
+    state = GameState(seed)
+    state.buildings["Farm"] = 1
+    return state
+
+def mid_game(seed=SEED):
+    state = GameState(seed)
+    for bld_name in state.buildings:
+        state.buildings[bld_name] = 2
+    for data in state.heroes.values():
+        data["level"] = 2
+        first_skill = next(iter(data["skills"]))
+        data["skills"][first_skill] = 1
+    state.quests_per_day = 6
+    state.hydra_progress["located"] = True
+    state.resources.update({"Gold": 2000, "Food": 2000, "Arcane": 200})
+    state.turn_count = 20
+    return state
+
+def late_game(seed=SEED):
+    state = GameState(seed)
+    for bld_name in state.buildings:
+        state.buildings[bld_name] = hydragame.BUILDING_INFO[bld_name]["max_level"]
+    for data in state.heroes.values():
+        data["level"] = hydragame.HERO_MAX_LEVEL
+        skills = list(data["skills"])
+        # One skill point per level after the first, spread out
+        for i in range(hydragame.HERO_MAX_LEVEL - 1):
+            data["skills"][skills[i % len(skills)]] += 1
+    state.quests_per_day = 6
+    for flag in state.hydra_progress:
+        state.hydra_progress[flag] = True
+    state.resources.update({"Gold": 5000, "Food": 5000, "Arcane": 500})
+    state.turn_count = 60
+    return state
+
+SCENARIOS = {
+    "early": early_game,
+    "mid": mid_game,
+    "late": late_game,
+}
+
+# name => function(state) doing one call
+HOT_PATHS = {
+    "end_turn": end_turn,
+    "random_events": random_events,
+    "run_quest": lambda s: run_quest(s, "Gather Resources", 50, "Knight"),
+    "get_hero_combat_power": lambda s: get_hero_combat_power(s, "Knight"),
+    "make_multi_column_status": make_multi_column_status,
+    "attempt_final_battle": attempt_final_battle,
+}
+
+# name => the only scenarios worth timing it in (default: all of them)
+HOT_PATH_SCENARIOS = {
+    "attempt_final_battle": ("late",),
+}
+
+# -------------------------------------------------------------------
+# TIMING
+# -------------------------------------------------------------------
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    idx = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[idx]
+
+def time_calls(func, make_state, calls, warmup=100, batch=BATCH_CALLS):
+    """
+    Time `calls` individual calls of func(state), with a fresh
+    make_state(seed) every `batch` calls. Returns a result dict.
+    """
+    perf_counter_ns = time.perf_counter_ns
+    state = make_state()
+    for _ in range(warmup):
+        func(state)
+        reset_messages(state)
+
+    samples = []
+    append = samples.append
+    for i in range(calls):
+        if i % batch == 0:
+            # Not timed: start over from the scenario
+            state = make_state(derive_seed(SEED, "batch", i // batch))
+        start = perf_counter_ns()
+        func(state)
+        append(perf_counter_ns() - start)
+        # Messages pile up otherwise; don't count clearing them
+        reset_messages(state)
+
+    total_ns = sum(samples)
+    samples.sort()
+    return {
+        "calls": calls,
+        "ops_per_sec": calls / (total_ns / 1e9) if total_ns else 0.0,
+        "mean_us": total_ns / calls / 1000,
+        "p50_us": percentile(samples, 50) / 1000,
+        "p90_us": percentile(samples, 90) / 1000,
+        "p99_us": percentile(samples, 99) / 1000,
+        "max_us": samples[-1] / 1000,
+    }
+
+def time_full_games(games):
+    """Play `games` seeded games start to finish with the scripted policy."""
+    start = time.perf_counter()
+    days = 0
+    kills = 0
+    for seed in range(games):
+        state = play_game(GameState(SEED + seed))
+        days += state.turn_count
+        kills += state.stats.hydras_slain
+    elapsed = time.perf_counter() - start
+    return {
+        "games": games,
+        "games_per_sec": games / elapsed,
+        "days_per_sec": days / elapsed,
+        "hydra_kills": kills,
+    }
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(calls=20000, games=200, only=None):
+    """
+    Run every hot path in every scenario (or just the names in `only`),
+    then the full-game benchmark. Returns a JSON-ready dict.
+    """
+    results = []
+    for func_name, func in HOT_PATHS.items():
+        if only and func_name not in only:
+            continue
+        for scenario_name, make_state in SCENARIOS.items():
+            if scenario_name not in HOT_PATH_SCENARIOS.get(func_name, SCENARIOS):
+                continue
+            timing = time_calls(func, make_state, calls)
+            timing.update({"function": func_name, "scenario": scenario_name})
+            results.append(timing)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "batch_calls": BATCH_CALLS,
+        "hot_paths": results,
+    }
+    if games and not only:
+        report["full_games"] = time_full_games(games)
+    return report
+
+# -------------------------------------------------------------------
+# REPORTING
+# -------------------------------------------------------------------
+
+def print_report(report, baseline=None):
+    old = {}
+    if baseline:
+        old = {(r["function"], r["scenario"]): r for r in baseline.get("hot_paths", [])}
+
+    print(f"commit {report['commit']}  python {report['python']}  "
+          f"(fresh scenario every {report.get('batch_calls', 'n/a')} calls)")
+    print(f"{'function':<26}{'scenario':<9}{'ops/sec':>12}{'p50 us':>9}{'p90 us':>9}{'p99 us':>9}", end="")
+    print(f"{'vs base':>9}" if baseline else "")
+    for r in report["hot_paths"]:
+        line = (f"{r['function']:<26}{r['scenario']:<9}{r['ops_per_sec']:>12.0f}"
+                f"{r['p50_us']:>9.2f}{r['p90_us']:>9.2f}{r['p99_us']:>9.2f}")
+        before = old.get((r["function"], r["scenario"]))
+        if before and before["ops_per_sec"]:
+            line += f"{r['ops_per_sec'] / before['ops_per_sec']:>8.2f}x"
+        print(line)
+
+    games = report.get("full_games")
+    if games:
+        line = f"\nFull games: {games['games_per_sec']:.1f} games/sec ({games['days_per_sec']:.0f} days/sec)"
+        before = (baseline or {}).get("full_games")
+        if before and before["games_per_sec"]:
+            line += f"  {games['games_per_sec'] / before['games_per_sec']:.2f}x vs base"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game engine.")
+    parser.add_argument("--calls", type=int, default=20000, help="timed calls per function per scenario")
+    parser.add_argument("--games", type=int, default=200, help="full games to play (0 to skip)")
+    parser.add_argument("--only", nargs="*", choices=list(HOT_PATHS), help="only time these functions")
+    parser.add_argument("--out", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results from an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.calls, args.games, args.only)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
+import base64
+import csv
+import hashlib
+import itertools
+import json
+import mmap
 import random
+import shutil
+import struct
 import sys
 import os
-
-# -------------------------------------------------------------------
-# GLOBALS & DATA
-# -------------------------------------------------------------------
-
-# We'll store any "action messages" that result from the player's
-# last action (like building, recruiting, quest results, etc.).
-last_action_messages = []
+from array import array
+from bisect import bisect_left
+from collections import deque, namedtuple
 
 """
 SLAY THE HYDRA - A Text-Based Kingdom Builder
@@ -26,8 +29,208 @@ Core Features:
 - Finally, attempt to slay the Hydra in a simple text-based battle!
 """
 
-# Turn/Day count
-turn_count = 1
+# -------------------------------------------------------------------
+# COMPACT STORAGE
+# -------------------------------------------------------------------
+# A kingdom's numbers live in small fixed-size containers instead of
+# nested dicts keyed by strings: resources, building levels and skill
+# ranks are each one array('q'), heroes are __slots__ objects. That's a
+# few hundred bytes a kingdom instead of a few kilobytes.
+#
+# Every container still reads like the old dicts (resources["Gold"] += 5,
+# heroes["Mage"]["skills"].items(), dict(buildings), ...), so callers
+# don't need to care. Hot paths can skip the name lookups: hero.level,
+# hero.xp, and counts.values() is the array itself, in NAMES order.
+
+RESOURCE_NAMES = ("Gold", "Food", "Arcane")
+BUILDING_NAMES = ("Town Center", "Farm", "Arcane Tower", "Barracks", "Trading Hall", "Blacksmith")
+HERO_SKILLS = {
+    "Knight": ("Iron Defense", "Swordsmanship", "Call to Arms"),
+    "Mage": ("Elemental Blast", "Mana Efficiency", "Arcane Overload"),
+    "Rogue": ("Backstab", "Pickpocket", "Shadow Cloak"),
+}
+HERO_CLASSES = tuple(HERO_SKILLS)
+
+# Array positions in resources.values() and buildings.values()
+GOLD, FOOD, ARCANE = range(len(RESOURCE_NAMES))
+TOWN_CENTER, FARM, ARCANE_TOWER, BARRACKS, TRADING_HALL, BLACKSMITH = range(len(BUILDING_NAMES))
+
+class NamedView():
+    """
+    The read-only dict methods for a fixed tuple of NAMES, on top of the
+    subclass's __getitem__.
+    """
+    __slots__ = ()
+    NAMES = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.INDEX = {name: i for i, name in enumerate(cls.NAMES)}
+
+    def __contains__(self, name):
+        return name in self.INDEX
+
+    def __iter__(self):
+        return iter(self.NAMES)
+
+    def __len__(self):
+        return len(self.NAMES)
+
+    def keys(self):
+        return self.NAMES
+
+    def values(self):
+        return [self[name] for name in self.NAMES]
+
+    def items(self):
+        return list(zip(self.NAMES, self.values()))
+
+    def get(self, name, default=None):
+        return self[name] if name in self.INDEX else default
+
+    def __eq__(self, other):
+        if isinstance(other, (NamedView, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+class Counts(NamedView):
+    """Named integers packed into one array, in NAMES order."""
+    __slots__ = ("_values",)
+
+    def __init__(self, counts=()):
+        self._values = array("q", bytes(8 * len(self.NAMES)))
+        self.update(counts)
+
+    def __getitem__(self, name):
+        return self._values[self.INDEX[name]]
+
+    def __setitem__(self, name, value):
+        self._values[self.INDEX[name]] = value
+
+    def values(self):
+        return self._values
+
+    def update(self, counts=(), **kwargs):
+        for name, value in dict(counts, **kwargs).items():
+            self[name] = value
+
+class Resources(Counts):
+    __slots__ = ()
+    NAMES = RESOURCE_NAMES
+
+class Buildings(Counts):
+    __slots__ = ()
+    NAMES = BUILDING_NAMES
+
+class Skills(Counts):
+    """A hero's skill ranks. Changing one drops the roster's derived stats."""
+    __slots__ = ("roster",)
+
+    def __init__(self, roster=None, counts=()):
+        self.roster = roster
+        super().__init__(counts)
+
+    def __setitem__(self, name, value):
+        self._values[self.INDEX[name]] = value
+        if self.roster is not None:
+            self.roster.derived = None
+
+class KnightSkills(Skills):
+    __slots__ = ()
+    NAMES = HERO_SKILLS["Knight"]
+
+class MageSkills(Skills):
+    __slots__ = ()
+    NAMES = HERO_SKILLS["Mage"]
+
+class RogueSkills(Skills):
+    __slots__ = ()
+    NAMES = HERO_SKILLS["Rogue"]
+
+SKILL_TYPES = {"Knight": KnightSkills, "Mage": MageSkills, "Rogue": RogueSkills}
+
+class Hero(NamedView):
+    """One hero's level, XP and skill ranks (level 0 = not recruited)."""
+    __slots__ = ("_level", "xp", "skills", "roster")
+    NAMES = ("level", "xp", "skills")
+
+    def __init__(self, hero_class, roster=None, level=0, xp=0):
+        self.roster = roster
+        self._level = level
+        self.xp = xp
+        self.skills = SKILL_TYPES[hero_class](roster)
+
+    @property
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, value):
+        self._level = value
+        if self.roster is not None:
+            self.roster.derived = None
+
+    def __getitem__(self, key):
+        if key not in self.INDEX:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.INDEX:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+# Numbers about the whole team that the hot paths keep asking for:
+# power by hero class, the active heroes' total power and levels, the
+# food they eat a day and who's active, in HERO_CLASSES order
+TeamStats = namedtuple("TeamStats", ["power", "total_power", "levels", "food_need", "active"])
+
+class Roster(NamedView):
+    """
+    Every hero class's Hero, in HERO_CLASSES order, plus their TeamStats.
+    The stats are worked out on demand and kept in `derived` until a
+    hero levels up, joins or learns a skill, which sets it back to None.
+    Anything writing to the arrays directly should call changed().
+    """
+    __slots__ = ("_heroes", "derived")
+    NAMES = HERO_CLASSES
+
+    def __init__(self):
+        self.derived = None
+        self._heroes = tuple(Hero(hero_class, self) for hero_class in HERO_CLASSES)
+
+    def __getitem__(self, hero_class):
+        return self._heroes[self.INDEX[hero_class]]
+
+    def values(self):
+        return self._heroes
+
+    def changed(self):
+        self.derived = None
+
+    def stats(self):
+        derived = self.derived
+        if derived is None:
+            power = {}
+            active = []
+            levels = total_power = 0
+            for hero_class, h in zip(HERO_CLASSES, self._heroes):
+                power[hero_class] = hero_power = h._level * 10 + sum(h.skills.values()) * 3
+                if h._level > 0:
+                    active.append(hero_class)
+                    levels += h._level
+                    total_power += hero_power
+            derived = self.derived = TeamStats(power, total_power, levels, 5 * levels, tuple(active))
+        return derived
+
+# -------------------------------------------------------------------
+# GAME STATE
+# -------------------------------------------------------------------
 
 # Game-long stats for summary at the end
 class Player_Stats():
@@ -42,74 +245,100 @@ class Player_Stats():
         self.hydras_slain = 0
         self.debug_used = 0
         self.turn_count = 1
+        self.starvation_days = 0
 
-Stats = Player_Stats()
-
-# Daily quest limit: move things along
-quests_per_day = 2
-quests_today = 0
+# Hydra prerequisites, in order, then the fight itself. Snapshots and
+# checkpoints store them as bits in this order.
+HYDRA_FLAGS = ("located", "access", "gear", "fight_unlocked")
 
-# Resources: stored in a dictionary
-resources = {
-    "Gold": 150,
-    "Food": 50,
-    "Arcane": 0,  # Arcane Knowledge
-}
+class GameState():
+    """
+    Everything that belongs to one kingdom. All the game functions take
+    a GameState as their first argument, so one process can hold as many
+    independent games as it likes: just make another GameState().
 
-# Buildings
-buildings = {
-    "Town Center": 1,  # starts at level 1
-    "Farm": 0,
-    "Arcane Tower": 0,
-    "Barracks": 0,
-    "Trading Hall": 0,
-    "Blacksmith": 0,
-}
+    Every dice roll in a game comes from its own `rng`, seeded from `seed`,
+    so the same seed and the same choices replay the same game.
+    """
+    def __init__(self, seed=None, sink=None):
+        if seed is None:
+            seed = random.randrange(2**63)
+        self.seed = seed
+        self.rng = random.Random(seed)
 
-# Heroes
-heroes = {
-    "Knight": {
-        "level": 1,
-        "xp": 0,
-        "skills": {
-            "Iron Defense": 0,
-            "Swordsmanship": 0,
-            "Call to Arms": 0,
-        }
-    },
-    "Mage": {
-        "level": 0,
-        "xp": 0,
-        "skills": {
-            "Elemental Blast": 0,
-            "Mana Efficiency": 0,
-            "Arcane Overload": 0,
-        }
-    },
-    "Rogue": {
-        "level": 0,
-        "xp": 0,
-        "skills": {
-            "Backstab": 0,
-            "Pickpocket": 0,
-            "Shadow Cloak": 0,
-        }
-    },
-}
+        # Turn/Day count
+        self.turn_count = 1
 
-# Hydra progress
-hydra_progress = {
-    "located": False,   
-    "access": False,    
-    "gear": False,      
-    "fight_unlocked": False
-}
+        self.stats = Player_Stats()
+
+        # Daily quest limit: move things along
+        self.quests_per_day = 2
+        self.quests_today = 0
+
+        # Resources
+        self.resources = Resources({
+            "Gold": 150,
+            "Food": 50,
+            "Arcane": 0,  # Arcane Knowledge
+        })
+
+        # Buildings
+        self.buildings = Buildings({
+            "Town Center": 1,  # starts at level 1
+            "Farm": 0,
+            "Arcane Tower": 0,
+            "Barracks": 0,
+            "Trading Hall": 0,
+            "Blacksmith": 0,
+        })
+
+        # Heroes: everyone starts at level 0 (not recruited) but the Knight
+        self.heroes = Roster()
+        self.heroes["Knight"].level = 1
+
+        # Hydra progress
+        self.hydra_progress = dict.fromkeys(HYDRA_FLAGS, False)
+
+        self.recent_events = []
+        # Cached (key, events, cumulative weights) for random_events()
+        self.event_table = None
+
+        # Messages from the player's last action (building, recruiting,
+        # quest results, etc.), and wherever else `sink` sends them
+        self.messages = MessageBus(sink)
+
+        # Order commands waiting to be carried out at day end (see ORDERS)
+        self.orders = deque()
+
+        # Journal recording every command applied to this game, if any
+        self.journal = None
+        # DayRecorder keeping this game's day-by-day history, if any
+        self.recorder = None
+
+    def spawn_seed(self, *keys):
+        """A seed for a separate stream derived from this game's seed."""
+        return derive_seed(self.seed, *keys)
+
+    def spawn_rng(self, *keys):
+        """
+        A separate random.Random derived from this game's seed, for side
+        simulations (e.g. what-if battles) that shouldn't disturb `rng`.
+        """
+        return random.Random(self.spawn_seed(*keys))
+
+def derive_seed(master_seed, *keys):
+    """
+    Derive a 64-bit seed from a master seed and any path of keys, e.g.
+    derive_seed(1234, "worker", 3, "game", 17). Same inputs, same seed,
+    on every machine and Python version.
+    """
+    text = "/".join(str(k) for k in (master_seed,) + keys)
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
 
 # Hydra stats
 HYDRA_HP = 1000
 HYDRA_DAMAGE = 75
 
-recent_events = []
 RECENT_EVENTS_MAX = 3  # or however many you'd like
 # Event dict definied below
 
@@ -147,6 +376,14 @@ BUILDING_INFO = {
 }
 
 
+# Quest name => base difficulty (hero power is added on top)
+QUEST_DIFFICULTIES = {
+    "Gather Resources": 50,
+    "Scout Hydra Location": 40,
+    "Build Hydra Access Route": 30,
+    "Craft Hydra-Slaying Gear": 20,
+}
+
 HERO_XP_TABLE = [10, 20, 40, 70, 110] #How much xp is required to go up a level
 HERO_MAX_LEVEL = len(HERO_XP_TABLE) #So you only have to edit one thing
 
@@ -154,35 +391,42 @@ HERO_MAX_LEVEL = len(HERO_XP_TABLE) #So you only have to edit one thing
 # UTILITY & DISPLAY
 # -------------------------------------------------------------------
 
-def clear_screen():
+# ANSI escapes: wipe the screen and home the cursor / clear to end of line / clear below
+CLEAR_SCREEN = "\033[2J\033[H"
+CLEAR_LINE = "\033[K"
+CLEAR_BELOW = "\033[J"
+
+def clear_screen(out=None):
     """
     Clears the console using ANSI escape sequences.
     This should work on most Unix and modern Windows terminals.
     """
-    os.system('cls' if os.name == 'nt' else 'clear')
+    out = out or sys.stdout
+    out.write(CLEAR_SCREEN)
+    out.flush()
 
-def get_hero_combat_power(hero_class):
+def get_hero_combat_power(state, hero_class):
     """Calculate total 'combat power' for a hero."""
-    h = heroes[hero_class]
-    base_power = h["level"] * 10
-    skill_bonus = sum(h["skills"].values()) * 3
-    return base_power + skill_bonus
+    return state.heroes.stats().power[hero_class]
 
-def get_hero_level(hero_class):
-    h = heroes[hero_class]
+def get_hero_level(state, hero_class):
+    h = state.heroes[hero_class]
     level = h["level"]
     return level
 
-def make_multi_column_status():
+def make_multi_column_status(state):
     """
     Returns a string with a two-column layout for the major sections:
     1) Resources & Buildings
     2) Heroes & Hydra Progress
     You can adjust spacing, widths, or add more columns as desired.
     """
+    resources = state.resources
+    hydra_progress = state.hydra_progress
+
     # Left column: Day, Quests, Resources, Buildings
     left_lines = []
-    left_lines.append(f"Day {turn_count} | Quests Used: {quests_today}/{quests_per_day}")
+    left_lines.append(f"Day {state.turn_count} | Quests Used: {state.quests_today}/{state.quests_per_day}")
     left_lines.append("-"*35)
     left_lines.append("RESOURCES:")
     left_lines.append(f"  Gold:   {resources['Gold']}")
@@ -190,19 +434,19 @@ def make_multi_column_status():
     left_lines.append(f"  Arcane: {resources['Arcane']}")
     left_lines.append("")
     left_lines.append("BUILDINGS:")
-    for bld, lvl in buildings.items():
+    for bld, lvl in state.buildings.items():
         if bld == "Town Center" or lvl > 0:
             left_lines.append(f"  {bld}: Lv {lvl}")
 
     # Right column: Heroes, Hydra
     right_lines = []
     right_lines.append("HEROES:")
-    for hclass, data in heroes.items():
-        if data["level"] > 0:
-            cpower = get_hero_combat_power(hclass)
-            right_lines.append(
-                f"  {hclass}: Lv {data['level']}, XP {data['xp']} (Pow {cpower})"
-            )
+    team = state.heroes.stats()
+    for hclass in team.active:
+        data = state.heroes[hclass]
+        right_lines.append(
+            f"  {hclass}: Lv {data.level}, XP {data.xp} (Pow {team.power[hclass]})"
+        )
     right_lines.append("")
     right_lines.append("HYDRA PROGRESS:")
     right_lines.append(f"  Located?  {hydra_progress['located']}")
@@ -222,661 +466,1837 @@ def make_multi_column_status():
 
     return "\n".join(combined_lines)
 
-def show_status_and_messages():
+def make_frame(state):
+    """
+    The whole status screen as a list of lines: the multi-column status,
+    then any action messages in a separate section below.
+    """
+    lines = make_multi_column_status(state).split("\n")
+    lines += ["", "="*72, ""]
+    # Any messages from last actions
+    if state.messages.recent:
+        lines.append("MESSAGES:")
+        for msg in state.messages.recent:
+            lines.append(f" - {msg}")
+        lines.append("")
+    lines.append("="*72)
+    return lines
+
+class Renderer():
+    """
+    Draws status frames to a terminal stream with a single write each.
+
+    With diff=True only the lines that changed since the last frame are
+    rewritten (plus everything below the frame, where the menus go). That
+    relies on every frame line being one terminal row, so lines get cut
+    to the terminal's width (frames are plain ASCII, one column a
+    character), and a resized terminal gets a full redraw. It also relies
+    on the frame and menu fitting on screen without scrolling; call
+    invalidate() after anything else draws on the screen.
+    """
+    def __init__(self, out=None, diff=False):
+        self.out = out or sys.stdout
+        self.diff = diff
+        self.last_lines = None
+        self.last_width = None
+
+    def invalidate(self):
+        self.last_lines = None
+
+    def draw(self, state):
+        lines = make_frame(state)
+        if self.diff:
+            # Stop a column short: a line filling the last column leaves
+            # the cursor there, and CLEAR_LINE would eat its last character
+            width = shutil.get_terminal_size().columns - 1
+            if width != self.last_width:
+                self.last_width = width
+                self.invalidate()
+            lines = [line[:width] for line in lines]
+        last_lines = self.last_lines
+        if not self.diff or last_lines is None:
+            buf = CLEAR_SCREEN + "\n".join(lines) + "\n"
+        else:
+            parts = []
+            for row, line in enumerate(lines):
+                if row >= len(last_lines) or last_lines[row] != line:
+                    # Cursor to (row, 1), write the line, clear what's left of the old one
+                    parts.append(f"\033[{row + 1};1H{line}{CLEAR_LINE}")
+            # Park the cursor under the frame and wipe the old menu/prompt
+            parts.append(f"\033[{len(lines) + 1};1H{CLEAR_BELOW}")
+            buf = "".join(parts)
+        self.last_lines = lines
+        self.out.write(buf)
+        self.out.flush()
+
+# The terminal the interactive game draws on
+screen = Renderer()
+
+def show_status_and_messages(state, renderer=None):
     """
     Clears the screen, prints the multi-column status,
     then prints any action messages in a separate section below.
     """
-    clear_screen()
-    status_text = make_multi_column_status()
-    print(status_text)
-    print("\n" + "="*72 + "\n")
-    # Print any messages from last actions
-    if last_action_messages:
-        print("MESSAGES:")
-        for msg in last_action_messages:
-            print(f" - {msg}")
-        print("")
-    print("="*72)
+    (renderer or screen).draw(state)
 
-def add_message(msg):
+# -------------------------------------------------------------------
+# MESSAGES
+# -------------------------------------------------------------------
+# Everything the game tells the player goes through add_message() as a
+# Message record: a str.format template plus its fields, formatted only
+# when something actually reads the text. Each game keeps the latest
+# MESSAGE_LIMIT records for the status screen and apply()'s Result, and
+# hands every record to its sink as well:
+#
+#     GameState()                       # just the screen
+#     GameState(sink=TerminalSink())    # ...and print them as they happen
+#     GameState(sink=JsonlSink(path))   # ...and log them as JSON lines
+#     GameState(sink=NULL_SINK)         # no messages at all (simulations)
+#
+# With NULL_SINK, add_message() returns before building anything, and the
+# battle skips its per-round messages altogether.
+
+MESSAGE_LIMIT = 100
+
+class Message(namedtuple("Message", ["day", "kind", "template", "fields"])):
+    """One message. str() formats it."""
+    __slots__ = ()
+
+    def __str__(self):
+        return self.template.format(**self.fields) if self.fields else self.template
+
+class MessageBus():
+    """One game's recent messages (a ring buffer) and the sink they also go to."""
+    def __init__(self, sink=None, limit=MESSAGE_LIMIT):
+        self.recent = deque(maxlen=limit)
+        self.sink = sink
+        self.enabled = getattr(sink, "enabled", True)
+
+    def post(self, message):
+        self.recent.append(message)
+        if self.sink is not None:
+            self.sink.write(message)
+
+    def clear(self):
+        self.recent.clear()
+
+class NullSink():
+    """Drop every message without building it."""
+    enabled = False
+
+    def write(self, message):
+        pass
+
+NULL_SINK = NullSink()
+
+class TerminalSink():
+    """Print each message as it happens, e.g. to follow a bot's game."""
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+
+    def write(self, message):
+        self.out.write(f"Day {message.day} [{message.kind}] {message}\n")
+
+class JsonlSink():
     """
-    Helper to append a message to the last_action_messages list.
+    Append each message as a JSON line: day, kind, template and fields
+    (unformatted, so they stay machine-readable). Close it when the game
+    is over, or use it as a context manager:
+
+        with JsonlSink("game.jsonl") as sink:
+            autoplay.play_game(GameState(sink=sink))
     """
-    last_action_messages.append(msg)
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def write(self, message):
+        self.file.write(json.dumps(message._asdict(), default=str) + "\n")
 
-def reset_messages():
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def add_message(state, template, kind="info", **fields):
+    """
+    Tell the player something. `template` is formatted with `fields`
+    (str.format style) only when the text is needed; without fields
+    it's used as is.
+    """
+    messages = state.messages
+    if messages.enabled:
+        messages.post(Message(state.turn_count, kind, template, fields))
+
+def reset_messages(state):
     """
     Clear the list of action messages before a new action
     so we only see the *latest* messages after each menu choice.
     """
-    last_action_messages.clear()
+    state.messages.clear()
 
 # -------------------------------------------------------------------
 # RANDOM EVENTS
 # -------------------------------------------------------------------
 
-def random_events():
-    global recent_events
+def random_events(state):
+    recent_events = state.recent_events
     # 1) Check if we pass the base "any event?" chance
-    base_chance = 15 + (buildings["Town Center"] * 5)
-    roll = random.randint(1, 100)
+    base_chance = 15 + (state.buildings.values()[TOWN_CENTER] * 5)
+    roll = state.rng.randint(1, 100)
     if roll > base_chance:
         return  # No event this turn
 
-    # 2) Build a Weighted List of possible events
+    # 2) Look up the weighted list of possible events
+    _, possible_events, cumulative = get_event_table(state)
+    if not possible_events:
+        return  # No eligible events
+
+    # 3) Weighted random choice: first event whose cumulative weight >= r
+    r = state.rng.uniform(0, cumulative[-1])
+    chosen_event = possible_events[bisect_left(cumulative, r)]
+
+    # 4) Trigger the chosen event
+    chosen_event["function"](state)
+
+    # 5) Record the event in recent_events
+    recent_events.append(chosen_event["name"])
+    if len(recent_events) > RECENT_EVENTS_MAX:
+        recent_events.pop(0)  # Keep recent_events list short
+
+    # 6) Increment Stats
+    state.stats.random_events_held += 1 # Should only tick up if we A) pass the check B) actually have a possible event
+
+def get_event_table(state):
+    """
+    Returns (key, possible_events, cumulative_weights) for this state.
+    Event conditions and weights only depend on building levels, the
+    turn_count // 5 bucket and the recent_events window, so the table is
+    cached on the state and only rebuilt when one of those changes.
+    """
+    key = (tuple(state.buildings.values()), state.turn_count // 5, tuple(state.recent_events))
+    table = state.event_table
+    if table is not None and table[0] == key:
+        return table
+
     possible_events = []
+    cumulative = []
+    total_weight = 0
     for evt in EVENTS:
         # Condition check
-        if not evt["condition"]():
+        if not evt["condition"](state):
             continue  # Skip if condition is false
 
         # Check repeat-block
         block_size = evt["repeat_block"]
-        forbidden_slice = recent_events[-block_size:]  # Last `block_size` events
+        forbidden_slice = state.recent_events[-block_size:]  # Last `block_size` events
         if evt["name"] in forbidden_slice:
             continue  # Skip this event if it was recently triggered
 
         # Calculate final weight
-        final_weight = evt["base_weight"] + evt["weight_modifier"]()
+        final_weight = evt["base_weight"] + evt["weight_modifier"](state)
         if final_weight <= 0:
             continue  # Skip if weight is zero or less
 
-        # Add to possible events
-        possible_events.append((evt, final_weight))
-
-    if not possible_events:
-        return  # No eligible events
-
-    
-    # 3) Weighted random choice
-    total_weight = sum(weight for (_, weight) in possible_events)
-    r = random.uniform(0, total_weight)
-    cumulative = 0
-    chosen_event = None
-    for (evt, w) in possible_events:
-        cumulative += w
-        if r <= cumulative:
-            chosen_event = evt
-            break
-
-    if chosen_event is None:
-        return  # Failsafe, should not happen
+        total_weight += final_weight
+        possible_events.append(evt)
+        cumulative.append(total_weight)
 
-    # 4) Trigger the chosen event
-    chosen_event["function"]()
-
-    # 5) Record the event in recent_events
-    recent_events.append(chosen_event["name"])
-    if len(recent_events) > RECENT_EVENTS_MAX:
-        recent_events.pop(0)  # Keep recent_events list short
-    
-    # 6) Increment Stats
-    Stats.random_events_held += 1 # Should only tick up if we A) pass the check B) actually have a possible event
+    table = (key, possible_events, cumulative)
+    state.event_table = table
+    return table
 
-def wandering_merchant():
-    add_message("Random Event: Wandering Merchant!")
+def wandering_merchant(state):
+    resources = state.resources
+    add_message(state, "Random Event: Wandering Merchant!", "event")
     if resources["Food"] >= 10:
         resources["Food"] -= 10
         resources["Gold"] += 30
-        add_message("You sold 10 Food for 30 Gold.")
+        add_message(state, "You sold 10 Food for 30 Gold.", "event")
     else:
-        add_message("Not enough Food. The merchant leaves disappointed.")
-
-def wayward_adventurer():
-    add_message("Random Event: Wayward Adventurer!")
-    if heroes["Knight"]["level"] >= 2:
-        heroes["Knight"]["xp"] += 2
-        Stats.xp_gained += 2
-        add_message("Your Knight duels the adventurer and gains +2 XP!")
+        add_message(state, "Not enough Food. The merchant leaves disappointed.", "event")
+
+def wayward_adventurer(state):
+    add_message(state, "Random Event: Wayward Adventurer!", "event")
+    knight = state.heroes["Knight"]
+    if knight["level"] >= 2:
+        knight["xp"] += 2
+        state.stats.xp_gained += 2
+        add_message(state, "Your Knight duels the adventurer and gains +2 XP!", "event")
     else:
-        add_message("The adventurer finds no worthy opponent and leaves.")
-
-def investor_visit():
-    add_message("Random Event: Investor Visit!")
-    resources["Gold"] += 100
-    add_message("An investor funds your treasury with 100 Gold!")
-
-def event_farm_bumper_crop():
-    add_message("Random Event: Bumper Crop at the Farm!")
-    food_gain = random.randint(10, 20) + turn_count * 2
-    resources["Food"] += food_gain
-    add_message(f"Your farms produced an extra {food_gain} Food!")
-
-def event_arcane_experiment():
-    add_message("Random Event: Arcane Experiment!")
-    if random.randint(1, 100) <= 70:
-        arcane_gain = random.randint(5, 15) + turn_count
+        add_message(state, "The adventurer finds no worthy opponent and leaves.", "event")
+
+def investor_visit(state):
+    add_message(state, "Random Event: Investor Visit!", "event")
+    state.resources["Gold"] += 100
+    add_message(state, "An investor funds your treasury with 100 Gold!", "event")
+
+def event_farm_bumper_crop(state):
+    add_message(state, "Random Event: Bumper Crop at the Farm!", "event")
+    food_gain = state.rng.randint(10, 20) + state.turn_count * 2
+    state.resources["Food"] += food_gain
+    add_message(state, "Your farms produced an extra {food} Food!", "event", food=food_gain)
+
+def event_arcane_experiment(state):
+    resources = state.resources
+    add_message(state, "Random Event: Arcane Experiment!", "event")
+    if state.rng.randint(1, 100) <= 70:
+        arcane_gain = state.rng.randint(5, 15) + state.turn_count
         resources["Arcane"] += arcane_gain
-        Stats.arcane_made += arcane_gain
-        add_message(f"Successful experiment! Gained {arcane_gain} Arcane Knowledge.")
+        state.stats.arcane_made += arcane_gain
+        add_message(state, "Successful experiment! Gained {arcane} Arcane Knowledge.", "event", arcane=arcane_gain)
     else:
         lost_food = 5
         if resources["Food"] >= lost_food:
             resources["Food"] -= lost_food
-            add_message("An experiment backfired, destroying 5 Food!")
+            add_message(state, "An experiment backfired, destroying 5 Food!", "event")
         else:
-            add_message("A failed experiment caused minor damage to the food stores. Luckily they were empty!")
-
-def event_local_festival():
-    add_message("Random Event: Local Festival!")
-    gold_gain = 5 + turn_count
-    food_gain = 5 + turn_count
-    resources["Gold"] += gold_gain
-    resources["Food"] += food_gain
-    add_message(f"The festival brings {gold_gain} Gold and {food_gain} Food!")
-
-def event_royal_inspector():
-    add_message("Random Event: Royal Inspector Visits!")
-    if buildings["Town Center"] < 2:
-        gold_loss = 10 + turn_count
-        resources["Gold"] -= gold_loss
-        add_message(f"The inspector fined you {gold_loss} Gold for your underwhelming Town Center!")
+            add_message(state, "A failed experiment caused minor damage to the food stores. Luckily they were empty!", "event")
+
+def event_local_festival(state):
+    add_message(state, "Random Event: Local Festival!", "event")
+    gold_gain = 5 + state.turn_count
+    food_gain = 5 + state.turn_count
+    state.resources["Gold"] += gold_gain
+    state.resources["Food"] += food_gain
+    add_message(state, "The festival brings {gold} Gold and {food} Food!", "event", gold=gold_gain, food=food_gain)
+
+def event_royal_inspector(state):
+    add_message(state, "Random Event: Royal Inspector Visits!", "event")
+    if state.buildings["Town Center"] < 2:
+        gold_loss = 10 + state.turn_count
+        state.resources["Gold"] -= gold_loss
+        add_message(state, "The inspector fined you {gold} Gold for your underwhelming Town Center!", "event", gold=gold_loss)
     else:
-        gold_gain = 20 + turn_count
-        resources["Gold"] += gold_gain
-        add_message(f"The inspector was impressed! You gained {gold_gain} Gold.")
+        gold_gain = 20 + state.turn_count
+        state.resources["Gold"] += gold_gain
+        add_message(state, "The inspector was impressed! You gained {gold} Gold.", "event", gold=gold_gain)
 
+# Conditions and weight modifiers get the GameState they're evaluated for.
+# They may only look at buildings and turn_count // 5: get_event_table()
+# caches its results on those (plus recent_events).
 EVENTS = [
     {
         "name": "wandering_merchant",
         "function": wandering_merchant,
         "base_weight": 10,         # Higher = more likely
         "repeat_block": 1,         # Block this event for 1 round after it occurs
-        "condition": lambda: True, # Always eligible
-        "weight_modifier": lambda: 0  # No dynamic changes
+        "condition": lambda s: True, # Always eligible
+        "weight_modifier": lambda s: 0  # No dynamic changes
     },
     {
         "name": "wayward_adventurer",
         "function": wayward_adventurer,
         "base_weight": 8,
         "repeat_block": 2,         # Wait for 2 other events
-        "condition": lambda: True, # Always eligible
-        "weight_modifier": lambda: 0
+        "condition": lambda s: True, # Always eligible
+        "weight_modifier": lambda s: 0
     },
     {
         "name": "investor_visit",
         "function": investor_visit,
         "base_weight": 5,
         "repeat_block": 2,  # Happens less often
-        "condition": lambda: buildings["Trading Hall"] >= 2,  # Needs Trading Hall Level 2+
-        "weight_modifier": lambda: 0  # No scaling
+        "condition": lambda s: s.buildings["Trading Hall"] >= 2,  # Needs Trading Hall Level 2+
+        "weight_modifier": lambda s: 0  # No scaling
     },
     {
         "name": "farm_bumper_crop",
         "function": event_farm_bumper_crop,
         "base_weight": 7,
         "repeat_block": 2,
-        "condition": lambda: buildings["Farm"] > 0,  # Needs at least 1 Farm
-        "weight_modifier": lambda: buildings["Farm"] * 3  # Weight scales by Farm level
+        "condition": lambda s: s.buildings["Farm"] > 0,  # Needs at least 1 Farm
+        "weight_modifier": lambda s: s.buildings["Farm"] * 3  # Weight scales by Farm level
     },
     {
         "name": "arcane_experiment",
         "function": event_arcane_experiment,
         "base_weight": 6,
         "repeat_block": 1,
-        "condition": lambda: buildings["Arcane Tower"] > 0,  # Needs Arcane Tower
-        "weight_modifier": lambda: buildings["Arcane Tower"] * 2  # Scales by Tower level
+        "condition": lambda s: s.buildings["Arcane Tower"] > 0,  # Needs Arcane Tower
+        "weight_modifier": lambda s: s.buildings["Arcane Tower"] * 2  # Scales by Tower level
     },
     {
         "name": "local_festival",
         "function": event_local_festival,
         "base_weight": 8,
         "repeat_block": 1,
-        "condition": lambda: True,  # Always eligible
-        "weight_modifier": lambda: turn_count // 5  # Slightly more likely as time passes
+        "condition": lambda s: True,  # Always eligible
+        "weight_modifier": lambda s: s.turn_count // 5  # Slightly more likely as time passes
     },
     {
         "name": "royal_inspector",
         "function": event_royal_inspector,
         "base_weight": 3,  # Rare
         "repeat_block": 2,  # Can't happen back-to-back
-        "condition": lambda: True,  # Always eligible
-        "weight_modifier": lambda: 0  # No scaling
+        "condition": lambda s: True,  # Always eligible
+        "weight_modifier": lambda s: 0  # No scaling
     },
 ]
 
+# -------------------------------------------------------------------
+# MENU STEPS
+# -------------------------------------------------------------------
+# Every menu is written once, as a generator of steps: it yields a Prompt
+# (the lines to show, then the question) and gets the player's answer,
+# lowercased, back from send(). Whatever it returns is the menu's result,
+# e.g. the hero picked. The terminal game runs the steps with run_steps()
+# and input(); server.py runs the very same steps over a connection, so
+# the two can't drift apart.
+#
+#     hero_class = run_steps(quest_hero_steps(state, quest_name))
+#     hero_class = run_steps(quest_hero_steps(state, quest_name), ask=bot_answer)
+
+Prompt = namedtuple("Prompt", ["lines", "question"])
+
+def run_steps(steps, ask=input):
+    """Run a menu's steps at the terminal (or with any ask(question) function); returns its result."""
+    try:
+        prompt = next(steps)
+        while True:
+            for line in prompt.lines:
+                print(line)
+            prompt = steps.send(ask(prompt.question).lower())
+    except StopIteration as stop:
+        return stop.value
+
 # -------------------------------------------------------------------
 # CORE GAME FUNCTIONS
 # -------------------------------------------------------------------
 
-def end_turn():
-    global quests_today
-    reset_messages()
-    
+def end_turn(state):
+    # Straight to the arrays: this runs every day of every game
+    resources = state.resources.values()
+    levels = state.buildings.values()
+    heroes = state.heroes
+    reset_messages(state)
+
     # Resource production
-    f_level = buildings["Farm"]
+    f_level = levels[FARM]
     if f_level > 0:
-        resources["Food"] += BUILDING_INFO["Farm"]["food_production"][f_level]
+        resources[FOOD] += BUILDING_INFO["Farm"]["food_production"][f_level]
 
-    t_level = buildings["Arcane Tower"]
+    t_level = levels[ARCANE_TOWER]
     if t_level > 0:
         generated_arcane_amount = BUILDING_INFO["Arcane Tower"]["arcane_production"][t_level]
-        resources["Arcane"] += generated_arcane_amount
-        Stats.arcane_made += generated_arcane_amount
+        resources[ARCANE] += generated_arcane_amount
+        state.stats.arcane_made += generated_arcane_amount
 
-    h_level = buildings["Trading Hall"]
+    h_level = levels[TRADING_HALL]
     if h_level > 0:
-        resources["Gold"] += BUILDING_INFO["Trading Hall"]["gold_production"][h_level]
-
-    hero_level = sum([h["level"] for h in heroes.values()])
-    food_ate = int(5 * hero_level + (hero_level * random.uniform(-0.05, 0.05)))    
-    if resources["Food"] < food_ate:
-        resources["Food"] = 0
-        add_message(f"You ran out of food to feed your Heroes! They lose some XP from hunger.")
-        for h, d in heroes.items():
-            if d["level"] > 0:
-                heroes[h]["xp"] = max(0, heroes[h]["xp"] - 1)
+        resources[GOLD] += BUILDING_INFO["Trading Hall"]["gold_production"][h_level]
+
+    team = heroes.stats()
+    hero_level = team.levels
+    food_ate = int(team.food_need + (hero_level * state.rng.uniform(-0.05, 0.05)))
+    if resources[FOOD] < food_ate:
+        resources[FOOD] = 0
+        state.stats.starvation_days += 1
+        add_message(state, "You ran out of food to feed your Heroes! They lose some XP from hunger.", "day")
+        for h in heroes.values():
+            if h.level > 0:
+                h.xp = max(0, h.xp - 1)
     else:
-        resources["Food"] -= food_ate
-        Stats.food_eaten += food_ate
-        add_message(f"Your Heroes ate {food_ate} food.")
+        resources[FOOD] -= food_ate
+        state.stats.food_eaten += food_ate
+        add_message(state, "Your Heroes ate {food} food.", "day", food=food_ate)
+
+    if state.orders:
+        process_orders(state)
 
-    quests_today = 0
+    state.quests_today = 0
 
     # Trigger random event
-    random_events()
-    add_message(f"Day {turn_count - 1} ended. Day {turn_count} begins.")
-
-
-def build_or_upgrade():
-    reset_messages()
-    add_message("You chose: Build/Upgrade a structure")
-    options = [
-        ("1", "Farm"),
-        ("2", "Arcane Tower"),
-        ("3", "Barracks"),
-        ("4", "Trading Hall"),
-        ("5", "Blacksmith"),
-        ("6", "Town Center"),
-    ]
-    print("\nWhich building to construct or upgrade?")
-    for code, bld in options:
+    random_events(state)
+    add_message(state, "Day {ended} ended. Day {day} begins.", "day", ended=state.turn_count - 1, day=state.turn_count)
+
+
+def end_day(state):
+    """Move the calendar forward a day and run the end-of-day updates."""
+    state.turn_count += 1
+    state.stats.turn_count += 1
+    end_turn(state)
+    if state.recorder is not None:
+        state.recorder.record(state)
+
+# Menu key => building, in menu order
+BUILD_MENU = {
+    "1": "Farm",
+    "2": "Arcane Tower",
+    "3": "Barracks",
+    "4": "Trading Hall",
+    "5": "Blacksmith",
+    "6": "Town Center",
+}
+
+def build_or_upgrade(state):
+    run_steps(build_steps(state))
+
+def build_steps(state):
+    reset_messages(state)
+    add_message(state, "You chose: Build/Upgrade a structure")
+    choice = yield Prompt(build_menu(state), "Enter choice (1-6) or 'q' to cancel: ")
+    bld_name = build_choice(state, choice)
+    if bld_name:
+        apply(state, Build(bld_name), reset=False)
+
+def build_menu(state):
+    """The building menu, as lines of text."""
+    resources = state.resources
+    buildings = state.buildings
+    lines = ["", "Which building to construct or upgrade?"]
+    for code, bld in BUILD_MENU.items():
         current_level = buildings[bld]
         if current_level < BUILDING_INFO[bld]["max_level"]:
             gold, food, arcane = BUILDING_INFO[bld]["upgrade_costs"][current_level]
             if (resources["Gold"] >= gold and resources["Food"] >= food and resources["Arcane"] >= arcane):
-                print(f"({code}) {bld} (Lv {current_level}) - Cost: {gold}G, {food}F, {arcane}A")
+                lines.append(f"({code}) {bld} (Lv {current_level}) - Cost: {gold}G, {food}F, {arcane}A")
             else:
-                print(f"({code}) //{bld} (Lv {current_level}) - Cost: {gold}G, {food}F, {arcane}A")
+                lines.append(f"({code}) //{bld} (Lv {current_level}) - Cost: {gold}G, {food}F, {arcane}A")
         else:
-            print(f"({code}) {bld} (Max Level Reached)")
+            lines.append(f"({code}) {bld} (Max Level Reached)")
+    return lines
 
-    choice = input("Enter choice (1-6) or 'q' to cancel: ").lower()
+def build_choice(state, choice):
+    """The building picked by a build_menu answer, or None (with a message)."""
     if choice == 'q':
-        add_message("Cancelled building/upgrade.")
-        return
-
-    mapping = {o[0]: o[1] for o in options}
-    bld_name = mapping.get(choice)
+        add_message(state, "Cancelled building/upgrade.")
+        return None
+    bld_name = BUILD_MENU.get(choice)
     if not bld_name:
-        add_message("Invalid building choice.")
-        return
+        add_message(state, "Invalid building choice.")
+    return bld_name
 
+def upgrade_building(state, bld_name):
+    """
+    Pay for and upgrade one building, no prompts.
+    Returns True if the upgrade happened.
+    """
+    resources = state.resources
+    buildings = state.buildings
     current_level = buildings[bld_name]
     max_level = BUILDING_INFO[bld_name]["max_level"]
     if current_level >= max_level:
-        add_message(f"{bld_name} is already at max level.")
-        return
+        add_message(state, "{building} is already at max level.", building=bld_name)
+        return False
 
     gold_cost, food_cost, arcane_cost = BUILDING_INFO[bld_name]["upgrade_costs"][current_level]
     if (resources["Gold"] >= gold_cost and
         resources["Food"] >= food_cost and
         resources["Arcane"] >= arcane_cost):
         resources["Gold"] -= gold_cost
-        Stats.gold_spent += gold_cost
+        state.stats.gold_spent += gold_cost
         resources["Food"] -= food_cost
         resources["Arcane"] -= arcane_cost
         buildings[bld_name] += 1
-        add_message(f"{bld_name} upgraded to Level {buildings[bld_name]}!")
+        add_message(state, "{building} upgraded to Level {level}!", building=bld_name, level=buildings[bld_name])
+        return True
     else:
-        add_message("Not enough resources to upgrade!")
-        add_message(f"Required: {gold_cost}G, {food_cost}F, {arcane_cost}A.")
-        add_message(f"Available: {resources['Gold']}G, {resources['Food']}F, {resources['Arcane']}A.")
-
-def recruit_or_train_hero():
-    global quests_per_day
-    reset_messages()
-    add_message("You chose: Recruit/Train a hero")
-    current_heroes = sum(1 for hero in heroes if heroes[hero]["level"] > 0)
-    max_heroes = buildings["Town Center"]
-
-    # Display possible hero actions
-    print("\nWhich hero to recruit or train?")
-    hero_list = ["Knight", "Mage", "Rogue"]
-    for i, hclass in enumerate(hero_list, start=1):
+        add_message(state, "Not enough resources to upgrade!")
+        add_message(state, "Required: {gold}G, {food}F, {arcane}A.", gold=gold_cost, food=food_cost, arcane=arcane_cost)
+        add_message(state, "Available: {gold}G, {food}F, {arcane}A.",
+                    gold=resources["Gold"], food=resources["Food"], arcane=resources["Arcane"])
+        return False
+
+def can_upgrade_building(state, bld_name):
+    """True if the building isn't maxed and we can pay for its next level."""
+    level = state.buildings[bld_name]
+    if level >= BUILDING_INFO[bld_name]["max_level"]:
+        return False
+    gold, food, arcane = BUILDING_INFO[bld_name]["upgrade_costs"][level]
+    resources = state.resources
+    return resources["Gold"] >= gold and resources["Food"] >= food and resources["Arcane"] >= arcane
+
+# Menu key => hero, in menu order
+HERO_MENU = {'1': "Knight", '2': "Mage", '3': "Rogue"}
+
+def recruit_or_train_hero(state):
+    run_steps(hero_steps(state))
+
+def hero_steps(state):
+    reset_messages(state)
+    add_message(state, "You chose: Recruit/Train a hero")
+    hero_class = hero_choice(state, (yield Prompt(hero_menu(state), "Enter choice: ")))
+    if not hero_class:
+        return
+
+    # Check if recruiting or upgrading
+    if state.heroes[hero_class]["level"] == 0:
+        apply(state, Recruit(hero_class), reset=False)
+    else:
+        skill = None
+        if can_train_hero(state, hero_class):
+            skill = yield from skill_steps(state, hero_class)
+        apply(state, Train(hero_class, skill), reset=False)
+
+def hero_menu(state):
+    """The recruit/train menu, as lines of text."""
+    heroes = state.heroes
+    lines = ["", "Which hero to recruit or train?"]
+    for code, hclass in HERO_MENU.items():
         lvl = heroes[hclass]["level"]
         if lvl == 0:
-            print(f"({i}) Recruit {hclass} (50G, 10F)")
+            lines.append(f"({code}) Recruit {hclass} (50G, 10F)")
         else:
             if lvl < HERO_MAX_LEVEL:
                 needed_xp = HERO_XP_TABLE[lvl - 1] - heroes[hclass]["xp"]
-                print(f"({i}) Upgrade {hclass} to Lv {lvl+1} (Needs {needed_xp} more XP)")
+                lines.append(f"({code}) Upgrade {hclass} to Lv {lvl+1} (Needs {needed_xp} more XP)")
             else:
-                print(f"({i}) {hclass} is at MAX Level ({HERO_MAX_LEVEL})")
-    print("(q) Cancel")
+                lines.append(f"({code}) {hclass} is at MAX Level ({HERO_MAX_LEVEL})")
+    lines.append("(q) Cancel")
+    return lines
 
-    choice = input("Enter choice: ").lower()
+def hero_choice(state, choice):
+    """The hero picked by a hero_menu answer, or None (with a message)."""
     if choice == 'q':
-        add_message("Cancelled hero recruitment/training.")
-        return
-
-    hero_map = {'1': "Knight", '2': "Mage", '3': "Rogue"}
-    hero_class = hero_map.get(choice)
+        add_message(state, "Cancelled hero recruitment/training.")
+        return None
+    hero_class = HERO_MENU.get(choice)
     if not hero_class:
-        add_message("Invalid hero choice.")
-        return
-
-    # Check if recruiting or upgrading
-    if heroes[hero_class]["level"] == 0:
-        # Recruiting new hero
-        if hero_class in ["Knight", "Rogue"] and buildings["Barracks"] < 1:
-            add_message("Requires at least 1 Barracks to recruit Knight/Rogue.")
-            return
-        if hero_class == "Mage" and buildings["Arcane Tower"] < 1:
-            add_message("Requires at least 1 Arcane Tower to recruit Mage.")
-            return
-        if current_heroes >= max_heroes:
-            add_message("Cannot recruit more heroes. Upgrade Town Center for more slots.")
-            return
+        add_message(state, "Invalid hero choice.")
+    return hero_class
 
-        recruit_cost_gold = 50
-        recruit_cost_food = 10
-        if resources["Gold"] >= recruit_cost_gold and resources["Food"] >= recruit_cost_food:
-            resources["Gold"] -= recruit_cost_gold
-            Stats.gold_spent += recruit_cost_gold
-            resources["Food"] -= recruit_cost_food
-
-            heroes[hero_class]["level"] = 1
-            add_message(f"Recruited a Level 1 {hero_class}!")
-            quests_per_day += 2
-        else:
-            add_message("Not enough resources to recruit!")
+def recruit_hero(state, hero_class):
+    """
+    Recruit a new Level 1 hero, no prompts.
+    Returns True if the hero joined.
+    """
+    resources = state.resources
+    heroes = state.heroes
+    if heroes[hero_class]["level"] > 0:
+        add_message(state, "{hero} has already been recruited.", hero=hero_class)
+        return False
+    current_heroes = len(heroes.stats().active)
+    max_heroes = state.buildings["Town Center"]
+
+    if hero_class in ["Knight", "Rogue"] and state.buildings["Barracks"] < 1:
+        add_message(state, "Requires at least 1 Barracks to recruit Knight/Rogue.")
+        return False
+    if hero_class == "Mage" and state.buildings["Arcane Tower"] < 1:
+        add_message(state, "Requires at least 1 Arcane Tower to recruit Mage.")
+        return False
+    if current_heroes >= max_heroes:
+        add_message(state, "Cannot recruit more heroes. Upgrade Town Center for more slots.")
+        return False
+
+    recruit_cost_gold = 50
+    recruit_cost_food = 10
+    if resources["Gold"] >= recruit_cost_gold and resources["Food"] >= recruit_cost_food:
+        resources["Gold"] -= recruit_cost_gold
+        state.stats.gold_spent += recruit_cost_gold
+        resources["Food"] -= recruit_cost_food
+
+        heroes[hero_class]["level"] = 1
+        add_message(state, "Recruited a Level 1 {hero}!", hero=hero_class)
+        state.quests_per_day += 2
+        return True
     else:
-        # Upgrading an existing hero
-        lvl = heroes[hero_class]["level"]
-        if lvl >= HERO_MAX_LEVEL:
-            add_message(f"{hero_class} is already at max level.")
-            return
-        needed_xp = HERO_XP_TABLE[lvl - 1]
-        current_xp = heroes[hero_class]["xp"]
-        if current_xp >= needed_xp:
-            heroes[hero_class]["xp"] -= needed_xp
-            heroes[hero_class]["level"] += 1
-            new_lvl = heroes[hero_class]["level"]
-            add_message(f"{hero_class} advanced to Level {new_lvl}!")
-            upgrade_hero_skill(hero_class)
-        else:
-            shortage = needed_xp - current_xp
-            add_message(f"Not enough XP to upgrade {hero_class}. Need {shortage} more XP.")
-
-def upgrade_hero_skill(hero_class):
-    # Show skill options
-    skill_dict = heroes[hero_class]["skills"]
-    add_message(f"Choose a skill to improve for {hero_class}")
-    skill_names = list(skill_dict.keys())
-
-    print("\nWhich skill to upgrade?")
-    for i, skill in enumerate(skill_names, 1):
-        print(f"({i}) {skill} (Rank {skill_dict[skill]})")
-    print("(q) Cancel")
+        add_message(state, "Not enough resources to recruit!")
+        return False
+
+def can_recruit_hero(state, hero_class):
+    """True if recruit_hero() would succeed right now."""
+    buildings = state.buildings
+    if state.heroes[hero_class]["level"] > 0:
+        return False
+    if hero_class in ["Knight", "Rogue"] and buildings["Barracks"] < 1:
+        return False
+    if hero_class == "Mage" and buildings["Arcane Tower"] < 1:
+        return False
+    if len(state.heroes.stats().active) >= buildings["Town Center"]:
+        return False
+    return state.resources["Gold"] >= 50 and state.resources["Food"] >= 10
+
+def can_train_hero(state, hero_class):
+    """True if the hero is recruited, below max level and has the XP to level up."""
+    h = state.heroes[hero_class]
+    lvl = h["level"]
+    return 0 < lvl < HERO_MAX_LEVEL and h["xp"] >= HERO_XP_TABLE[lvl - 1]
+
+def train_hero(state, hero_class):
+    """
+    Spend XP to level up an existing hero, no prompts. The skill point
+    that comes with the level is picked separately (learn_skill).
+    Returns True if the hero levelled up.
+    """
+    heroes = state.heroes
+    lvl = heroes[hero_class]["level"]
+    if lvl == 0:
+        add_message(state, "{hero} hasn't been recruited yet.", hero=hero_class)
+        return False
+    if lvl >= HERO_MAX_LEVEL:
+        add_message(state, "{hero} is already at max level.", hero=hero_class)
+        return False
+    needed_xp = HERO_XP_TABLE[lvl - 1]
+    current_xp = heroes[hero_class]["xp"]
+    if current_xp >= needed_xp:
+        heroes[hero_class]["xp"] -= needed_xp
+        heroes[hero_class]["level"] += 1
+        new_lvl = heroes[hero_class]["level"]
+        add_message(state, "{hero} advanced to Level {level}!", hero=hero_class, level=new_lvl)
+        return True
+    else:
+        shortage = needed_xp - current_xp
+        add_message(state, "Not enough XP to upgrade {hero}. Need {xp} more XP.", hero=hero_class, xp=shortage)
+        return False
 
-    choice = input("Enter choice: ").lower()
+def choose_hero_skill(state, hero_class):
+    """
+    Ask which skill a hero's new level goes into.
+    Returns the skill name, or None if the player cancelled.
+    """
+    return run_steps(skill_steps(state, hero_class))
+
+def skill_steps(state, hero_class):
+    add_message(state, "Choose a skill to improve for {hero}", hero=hero_class)
+    choice = yield Prompt(skill_menu(state, hero_class), "Enter choice: ")
+    return skill_choice(state, hero_class, choice)
+
+def skill_menu(state, hero_class):
+    """The skill menu for one hero, as lines of text."""
+    skill_dict = state.heroes[hero_class]["skills"]
+    lines = ["", "Which skill to upgrade?"]
+    for i, skill in enumerate(skill_dict, 1):
+        lines.append(f"({i}) {skill} (Rank {skill_dict[skill]})")
+    lines.append("(q) Cancel")
+    return lines
+
+def skill_choice(state, hero_class, choice):
+    """The skill picked by a skill_menu answer, or None (with a message)."""
     if choice == 'q':
-        add_message("Cancelled skill upgrade.")
-        return
+        add_message(state, "Cancelled skill upgrade.")
+        return None
 
+    skill_names = list(state.heroes[hero_class]["skills"])
     try:
         idx = int(choice) - 1
         if 0 <= idx < len(skill_names):
-            selected_skill = skill_names[idx]
-            skill_dict[selected_skill] += 1
-            add_message(f"{hero_class}'s {selected_skill} is now Rank {skill_dict[selected_skill]}!")
+            return skill_names[idx]
         else:
-            add_message("Invalid skill choice.")
+            add_message(state, "Invalid skill choice.")
     except ValueError:
-        add_message("Invalid input for skill choice.")
-
-def send_quest():
-    global quests_per_day, quests_today
-    reset_messages()
-    add_message("You chose: Send heroes on a quest")
-    if quests_per_day <= quests_today:
-        add_message("Heroes are tired for today. Wait until tomorrow (End Day).")
+        add_message(state, "Invalid input for skill choice.")
+    return None
+
+def learn_skill(state, hero_class, skill):
+    """Raise one of a hero's skills by a rank, no prompts."""
+    skill_dict = state.heroes[hero_class]["skills"]
+    if skill not in skill_dict:
+        add_message(state, "Invalid skill choice.")
+        return False
+    skill_dict[skill] += 1
+    add_message(state, "{hero}'s {skill} is now Rank {rank}!", hero=hero_class, skill=skill, rank=skill_dict[skill])
+    return True
+
+def send_quest(state):
+    run_steps(quest_steps(state))
+
+def quest_steps(state):
+    reset_messages(state)
+    add_message(state, "You chose: Send heroes on a quest")
+    if state.quests_per_day <= state.quests_today:
+        add_message(state, "Heroes are tired for today. Wait until tomorrow (End Day).")
         return
 
-    quests = [
-        "Gather Resources",
-        "Scout Hydra Location",
-        "Build Hydra Access Route",
-        "Craft Hydra-Slaying Gear"
-    ]
-    quest_difficulties = {
-        "Gather Resources": 50,
-        "Scout Hydra Location": 40,
-        "Build Hydra Access Route": 30,
-        "Craft Hydra-Slaying Gear": 20
-    }
-    print("\nAvailable Quests:")
-    for i, q in enumerate(quests, 1):
-        print(f"({i}) {q}")
-    print("(q) Cancel")
+    quest_name = quest_choice(state, (yield Prompt(quest_menu(), "Pick a quest: ")))
+    if quest_name is None:
+        return
 
-    choice = input("Pick a quest: ").lower()
+    hero_class = yield from quest_hero_steps(state, quest_name)
+    if hero_class is not None:
+        apply(state, Quest(quest_name, hero_class), reset=False)
+
+def quest_menu():
+    """The quest menu, as lines of text."""
+    lines = ["", "Available Quests:"]
+    for i, q in enumerate(QUEST_DIFFICULTIES, 1):
+        lines.append(f"({i}) {q}")
+    lines.append("(q) Cancel")
+    return lines
+
+def quest_choice(state, choice):
+    """The quest picked by a quest_menu answer, or None (with a message)."""
     if choice == 'q':
-        add_message("Cancelled sending on a quest.")
-        return
+        add_message(state, "Cancelled sending on a quest.")
+        return None
 
+    quests = list(QUEST_DIFFICULTIES)
     try:
         q_idx = int(choice) - 1
         if q_idx < 0 or q_idx >= len(quests):
-            add_message("Invalid quest.")
-            return
-        quest_name = quests[q_idx]
-        run_quest(quest_name, quest_difficulties[quest_name])
+            add_message(state, "Invalid quest.")
+            return None
+        return quests[q_idx]
     except ValueError:
-        add_message("Invalid input for quest choice.")
+        add_message(state, "Invalid input for quest choice.")
+        return None
 
-def run_quest(quest_name, difficulty):
-    global quests_today
-    active_heroes = [h for h, d in heroes.items() if d["level"] > 0]
-    if not active_heroes:
-        add_message("No heroes available. Recruit someone first.")
-        return
-    if len(active_heroes) > 1:
-      print(f"\nWhich hero to send on '{quest_name}'?")
-      for i, h in enumerate(active_heroes, 1):
-          print(f"({i}) {h} (Lv {heroes[h]['level']}, XP {heroes[h]['xp']})")
-      print("(q) Cancel quest")
-
-      choice = input("Pick a hero: ").lower()
-      if choice == 'q':
-          add_message("Cancelled quest.")
-          return
-    else:
-      choice = 1
+def choose_quest_hero(state, quest_name):
+    """
+    Ask which hero to send on a quest (no question if there's only one).
+    Returns the hero class, or None if there's nobody or the player cancelled.
+    """
+    return run_steps(quest_hero_steps(state, quest_name))
 
+def quest_hero_steps(state, quest_name):
+    active_heroes = state.heroes.stats().active
+    if not active_heroes:
+        add_message(state, "No heroes available. Recruit someone first.")
+        return None
+    if len(active_heroes) == 1:
+        return active_heroes[0]
+    choice = yield Prompt(quest_hero_menu(state, quest_name, active_heroes), "Pick a hero: ")
+    return quest_hero_choice(state, active_heroes, choice)
+
+def quest_hero_menu(state, quest_name, active_heroes):
+    """The pick-a-hero menu for a quest, as lines of text."""
+    heroes = state.heroes
+    lines = ["", f"Which hero to send on '{quest_name}'?"]
+    for i, h in enumerate(active_heroes, 1):
+        lines.append(f"({i}) {h} (Lv {heroes[h]['level']}, XP {heroes[h]['xp']})")
+    lines.append("(q) Cancel quest")
+    return lines
+
+def quest_hero_choice(state, active_heroes, choice):
+    """The hero picked by a quest_hero_menu answer, or None (with a message)."""
+    if choice == 'q':
+        add_message(state, "Cancelled quest.")
+        return None
     try:
         h_idx = int(choice) - 1
         if h_idx < 0 or h_idx >= len(active_heroes):
-            add_message("Invalid hero choice.")
-            return
-        hero_class = active_heroes[h_idx]
+            add_message(state, "Invalid hero choice.")
+            return None
+        return active_heroes[h_idx]
     except ValueError:
-        add_message("Invalid input for hero choice.")
-        return
+        add_message(state, "Invalid input for hero choice.")
+        return None
 
-    quests_today += 1
-    hero_power = get_hero_combat_power(hero_class)
-    hero_level = get_hero_level(hero_class)
+def run_quest(state, quest_name, difficulty, hero_class=None):
+    """
+    Send one hero on one quest. If hero_class is None and there's more
+    than one hero to pick from, ask the player.
+    Returns True/False for success/failure, or None if nobody went.
+    """
+    if hero_class is None:
+        hero_class = choose_quest_hero(state, quest_name)
+        if hero_class is None:
+            return None
+    elif hero_class not in state.heroes.stats().active:
+        add_message(state, "Invalid hero choice.")
+        return None
+
+    state.quests_today += 1
+    success_chance = quest_success_chance(state, hero_class, difficulty)
+
+    roll = state.rng.randint(1, 100)
+    if roll <= success_chance:
+        add_message(state, "Success on '{quest}'! (roll {roll} <= {chance})", "quest",
+                    quest=quest_name, roll=roll, chance=success_chance)
+        apply_quest_success(state, quest_name, hero_class)
+        return True
+    else:
+        add_message(state, "Failure on '{quest}' (roll {roll} > {chance}). +1 XP to {hero}.", "quest",
+                    quest=quest_name, roll=roll, chance=success_chance, hero=hero_class)
+        apply_quest_failure(state, hero_class)
+        return False
+
+def quest_success_chance(state, hero_class, difficulty, hero_power=None):
+    """Percent chance (capped at 95) that hero_class succeeds at a quest."""
+    if hero_power is None:
+        hero_power = get_hero_combat_power(state, hero_class)
     success_chance = difficulty + hero_power
     if success_chance > 95:
         success_chance = 95
+    return success_chance
 
-    roll = random.randint(1, 100)
-    if roll <= success_chance:
-        add_message(f"Success on '{quest_name}'! (roll {roll} <= {success_chance})")
-        Stats.quests_succeeded += 1
-        if quest_name == "Gather Resources":
-            gold_gain = random.randint((hero_level*10), (hero_level*10)+20)
-            food_gain = random.randint(hero_level*5, hero_level*10)
-            resources["Gold"] += gold_gain
-            resources["Food"] += food_gain
-            heroes[hero_class]["xp"] += 2
-            Stats.xp_gained += 2
-            add_message(f"Gained {gold_gain} Gold, {food_gain} Food, and 2 XP for {hero_class}.")
-        elif quest_name == "Scout Hydra Location":
+def apply_quest_success(state, quest_name, hero_class):
+    """
+    Hand out the rewards for a successful quest.
+    Returns the (gold, food, xp) that were gained.
+    """
+    resources = state.resources
+    hero = state.heroes[hero_class]
+    hydra_progress = state.hydra_progress
+    stats = state.stats
+    hero_level = hero.level
+    gold_gain = food_gain = xp_gain = 0
+
+    stats.quests_succeeded += 1
+    if quest_name == "Gather Resources":
+        gold_gain = state.rng.randint((hero_level*10), (hero_level*10)+20)
+        food_gain = state.rng.randint(hero_level*5, hero_level*10)
+        xp_gain = 2
+        resources["Gold"] += gold_gain
+        resources["Food"] += food_gain
+        add_message(state, "Gained {gold} Gold, {food} Food, and 2 XP for {hero}.", "quest",
+                    gold=gold_gain, food=food_gain, hero=hero_class)
+    elif quest_name == "Scout Hydra Location":
+        if not hydra_progress["located"]:
+            hydra_progress["located"] = True
+            xp_gain = 3
+            add_message(state, "Hydra's lair discovered! +3 XP", "quest")
+        else:
+            add_message(state, "Already know where Hydra is. No new info.", "quest")
+    elif quest_name == "Build Hydra Access Route":
+        if hydra_progress["located"] and not hydra_progress["access"]:
+            hydra_progress["access"] = True
+            xp_gain = 3
+            add_message(state, "Route to Hydra established! +3 XP", "quest")
+        else:
             if not hydra_progress["located"]:
-                hydra_progress["located"] = True
-                heroes[hero_class]["xp"] += 3
-                add_message("Hydra's lair discovered! +3 XP")
-                Stats.xp_gained += 3
-            else:
-                add_message("Already know where Hydra is. No new info.")
-        elif quest_name == "Build Hydra Access Route":
-            if hydra_progress["located"] and not hydra_progress["access"]:
-                hydra_progress["access"] = True
-                heroes[hero_class]["xp"] += 3
-                Stats.xp_gained += 3
-                add_message("Route to Hydra established! +3 XP")
+                add_message(state, "You don't know where Hydra is yet! No effect.", "quest")
             else:
-                if not hydra_progress["located"]:
-                    add_message("You don't know where Hydra is yet! No effect.")
-                else:
-                    add_message("Access already built.")
-        elif quest_name == "Craft Hydra-Slaying Gear":
-            if buildings["Blacksmith"] >= 2 or buildings["Arcane Tower"] >= 2:
-                if not hydra_progress["gear"]:
-                    hydra_progress["gear"] = True
-                    heroes[hero_class]["xp"] += 3
-                    Stats.xp_gained += 3
-                    add_message("Dragonsteel gear forged! +3 XP")
-                else:
-                    add_message("Gear already crafted.")
+                add_message(state, "Access already built.", "quest")
+    elif quest_name == "Craft Hydra-Slaying Gear":
+        if state.buildings["Blacksmith"] >= 2 or state.buildings["Arcane Tower"] >= 2:
+            if not hydra_progress["gear"]:
+                hydra_progress["gear"] = True
+                xp_gain = 3
+                add_message(state, "Dragonsteel gear forged! +3 XP", "quest")
             else:
-                add_message("Need at least Lv2 Blacksmith or Arcane Tower for gear.")
-        if (hydra_progress["located"] and 
-            hydra_progress["access"] and 
-            hydra_progress["gear"]):
-            hydra_progress["fight_unlocked"] = True
-            add_message("All prerequisites met! Final battle unlocked.")
-    else:
-        add_message(f"Failure on '{quest_name}' (roll {roll} > {success_chance}). +1 XP to {hero_class}.")
-        heroes[hero_class]["xp"] += 1
-        Stats.quests_failed += 1
-        Stats.xp_gained += 1
-
-def attempt_final_battle():
-    reset_messages()
-    add_message("You chose: Attempt final Hydra battle")
-    if not hydra_progress["fight_unlocked"]:
-        add_message("You haven't completed all Hydra prerequisites!")
-        return
+                add_message(state, "Gear already crafted.", "quest")
+        else:
+            add_message(state, "Need at least Lv2 Blacksmith or Arcane Tower for gear.", "quest")
+
+    hero.xp += xp_gain
+    stats.xp_gained += xp_gain
+
+    if (hydra_progress["located"] and
+        hydra_progress["access"] and
+        hydra_progress["gear"]):
+        hydra_progress["fight_unlocked"] = True
+        add_message(state, "All prerequisites met! Final battle unlocked.", "quest")
+    return gold_gain, food_gain, xp_gain
+
+def apply_quest_failure(state, hero_class):
+    """A failed quest still teaches the hero something: +1 XP."""
+    state.heroes[hero_class].xp += 1
+    state.stats.quests_failed += 1
+    state.stats.xp_gained += 1
 
-    total_power = sum(get_hero_combat_power(h) for h in heroes if heroes[h]["level"] > 0)
+def resolve_quests(state, batch):
+    """
+    Non-interactive quest resolution for bots and balance sweeps.
+    `batch` is a list of (quest_name, hero_class) pairs, resolved in order.
+
+    Each quest rolls and pays out before the next one rolls, exactly like
+    run_quest() does, so a batch draws the same numbers from state.rng as
+    the same quests sent one by one and ends in the same state (a Scout
+    earlier in the batch can unlock a Build Access later in it). What the
+    batch saves is the per-quest overhead: the checks happen once up
+    front, each hero's success chance is worked out once per batch (quests
+    only hand out XP, so power can't change mid-batch), and nothing is
+    posted per quest.
+
+    Quests past today's limit, unknown quests and heroes that haven't been
+    recruited are skipped. Returns a summary dict with the per-quest
+    results and the totals gained.
+    """
+    summary = {
+        "succeeded": 0,
+        "failed": 0,
+        "skipped": 0,
+        "gold": 0,
+        "food": 0,
+        "xp": {},
+        "results": [],
+    }
+    team = state.heroes.stats()
+    powers = {h: team.power[h] for h in team.active}
+
+    remaining = max(0, state.quests_per_day - state.quests_today)
+    valid = []
+    for quest_name, hero_class in batch:
+        if len(valid) >= remaining or quest_name not in QUEST_DIFFICULTIES or hero_class not in powers:
+            summary["skipped"] += 1
+            continue
+        valid.append((quest_name, hero_class))
+
+    chances = {}
+    randint = state.rng.randint
+    xp_totals = summary["xp"]
+    for quest_name, hero_class in valid:
+        key = (QUEST_DIFFICULTIES[quest_name], hero_class)
+        chance = chances.get(key)
+        if chance is None:
+            chance = chances[key] = quest_success_chance(state, hero_class, key[0], powers[hero_class])
+        state.quests_today += 1
+        roll = randint(1, 100)
+        success = roll <= chance
+        if success:
+            gold_gain, food_gain, xp_gain = apply_quest_success(state, quest_name, hero_class)
+            summary["succeeded"] += 1
+            summary["gold"] += gold_gain
+            summary["food"] += food_gain
+        else:
+            apply_quest_failure(state, hero_class)
+            xp_gain = 1
+            summary["failed"] += 1
+        xp_totals[hero_class] = xp_totals.get(hero_class, 0) + xp_gain
+        summary["results"].append({
+            "quest": quest_name,
+            "hero": hero_class,
+            "roll": roll,
+            "chance": chance,
+            "success": success,
+        })
+    return summary
+
+def attempt_final_battle(state):
+    """Fight the Hydra. Returns True if it was slain, False if we lost, None if no fight."""
+    heroes = state.heroes
+    reset_messages(state)
+    add_message(state, "You chose: Attempt final Hydra battle")
+    if not state.hydra_progress["fight_unlocked"]:
+        add_message(state, "You haven't completed all Hydra prerequisites!")
+        return None
+
+    total_power = heroes.stats().total_power
     if total_power == 0:
-        add_message("No heroes available to fight!")
-        return
+        add_message(state, "No heroes available to fight!")
+        return None
 
-    add_message(f"Your team's total combat power is {total_power}. Hydra HP: {HYDRA_HP}.")
+    add_message(state, "Your team's total combat power is {power}. Hydra HP: {hp}.", "battle",
+                power=total_power, hp=HYDRA_HP)
     hydra_hp = HYDRA_HP
     your_team_hp = total_power * 2
+    # A long fight is a lot of messages: skip them when nobody's listening
+    log_rounds = state.messages.enabled
 
     round_num = 0
     while hydra_hp > 0 and your_team_hp > 0:
         round_num += 1
-        dmg_to_hydra = int(random.uniform(total_power*0.8, total_power*1.2))
-        dmg_from_hydra = int(random.uniform(HYDRA_DAMAGE*0.8, HYDRA_DAMAGE*1.2))
+        dmg_to_hydra = int(state.rng.uniform(total_power*0.8, total_power*1.2))
+        dmg_from_hydra = int(state.rng.uniform(HYDRA_DAMAGE*0.8, HYDRA_DAMAGE*1.2))
 
         hydra_hp -= dmg_to_hydra
         your_team_hp -= dmg_from_hydra
 
-        add_message(f"Round {round_num}: You deal {dmg_to_hydra}, Hydra deals {dmg_from_hydra}")
+        if log_rounds:
+            add_message(state, "Round {round}: You deal {dealt}, Hydra deals {taken}", "battle",
+                        round=round_num, dealt=dmg_to_hydra, taken=dmg_from_hydra)
         if hydra_hp <= 0:
-            add_message("Hydra is slain! Victory!")
-            Stats.hydras_slain += 1
-            victory()
-            return
+            add_message(state, "Hydra is slain! Victory!", "battle")
+            state.stats.hydras_slain += 1
+            victory(state)
+            return True
         elif your_team_hp <= 0:
-            add_message("Your heroes have been defeated and the Hydra flees. Rebuild and try again.")
+            add_message(state, "Your heroes have been defeated and the Hydra flees. Rebuild and try again.", "battle")
 
-            hydra_progress['located'] = False
-            return
+            state.hydra_progress['located'] = False
+            return False
 
-def victory():
-    add_message("Congratulations! The Hydra is slain, your kingdom is saved! I'm sure it will stay dead and not come back stronger that'd be weird!")
-    add_message(Stats.__dict__)
+def victory(state):
+    add_message(state, "Congratulations! The Hydra is slain, your kingdom is saved! I'm sure it will stay dead and not come back stronger that'd be weird!", "battle")
+    add_message(state, "{stats}", "stats", stats=dict(vars(state.stats)))
     # You can keep playing or end.
 
+# -------------------------------------------------------------------
+# ORDERS
+# -------------------------------------------------------------------
+# Instead of coming back to the menus every day, a kingdom can queue a
+# plan: "Farm to Lv 3, then Trading Hall to Lv 2, then train the Knight".
+# state.orders holds Order commands (see ACTIONS). end_turn() works
+# through them front to back once the day's food and gold are in,
+# carrying out whatever it can afford and stopping at the first order it
+# can't yet, so the plan happens in the order it was given. An order that
+# no amount of gold would carry out as things stand (a Rogue with no
+# Barracks, a hero with no free slot) doesn't hold up the rest: it stays
+# queued, with a message each day, and the queue moves on past it. An
+# order is done (and dropped) as soon as its target level is reached,
+# however that happened.
+#
+# Queued orders aren't part of a save file; a Journal keeps them with
+# its checkpoints.
+
+def order_text(order):
+    if order.kind == "build":
+        return f"{order.name} to Lv {order.level}"
+    if order.kind == "recruit":
+        return f"Recruit {order.name}"
+    return f"Train {order.name} to Lv {order.level}"
+
+def order_done(state, order):
+    if order.kind == "build":
+        return state.buildings[order.name] >= order.level
+    return state.heroes[order.name]["level"] >= order.level
+
+def order_blocker(state, order):
+    """Why an order can't be carried out yet however rich we are, or None."""
+    if order.kind == "recruit":
+        buildings = state.buildings
+        if order.name in ("Knight", "Rogue") and buildings["Barracks"] < 1:
+            return "needs a Barracks"
+        if order.name == "Mage" and buildings["Arcane Tower"] < 1:
+            return "needs an Arcane Tower"
+        if len(state.heroes.stats().active) >= buildings["Town Center"]:
+            return "no free hero slot, upgrade the Town Center"
+    elif order.kind == "train" and state.heroes[order.name]["level"] == 0:
+        return "not recruited yet"
+    return None
+
+def process_orders(state):
+    """
+    Carry out queued orders, no prompts, until one can't be afforded yet.
+    Orders that can't happen at all for now are skipped (and stay queued).
+    """
+    orders = state.orders
+    i = 0
+    while i < len(orders):
+        order = orders[i]
+        if order_done(state, order):
+            del orders[i]
+            add_message(state, "Order done: {order}.", "day", order=order_text(order))
+            continue
+        blocker = order_blocker(state, order)
+        if blocker:
+            add_message(state, "Order on hold: {order} ({reason}).", "day",
+                        order=order_text(order), reason=blocker)
+            i += 1
+            continue
+
+        if order.kind == "build":
+            if not can_upgrade_building(state, order.name):
+                return
+            upgrade_building(state, order.name)
+        elif order.kind == "recruit":
+            if not can_recruit_hero(state, order.name):
+                return
+            recruit_hero(state, order.name)
+        else:
+            if not can_train_hero(state, order.name):
+                return
+            train_hero(state, order.name)
+            skills = state.heroes[order.name]["skills"]
+            learn_skill(state, order.name, order.skill or min(skills, key=skills.get))
+
+# Menu key => order kind
+ORDER_MENU = {'b': "build", 'r': "recruit", 't': "train"}
+
+def orders_menu(state):
+    """The order queue and what can be done with it, as lines of text."""
+    lines = ["", "Orders (carried out at the end of each day, in this order):"]
+    if not state.orders:
+        lines.append("  (none queued)")
+    for i, order in enumerate(state.orders, 1):
+        lines.append(f"  {i}. {order_text(order)}")
+    lines.append("")
+    lines.append("(b) Queue a building upgrade")
+    lines.append("(r) Queue recruiting a hero")
+    lines.append("(t) Queue training a hero")
+    lines.append("(c) Clear all orders")
+    lines.append("(q) Back")
+    return lines
+
+def order_target_menu(state, kind):
+    """What a new order of this kind could be for, as lines of text."""
+    if kind == "build":
+        return [f"({code}) {bld} (Lv {state.buildings[bld]}/{BUILDING_INFO[bld]['max_level']})"
+                for code, bld in BUILD_MENU.items()] + ["(q) Cancel"]
+    return [f"({code}) {hclass} (Lv {state.heroes[hclass]['level']})"
+            for code, hclass in HERO_MENU.items()] + ["(q) Cancel"]
+
+def order_target_choice(state, kind, choice):
+    """The building/hero picked by an order_target_menu answer, or None (with a message)."""
+    if kind == "build":
+        return build_choice(state, choice)
+    return hero_choice(state, choice)
+
+def order_level_choice(state, choice):
+    """The level typed in for a build order, or None (with a message)."""
+    if choice.isdigit():
+        return int(choice)
+    add_message(state, "Invalid level.")
+    return None
+
+def manage_orders(state):
+    run_steps(order_steps(state))
+
+def order_steps(state):
+    reset_messages(state)
+    choice = yield Prompt(orders_menu(state), "Enter choice: ")
+    if choice == 'c':
+        apply(state, ClearOrders(), reset=False)
+    elif choice in ORDER_MENU:
+        kind = ORDER_MENU[choice]
+        name = order_target_choice(state, kind, (yield Prompt(order_target_menu(state, kind), "Enter choice: ")))
+        if name is None:
+            return
+        level = None
+        if kind == "build":
+            level = order_level_choice(state, (yield Prompt([], f"Upgrade {name} up to which level? ")))
+            if level is None:
+                return
+        apply(state, Order(kind, name, level), reset=False)
+
+# -------------------------------------------------------------------
+# ACTIONS (non-interactive)
+# -------------------------------------------------------------------
+"""
+Bots (and the menus above) drive the game by handing commands to apply():
+
+    result = apply(state, Build("Farm"))
+    apply(state, Recruit("Mage"))
+    apply(state, Train("Mage", "Elemental Blast"))
+    apply(state, Quest("scout", hero="Rogue"))
+    apply(state, Battle())
+    apply(state, EndDay())
+    apply(state, Order("build", "Farm", 3))   # queued, see ORDERS
+    apply(state, Order("train", "Knight"))    # one more level
+
+Nothing here prints or waits for input. apply() returns a Result:
+- ok:       whether the action actually happened
+- value:    quest success / battle victory (True/False), else None
+- messages: the Message records the action produced (str() gives the text)
+"""
+
+Build = namedtuple("Build", ["building"])
+Recruit = namedtuple("Recruit", ["hero"])
+Train = namedtuple("Train", ["hero", "skill"], defaults=[None])  # No skill = no skill point
+Quest = namedtuple("Quest", ["quest", "hero"], defaults=[None])  # hero optional if you only have one
+Battle = namedtuple("Battle", [])
+EndDay = namedtuple("EndDay", [])
+Debug = namedtuple("Debug", ["what"])  # "all", "hydra" or a resource name
+# kind is "build", "recruit" or "train"; level is the one to reach (default:
+# one up from now); skill is where a train order's skill points go
+# (default: the hero's least trained skill)
+Order = namedtuple("Order", ["kind", "name", "level", "skill"], defaults=[None, None])
+ClearOrders = namedtuple("ClearOrders", [])
+
+Result = namedtuple("Result", ["ok", "value", "messages"])
+
+# Short names bots can use for Quest(...)
+QUEST_KEYS = {
+    "gather": "Gather Resources",
+    "scout": "Scout Hydra Location",
+    "access": "Build Hydra Access Route",
+    "gear": "Craft Hydra-Slaying Gear",
+}
+
+def apply(state, command, reset=True):
+    """
+    Carry out one command on `state`. With reset=False the action's
+    messages are added to whatever is already in the message list.
+    """
+    handler = ACTION_HANDLERS.get(type(command))
+    if handler is None:
+        raise TypeError(f"Not a game command: {command!r}")
+    if reset:
+        reset_messages(state)
+    ok, value = handler(state, command)
+    if state.journal is not None:
+        state.journal.record(state, command)
+    return Result(ok, value, list(state.messages.recent))
+
+def _do_build(state, command):
+    if command.building not in state.buildings:
+        add_message(state, "Invalid building choice.")
+        return False, None
+    return upgrade_building(state, command.building), None
+
+def _do_recruit(state, command):
+    if command.hero not in state.heroes:
+        add_message(state, "Invalid hero choice.")
+        return False, None
+    return recruit_hero(state, command.hero), None
+
+def _do_train(state, command):
+    if command.hero not in state.heroes:
+        add_message(state, "Invalid hero choice.")
+        return False, None
+    if not train_hero(state, command.hero):
+        return False, None
+    if command.skill is not None:
+        learn_skill(state, command.hero, command.skill)
+    return True, None
+
+def _do_quest(state, command):
+    if state.quests_per_day <= state.quests_today:
+        add_message(state, "Heroes are tired for today. Wait until tomorrow (End Day).")
+        return False, None
+    quest_name = QUEST_KEYS.get(command.quest, command.quest)
+    if quest_name not in QUEST_DIFFICULTIES:
+        add_message(state, "Invalid quest.")
+        return False, None
+    hero_class = command.hero
+    if hero_class is None:
+        # Never prompt from here: only fill in the hero when there's no choice
+        active_heroes = state.heroes.stats().active
+        if len(active_heroes) != 1:
+            add_message(state, "Pick a hero for the quest.")
+            return False, None
+        hero_class = active_heroes[0]
+    success = run_quest(state, quest_name, QUEST_DIFFICULTIES[quest_name], hero_class)
+    return success is not None, success
+
+def _do_battle(state, command):
+    won = attempt_final_battle(state)
+    return won is not None, won
+
+def _do_end_day(state, command):
+    end_day(state)
+    return True, None
+
+def _do_order(state, command):
+    kind, name = command.kind, command.name
+    if kind == "build" and name in state.buildings:
+        current = state.buildings[name]
+        max_level = BUILDING_INFO[name]["max_level"]
+    elif kind in ("recruit", "train") and name in state.heroes:
+        current = state.heroes[name]["level"]
+        max_level = 1 if kind == "recruit" else HERO_MAX_LEVEL
+    else:
+        add_message(state, "Invalid order.")
+        return False, None
+    if command.skill is not None and (kind != "train" or command.skill not in state.heroes[name]["skills"]):
+        add_message(state, "Invalid skill choice.")
+        return False, None
+
+    level = command.level
+    if level is None:
+        level = 1 if kind == "recruit" else current + 1
+    if level <= current:
+        add_message(state, "{name} is already at Lv {level}.", name=name, level=current)
+        return False, None
+    if level > max_level:
+        add_message(state, "{name} only goes up to Lv {level}.", name=name, level=max_level)
+        return False, None
+    order = command._replace(level=level)
+    state.orders.append(order)
+    add_message(state, "Queued: {order}.", order=order_text(order))
+    return True, None
+
+def _do_clear_orders(state, command):
+    state.orders.clear()
+    add_message(state, "Cleared all orders.")
+    return True, None
+
+def _do_debug(state, command):
+    resources = state.resources
+    what = command.what.lower()
+    if what == "all":
+        for r in resources:
+            resources[r] += 500
+    elif what == "hydra":
+        for key in state.hydra_progress.keys():
+            state.hydra_progress[key] = True
+    elif what.capitalize() in resources:
+        resources[what.capitalize()] += 500
+    add_message(state, "Performed debug: {what}. Cheater.", "debug", what=what.capitalize())
+    state.stats.debug_used += 1
+    add_message(state, "Debug used count: {count}", "debug", count=state.stats.debug_used)
+    return True, None
+
+ACTION_HANDLERS = {
+    Build: _do_build,
+    Recruit: _do_recruit,
+    Train: _do_train,
+    Quest: _do_quest,
+    Battle: _do_battle,
+    EndDay: _do_end_day,
+    Order: _do_order,
+    ClearOrders: _do_clear_orders,
+    Debug: _do_debug,
+}
+
+# -------------------------------------------------------------------
+# SAVE / LOAD
+# -------------------------------------------------------------------
+# A kingdom packs into one fixed-size binary snapshot (SNAPSHOT.size bytes,
+# under a hundred), little-endian, in this order:
+#
+#     version, seed, day, quests used today, quests per day
+#     Gold, Food, Arcane
+#     one level per building (BUILDING_NAMES order)
+#     per hero (HERO_CLASSES order): level, xp, one rank per skill
+#     hydra progress flags as a bitfield (HYDRA_FLAGS order)
+#     recent_events as EVENTS positions + 1 (0 = empty slot)
+#     Player_Stats counters (STAT_FIELDS order)
+#
+# The RNG's internal state doesn't fit in a few dozen bytes, so a loaded
+# game reseeds from its seed and day: the same snapshot always continues
+# the same way, but not necessarily the way the original game went on.
+
+SNAPSHOT_VERSION = 1
+SAVE_FILE = "hydra.sav"
+
+# Player_Stats fields and their struct codes (I = u32, H = u16)
+STAT_FIELDS = (
+    ("gold_spent", "I"),
+    ("food_eaten", "I"),
+    ("arcane_made", "I"),
+    ("quests_succeeded", "I"),
+    ("quests_failed", "I"),
+    ("xp_gained", "I"),
+    ("random_events_held", "H"),
+    ("hydras_slain", "H"),
+    ("debug_used", "H"),
+    ("turn_count", "H"),
+    ("starvation_days", "H"),
+)
+
+SNAPSHOT = struct.Struct(
+    "<BQHBB"
+    + "i" * len(RESOURCE_NAMES)
+    + "B" * len(BUILDING_NAMES)
+    + "".join("BI" + "B" * len(HERO_SKILLS[h]) for h in HERO_CLASSES)
+    + "B"
+    + "B" * RECENT_EVENTS_MAX
+    + "".join(code for _, code in STAT_FIELDS)
+)
+
+# Event name => position in EVENTS + 1, for snapshots
+EVENT_NUMBERS = {evt["name"]: i for i, evt in enumerate(EVENTS, 1)}
+
+def pack_state(state):
+    """The state as a SNAPSHOT.size-byte snapshot."""
+    values = [SNAPSHOT_VERSION, state.seed, state.turn_count, state.quests_today, state.quests_per_day]
+    values += state.resources.values()
+    values += state.buildings.values()
+    for h in state.heroes.values():
+        values += [h.level, h.xp]
+        values += h.skills.values()
+    flags = 0
+    for bit, flag in enumerate(HYDRA_FLAGS):
+        if state.hydra_progress[flag]:
+            flags |= 1 << bit
+    values.append(flags)
+    recent = [EVENT_NUMBERS[name] for name in state.recent_events[-RECENT_EVENTS_MAX:]]
+    values += recent + [0] * (RECENT_EVENTS_MAX - len(recent))
+    values += [getattr(state.stats, field) for field, _ in STAT_FIELDS]
+    return SNAPSHOT.pack(*values)
+
+def unpack_state(data, offset=0):
+    """Rebuild a GameState from a snapshot in `data` (bytes, mmap, ...) at `offset`."""
+    values = iter(SNAPSHOT.unpack_from(data, offset))
+    version = next(values)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    seed = next(values)
+    turn_count = next(values)
+    state = GameState(derive_seed(seed, "day", turn_count))
+    state.seed = seed
+    state.turn_count = turn_count
+    state.quests_today = next(values)
+    state.quests_per_day = next(values)
+    for counts in (state.resources, state.buildings):
+        counts.values()[:] = array("q", itertools.islice(values, len(counts)))
+    for h in state.heroes.values():
+        h.level = next(values)
+        h.xp = next(values)
+        h.skills.values()[:] = array("q", itertools.islice(values, len(h.skills)))
+    state.heroes.changed()
+    flags = next(values)
+    for bit, flag in enumerate(HYDRA_FLAGS):
+        state.hydra_progress[flag] = bool(flags & (1 << bit))
+    for _ in range(RECENT_EVENTS_MAX):
+        number = next(values)
+        if number:
+            state.recent_events.append(EVENTS[number - 1]["name"])
+    for field, _ in STAT_FIELDS:
+        setattr(state.stats, field, next(values))
+    return state
+
+def save_game(state, path=SAVE_FILE):
+    with open(path, "wb") as f:
+        f.write(pack_state(state))
+
+def load_game(path=SAVE_FILE):
+    with open(path, "rb") as f:
+        return unpack_state(f.read())
+
+class SnapshotStore():
+    """
+    An append-only file of snapshots, memory-mapped for reading, so any
+    one kingdom can be loaded by index without touching the rest:
+
+        with SnapshotStore("kingdoms.snap") as store:
+            store.append(state)
+            state = store[123456]
+    """
+    MAGIC = b"HYDRASNP"
+    HEADER = struct.Struct("<8sHH")  # magic, snapshot version, record size
+
+    def __init__(self, path):
+        self.path = path
+        self.record_size = SNAPSHOT.size
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, SNAPSHOT_VERSION, self.record_size))
+        self.file = open(path, "r+b")
+        magic, version, record_size = self.HEADER.unpack(self.file.read(self.HEADER.size))
+        if magic != self.MAGIC or version != SNAPSHOT_VERSION or record_size != self.record_size:
+            self.file.close()
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} snapshot store")
+        self.count = (os.path.getsize(path) - self.HEADER.size) // self.record_size
+        self.map = None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, state):
+        """Add a snapshot of `state`; returns its index."""
+        self.file.seek(self.HEADER.size + self.count * self.record_size)
+        self.file.write(pack_state(state))
+        self.count += 1
+        return self.count - 1
+
+    def extend(self, states):
+        self.file.seek(self.HEADER.size + self.count * self.record_size)
+        data = b"".join(pack_state(s) for s in states)
+        self.file.write(data)
+        self.count += len(data) // self.record_size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("snapshot index out of range")
+        offset = self.HEADER.size + index * self.record_size
+        if self.map is None or len(self.map) < offset + self.record_size:
+            # (Re)map after appends have grown the file
+            self.file.flush()
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return unpack_state(self.map, offset)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# -------------------------------------------------------------------
+# JOURNAL
+# -------------------------------------------------------------------
+# An append-only record of a game: its seed, then every command that went
+# through apply(), one JSON object per line. Replaying the commands on the
+# same seed rebuilds the game exactly, dice and all.
+#
+#     {"journal": 1, "seed": 1234, "checkpoint_every": 50}
+#     {"checkpoint": 1, "at": 0, "state": "<base64 snapshot>", "rng": [...]}
+#     {"do": "Build", "args": ["Farm"]}
+#     {"do": "EndDay", "args": []}
+#     ...
+#
+# Every checkpoint_every days the journal also stores a checkpoint: a
+# snapshot plus the RNG's full internal state, and how many commands had
+# been applied by then. replay() starts from the last checkpoint before
+# the day it's asked for, so seeking to day 400 only re-simulates the
+# days since the last checkpoint. There's always one for the first day,
+# which also covers journals started from a loaded game.
+#
+# Journals only ever append, so one file can hold several sessions (the
+# game's own JOURNAL_FILE gets one per launch), each starting with its
+# header line and that first checkpoint. load() reads back the latest.
+
+JOURNAL_VERSION = 1
+JOURNAL_FILE = "hydra_journal.jsonl"
+JOURNAL_CHECKPOINT_DAYS = 50
+
+# Command name => command type, for reading journals back
+COMMAND_TYPES = {cmd.__name__: cmd for cmd in ACTION_HANDLERS}
+
+Checkpoint = namedtuple("Checkpoint", ["day", "at", "snapshot", "rng_state", "orders"])
+
+class Journal():
+    """
+    Records every command applied to `state` from now on (and appends them
+    to `path`, if given). Read one back with Journal.load(path) and rebuild
+    any day of the game with replay(day).
+    """
+    def __init__(self, state=None, path=None, checkpoint_every=JOURNAL_CHECKPOINT_DAYS):
+        self.checkpoint_every = checkpoint_every
+        self.commands = []
+        self.checkpoints = []
+        self.file = None
+        if state is None:
+            # Filled in by load()
+            self.seed = None
+            return
+        self.seed = state.seed
+        if path is not None:
+            self.file = open(path, "a", buffering=1)  # Line buffered: survives crashes
+            self._write({"journal": JOURNAL_VERSION, "seed": self.seed, "checkpoint_every": checkpoint_every})
+        self.checkpoint(state)
+        state.journal = self
+
+    def _write(self, entry):
+        if self.file is not None:
+            self.file.write(json.dumps(entry) + "\n")
+
+    def record(self, state, command):
+        self.commands.append(command)
+        self._write({"do": type(command).__name__, "args": list(command)})
+        if isinstance(command, EndDay) and state.turn_count % self.checkpoint_every == 0:
+            self.checkpoint(state)
+
+    def checkpoint(self, state):
+        cp = Checkpoint(state.turn_count, len(self.commands), pack_state(state), state.rng.getstate(),
+                        tuple(state.orders))
+        self.checkpoints.append(cp)
+        self._write({
+            "checkpoint": cp.day,
+            "at": cp.at,
+            "state": base64.b64encode(cp.snapshot).decode("ascii"),
+            "rng": cp.rng_state,
+            "orders": [list(order) for order in cp.orders],
+        })
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    @classmethod
+    def load(cls, path, session=-1):
+        """Read back one session of a journal file: the latest, or `session` (0 = the first)."""
+        # Split on the header lines, but only parse the session we want
+        sessions = []
+        with open(path) as f:
+            for line in f:
+                if line.startswith('{"journal"'):
+                    sessions.append([])
+                if sessions:
+                    sessions[-1].append(line)
+        if not sessions:
+            raise ValueError(f"{path} is not a journal")
+        header, *lines = sessions[session]
+
+        journal = cls()
+        header = json.loads(header)
+        if header.get("journal") != JOURNAL_VERSION:
+            raise ValueError(f"{path} is not a version {JOURNAL_VERSION} journal")
+        journal.seed = header["seed"]
+        journal.checkpoint_every = header["checkpoint_every"]
+        for line in lines:
+            entry = json.loads(line)
+            if "do" in entry:
+                journal.commands.append(COMMAND_TYPES[entry["do"]](*entry["args"]))
+            else:
+                version, internal, gauss = entry["rng"]
+                journal.checkpoints.append(Checkpoint(
+                    entry["checkpoint"], entry["at"],
+                    base64.b64decode(entry["state"]), (version, tuple(internal), gauss),
+                    tuple(Order(*order) for order in entry.get("orders", [])),
+                ))
+        return journal
+
+    def replay(self, day=None):
+        """
+        The game as it stood at the start of `day` (before any of that
+        day's commands), or after the last command if day is None.
+        """
+        start = self.checkpoints[0]
+        for cp in self.checkpoints:
+            if day is not None and cp.day > day:
+                break
+            start = cp
+        state = unpack_state(start.snapshot)
+        state.rng.setstate(start.rng_state)
+        state.orders.extend(start.orders)
+        for command in self.commands[start.at:]:
+            if day is not None and state.turn_count >= day:
+                break
+            apply(state, command)
+        return state
+
+# -------------------------------------------------------------------
+# DAY RECORDER
+# -------------------------------------------------------------------
+# Player_Stats only keeps running totals. A DayRecorder keeps the whole
+# story: one row per finished day (resources, building and hero levels,
+# food eaten, the event that fired, quest results...), stored column by
+# column in typed arrays. That's RECORD_BYTES (34) bytes a day, so
+# thousand-day games and thousands of games at once stay cheap.
+#
+#     recorder = DayRecorder(state)      # records every day from now on
+#     ...
+#     recorder.to_csv("economy.csv")
+#     recorder.to_npy("economy.npy")     # needs numpy
+
+# (column, array typecode): I/i = unsigned/signed 32-bit, B = one byte
+RECORD_COLUMNS = (
+    [("day", "I")]
+    + [(r.lower(), "i") for r in RESOURCE_NAMES]
+    + [(b.lower().replace(" ", "_"), "B") for b in BUILDING_NAMES]
+    + [(h.lower() + "_level", "B") for h in HERO_CLASSES]
+    + [
+        ("food_eaten", "I"),        # that day
+        ("event", "B"),             # EVENT_NUMBERS, 0 = no event
+        ("quests_succeeded", "B"),  # that day
+        ("quests_failed", "B"),     # that day
+        ("starved", "B"),           # 1 if the heroes went hungry
+        ("hydra_flags", "B"),       # HYDRA_FLAGS bits, like snapshots
+    ]
+)
+RECORD_BYTES = sum(array(code).itemsize for _, code in RECORD_COLUMNS)
+
+class DayRecorder():
+    """Records `state`'s day-by-day history (attaches as state.recorder)."""
+    def __init__(self, state):
+        self.columns = {name: array(code) for name, code in RECORD_COLUMNS}
+        self._arrays = list(self.columns.values())
+        self._totals = self._counters(state)
+        state.recorder = self
+
+    def __len__(self):
+        return len(self._arrays[0])
+
+    @staticmethod
+    def _counters(state):
+        stats = state.stats
+        return (stats.food_eaten, stats.random_events_held, stats.quests_succeeded,
+                stats.quests_failed, stats.starvation_days)
+
+    def record(self, state):
+        """Add the day that just ended. end_day() calls this."""
+        totals = self._counters(state)
+        food, events, succeeded, failed, starved = (now - before for now, before in zip(totals, self._totals))
+        self._totals = totals
+        flags = 0
+        for bit, flag in enumerate(HYDRA_FLAGS):
+            if state.hydra_progress[flag]:
+                flags |= 1 << bit
+
+        row = [state.turn_count - 1]
+        row += state.resources.values()
+        row += state.buildings.values()
+        row += [h.level for h in state.heroes.values()]
+        row += [food, EVENT_NUMBERS[state.recent_events[-1]] if events else 0,
+                succeeded, failed, min(starved, 1), flags]
+        for column, value in zip(self._arrays, row):
+            column.append(value)
+
+    def rows(self):
+        return zip(*self._arrays)
+
+    def to_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(self.rows())
+
+    def to_numpy(self):
+        """The history as a numpy structured array, one field per column."""
+        import numpy as np  # Only needed here
+        table = np.empty(len(self), dtype=[(name, code) for name, code in RECORD_COLUMNS])
+        for name, column in self.columns.items():
+            table[name] = np.frombuffer(column, dtype=column.typecode) if len(column) else []
+        return table
+
+    def to_npy(self, path):
+        import numpy as np
+        np.save(path, self.to_numpy())
+
 # -------------------------------------------------------------------
 # MAIN MENU
 # -------------------------------------------------------------------
 
-def main_menu():
+def main_menu_options(state, can_save=True):
+    """The main action menu, as lines of text."""
+    lines = ["", "Choose an action:"]
+    lines.append("(1) Build or Upgrade a structure")
+    lines.append("(2) Recruit or Train a hero")
+    if state.quests_per_day > state.quests_today:
+        lines.append("(3) Send heroes on a quest")
+    else:
+        lines.append("(3) //Send heroes on a quest")
+    if not state.hydra_progress['fight_unlocked']:
+        lines.append("(4) //Attempt the final Hydra battle (if ready)")
+    else:
+        lines.append("(4) Attempt the final Hydra battle (if ready)")
+    lines.append("(5) End Day (resource collection & random events)")
+    lines.append("(6) View Stats")
+    lines.append(f"(o) Orders for the end of the day ({len(state.orders)} queued)")
+    if can_save:
+        lines.append("(7) Save Game")
+    lines.append("(q) Quit Game")
+    return lines
+
+def action_steps(state, choice):
+    """
+    Carry out a main menu answer the terminal and the server both offer,
+    running its menu if it has one. Returns False for any other answer.
+    """
+    if choice == '1':
+        yield from build_steps(state)
+    elif choice == '2':
+        yield from hero_steps(state)
+    elif choice == '3':
+        yield from quest_steps(state)
+    elif choice == '4':
+        apply(state, Battle())
+    elif choice == '5':
+        apply(state, EndDay())
+    elif choice == '6':
+        display_stats(state)
+    elif choice == 'o':
+        yield from order_steps(state)
+    else:
+        return False
+    return True
+
+def main_menu(state):
     while True:
         # 1) Show the pinned status + any messages
-        show_status_and_messages()
+        show_status_and_messages(state)
         # 2) Show the main action menu
-        print("\nChoose an action:")
-        print("(1) Build or Upgrade a structure")
-        print("(2) Recruit or Train a hero")
-        if quests_per_day > quests_today:
-            print("(3) Send heroes on a quest")
-        else:
-            print("(3) //Send heroes on a quest")
-        if not hydra_progress['fight_unlocked']:
-            print("(4) //Attempt the final Hydra battle (if ready)")
-        else:
-            print("(4) Attempt the final Hydra battle (if ready)")
-        print("(5) End Day (resource collection & random events)")
-        print("(6) View Stats")
-        print("(q) Quit Game")
+        for line in main_menu_options(state):
+            print(line)
 
         choice = input("Enter choice: ").lower()
-        if choice == '1':
-            build_or_upgrade()
-        elif choice == '2':
-            recruit_or_train_hero()
-        elif choice == '3':
-            send_quest()
-        elif choice == '4':
-            attempt_final_battle()
-        elif choice == '5':
-            global turn_count
-            turn_count += 1
-            Stats.turn_count += 1
-            end_turn()
-        elif choice == '6':
-            display_stats()
+        if run_steps(action_steps(state, choice)):
+            continue
+        if choice == '7':
+            save_game(state)
+            add_message(state, "Game saved to {path}.", path=SAVE_FILE)
         elif choice == 'q':
             print("\nThanks for playing! Goodbye.")
             sys.exit(0)
         elif "debug" in choice:
             parts = choice.split()
-            if parts[1].lower() == "all":
-                for r in resources:
-                    resources[r] += 500
-            elif parts[1].lower() == "hydra":
-                for key in hydra_progress.keys():
-                    hydra_progress[key] = True
-            elif len(parts) > 1 and parts[1].capitalize() in resources:
-                resources[parts[1].capitalize()] += 500
-            add_message(f"Performed debug: {parts[1].capitalize()}. Cheater.")
-            Stats.debug_used += 1
-            add_message(f"Debug used count: {Stats.debug_used}")
+            if len(parts) > 1:
+                # Goes through apply() so the journal sees it too
+                apply(state, Debug(parts[1]), reset=False)
+            else:
+                add_message(state, "Usage: debug <gold|food|arcane|all|hydra>")
         else:
-            add_message("Invalid choice. Please try again.")
+            add_message(state, "Invalid choice. Please try again.")
 
-def display_stats():
-    add_message(Stats.__dict__)
+def display_stats(state):
+    add_message(state, "{stats}", "stats", stats=dict(vars(state.stats)))
 # -------------------------------------------------------------------
 # ENTRY POINT
 # -------------------------------------------------------------------
 if __name__ == "__main__":
+    if os.name == 'nt':
+        os.system('')  # Switches on ANSI escape handling in the Windows console
+    # Only redraw the lines that changed (for slow links like SSH)
+    screen.diff = "--redraw-changed" in sys.argv
     clear_screen()
     print("Welcome to SLAY THE HYDRA!")
     print("Manage your kingdom, recruit heroes, and complete quests to find,")
     print("reach, and gear up for the Hydra. Good luck!")
     input("\nPress Enter to continue...")
     clear_screen()
-    main_menu()
+    state = None
+    if os.path.exists(SAVE_FILE):
+        if input(f"Load your saved game from {SAVE_FILE}? (y/n): ").lower() == 'y':
+            state = load_game()
+    state = state or GameState()
+    # Every session is journalled, for bug reports (see Journal.replay).
+    # Sessions get appended, so loading a save doesn't lose the last one.
+    Journal(state, JOURNAL_FILE)
+    main_menu(state)
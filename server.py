@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+
+from hydragame import (
+    GameState, make_frame, add_message, main_menu_options, action_steps,
+)
+
+"""
+GAME SERVER
+-----------
+
+Hosts SLAY THE HYDRA for lots of players from one process. Every TCP
+connection gets its own kingdom (an in-memory GameState) and the same
+numbered menus as the terminal game, all served from a single asyncio
+event loop.
+
+The protocol is plain lines of UTF-8 text, so netcat or telnet will do:
+
+    python server.py --port 4000
+    nc localhost 4000
+
+The server sends the status screen, the menu, then a prompt line; the
+client answers each prompt with one line. A player that goes quiet just
+costs a suspended coroutine and their GameState until --idle-timeout
+runs out and they get disconnected. There's no saving and no debug
+cheats on the server.
+"""
+
+HOST = "127.0.0.1"
+PORT = 4000
+# Seconds a player can sit at a prompt before we hang up (0 = forever)
+IDLE_TIMEOUT = 30 * 60
+# Connections the OS queues up while we're busy (asyncio's default is 100)
+BACKLOG = 1024
+
+class SessionClosed(Exception):
+    """The player quit, hung up or went idle."""
+
+class Session():
+    """One player's connection and kingdom."""
+    def __init__(self, reader, writer, idle_timeout=IDLE_TIMEOUT):
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout or None
+        self.state = GameState()
+
+    def send(self, lines):
+        self.writer.write(("\n".join(lines) + "\n").encode())
+
+    async def ask(self, prompt):
+        """Send a prompt line and wait for the player's answer."""
+        self.send([prompt])
+        await self.writer.drain()
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            self.send(["", "Idle for too long. Goodbye."])
+            raise SessionClosed("idle")
+        except ValueError:  # Line longer than the stream limit
+            raise SessionClosed("line too long")
+        if not line:
+            raise SessionClosed("hung up")
+        return line.decode(errors="replace").strip().lower()
+
+    async def run(self, steps):
+        """hydragame.run_steps() over the connection: play a menu's steps, return its result."""
+        try:
+            prompt = next(steps)
+            while True:
+                if prompt.lines:
+                    self.send(prompt.lines)
+                prompt = steps.send(await self.ask(prompt.question))
+        except StopIteration as stop:
+            return stop.value
+
+# -------------------------------------------------------------------
+# MENUS
+# -------------------------------------------------------------------
+# The menus themselves are hydragame's (action_steps() and the steps it
+# runs), so the server offers exactly what the terminal game does, minus
+# saving and the debug cheats.
+
+async def main_menu(session):
+    state = session.state
+    session.send([
+        "Welcome to SLAY THE HYDRA!",
+        "Manage your kingdom, recruit heroes, and complete quests to find,",
+        "reach, and gear up for the Hydra. Good luck!",
+        "",
+    ])
+    while True:
+        session.send(make_frame(state) + main_menu_options(state, can_save=False))
+        choice = await session.ask("Enter choice: ")
+        if await session.run(action_steps(state, choice)):
+            continue
+        if choice == 'q':
+            session.send(["", "Thanks for playing! Goodbye."])
+            return
+        add_message(state, "Invalid choice. Please try again.")
+
+# -------------------------------------------------------------------
+# SERVER
+# -------------------------------------------------------------------
+
+async def handle_connection(reader, writer, idle_timeout=IDLE_TIMEOUT):
+    session = Session(reader, writer, idle_timeout)
+    try:
+        await main_menu(session)
+        await writer.drain()
+    except (SessionClosed, ConnectionError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def start_server(host=HOST, port=PORT, idle_timeout=IDLE_TIMEOUT):
+    """Start listening; returns the asyncio Server (port=0 picks a free port)."""
+    return await asyncio.start_server(
+        lambda reader, writer: handle_connection(reader, writer, idle_timeout),
+        host, port, backlog=BACKLOG)
+
+async def serve(host=HOST, port=PORT, idle_timeout=IDLE_TIMEOUT):
+    server = await start_server(host, port, idle_timeout)
+    for sock in server.sockets:
+        print(f"Serving SLAY THE HYDRA on {sock.getsockname()}")
+    async with server:
+        await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host SLAY THE HYDRA over TCP.")
+    parser.add_argument("--host", default=HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="seconds before an idle player is disconnected (0 = never)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.idle_timeout))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
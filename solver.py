@@ -0,0 +1,778 @@
+import argparse
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+import numpy as np
+
+import hydragame
+from hydragame import (
+    GameState, apply, Build, Recruit, Train, Quest, Battle, EndDay,
+    EVENTS, HYDRA_FLAGS, BUILDING_NAMES, HERO_CLASSES, QUEST_DIFFICULTIES,
+    TOWN_CENTER, ARCANE_TOWER, TRADING_HALL, BLACKSMITH,
+)
+from battle_sim import battle_odds
+import autoplay
+
+"""
+SOLVER
+------
+
+Finds the schedule that gives the best chance of slaying the Hydra by a
+deadline day, as a reference policy for balance work and a yardstick
+for the bots in autoplay.py.
+
+The solver is an expectimax over whole days, memoized on a compact
+state. A game splits into two stages, and each gets the state that
+matters in it:
+
+1. Building up, until all three heroes have joined and the gear can be
+   crafted. Each day the solver picks which building to upgrade, if
+   any; heroes join as soon as there's a slot and the gold, every quest
+   goes gathering (least experienced hero first) and the Hydra
+   prerequisites wait for the next stage. The transposition table is
+   keyed on (day, building levels, Hydra flags, who joined) and holds
+   arrays over (gold bucket, arcane, the first recruit's join day), so
+   one entry covers every purse at once: the backup for all of them is
+   a handful of array shifts, and the best plan comes out per cell.
+   Heroes are worked out from the join days: with every quest gathering,
+   their levels, XP and skills follow from those.
+2. The race, once the kingdom is built. Resources don't matter any more,
+   so the state is just (day, each hero's level, XP and skills, Hydra
+   flags). Each day the prerequisite quests go first (to the strongest
+   hero who can still level up: they pay more XP than gathering, and
+   gold is no use now), the rest go gathering, everyone levels up when
+   they can and the team fights once the fight is unlocked. The race
+   runs forward over the chance of each set of Hydra flags, with the
+   heroes' XP in expectation: prerequisite quests and the battle are
+   the chance nodes, and a lost battle puts its share back on the
+   flags without the location.
+
+solve() backs both tables up from a start state and keeps the argmax
+plan of every cell; play_day() plays those plans on the real game, and
+schedule() lists them down the likeliest outcome of every day.
+
+To stay that small the model is coarser than the game:
+- Gold is kept in GOLD_BUCKET steps up to GOLD_CAP and spread over the
+  buckets either side in proportion, so it's right on average. Arcane
+  is exact, up to what's left to spend it on.
+- Food isn't tracked: gathering brings in more than the heroes eat.
+- Only the buildings the race needs are bought: the Town Center (hero
+  slots), Barracks 1 (Rogue) and Arcane Tower 2 (Mage, arcane and the
+  gear). The Town Center's last level waits for the gear, so the last
+  recruit starts the race. Nothing's lost: the Tower's second level is
+  cheaper and triples the arcane the Town Center needs.
+- XP is gathered in expectation, and so are random events' gold and
+  arcane (each event's share of days worked out from its weight and
+  repeat block, see event_mix()) and the Knight's duels in the race.
+  Expected XP levels a hero up on the day the average game would, so
+  when the deadline falls right on a level-up the chance comes out
+  optimistic.
+
+The model's chance is checked against the real game by playing its
+plans: see test_engine.py, or
+
+    python solver.py --deadline 55 --games 200
+
+A lost battle only loses the Hydra's location; the fight stays unlocked,
+so the game doesn't limit battles per day. `attempts` caps them, and
+the default of 1 keeps the plans honest.
+"""
+
+GOLD_BUCKET = 25
+GOLD_CAP = 600
+BATTLE_ATTEMPTS = 1
+# Games main() plays the solver's plans for, to check its chance
+GAMES = 200
+AUTOPLAY_GAMES = 1000
+# Chances of a kill below this count as none
+MIN_CHANCE = 1e-6
+
+# Highest level worth buying
+USEFUL_LEVELS = {"Town Center": 3, "Farm": 0, "Arcane Tower": 2, "Barracks": 1,
+                 "Trading Hall": 0, "Blacksmith": 0}
+# Who takes the next Town Center slot, and what they need built
+RECRUITS = (("Rogue", "Barracks"), ("Mage", "Arcane Tower"))
+RECRUIT_GOLD = 50
+
+# Hydra flags as bits, in HYDRA_FLAGS order (like save snapshots)
+LOCATED, ACCESS, GEAR, UNLOCKED = (1 << bit for bit, _ in enumerate(HYDRA_FLAGS))
+GATHER, SCOUT, ROUTE, CRAFT = QUEST_DIFFICULTIES  # Quest names, in menu order
+KNIGHT = HERO_CLASSES.index("Knight")
+
+# One day of a schedule: what was built and who joined that morning,
+# the quests sent (in order) and whether the team fought
+DayPlan = namedtuple("DayPlan", ["day", "builds", "recruits", "quests", "fight"])
+
+# -------------------------------------------------------------------
+# COMPACT STATE
+# -------------------------------------------------------------------
+# Buildings are a tuple of levels in BUILDING_NAMES order, heroes a
+# tuple of (level, xp, skill ranks) in HERO_CLASSES order, and the Hydra
+# flags a bitfield.
+
+def hero_power(hero):
+    level, _, skills = hero
+    return level * 10 + skills * 3
+
+def encode_buildings(state):
+    return tuple(state.buildings.values())
+
+def encode_heroes(state):
+    return tuple((h.level, h.xp, sum(h.skills.values())) for h in state.heroes.values())
+
+def encode_flags(state):
+    return sum(1 << bit for bit, flag in enumerate(HYDRA_FLAGS) if state.hydra_progress[flag])
+
+def upgraded(buildings, b):
+    return buildings[:b] + (buildings[b] + 1,) + buildings[b + 1:]
+
+def gear_ready(buildings):
+    return buildings[BLACKSMITH] >= 2 or buildings[ARCANE_TOWER] >= 2
+
+def next_prerequisite(flags, buildings):
+    """The next Hydra prerequisite quest to send (autoplay.pick_quest's order), or None."""
+    if not flags & LOCATED:
+        return LOCATED, SCOUT
+    if not flags & ACCESS:
+        return ACCESS, ROUTE
+    if not flags & GEAR and gear_ready(buildings):
+        return GEAR, CRAFT
+    return None
+
+def prerequisite_done(flags, bit):
+    flags |= bit
+    if flags & (LOCATED | ACCESS | GEAR) == LOCATED | ACCESS | GEAR:
+        flags |= UNLOCKED
+    return flags
+
+def next_recruit(buildings, heroes):
+    """The hero who'd take a free Town Center slot this morning, or None."""
+    if sum(1 for h in heroes if h[0]) >= buildings[TOWN_CENTER]:
+        return None
+    for hero_class, needs in RECRUITS:
+        h = HERO_CLASSES.index(hero_class)
+        if not heroes[h][0] and buildings[BUILDING_NAMES.index(needs)] >= 1:
+            return h
+    return None
+
+def built_up(buildings, heroes):
+    """True once the race stage starts: everyone has joined and the gear can be made."""
+    return all(h[0] for h in heroes) and gear_ready(buildings)
+
+def least_experienced(heroes, active):
+    """Who goes gathering next: lowest (level, xp), first in HERO_CLASSES order on ties."""
+    return min(active, key=lambda i: heroes[i][:2])
+
+def event_effects(name, day, buildings):
+    """
+    [(share, gold, arcane)] an event brings on `day` in expectation (see
+    the event functions in hydragame.py). Food and XP are left out.
+    """
+    if name == "wandering_merchant":
+        return [(1.0, 30, 0)]
+    if name == "investor_visit":
+        return [(1.0, 100, 0)]
+    if name == "arcane_experiment":
+        return [(0.7, 0, 10 + day), (0.3, 0, 0)]
+    if name == "local_festival":
+        return [(1.0, 5 + day, 0)]
+    if name == "royal_inspector":
+        return [(1.0, -(10 + day) if buildings[TOWN_CENTER] < 2 else 20 + day, 0)]
+    return [(1.0, 0, 0)]
+
+def clamped(values, shift, axis):
+    """values[i + shift] along `axis`, the edge value past either end."""
+    size = values.shape[axis]
+    shift = min(max(shift, -size), size)
+    if shift == 0:
+        return values
+    result = np.empty_like(values)
+    into = [slice(None)] * values.ndim
+    out = [slice(None)] * values.ndim
+    edge = [slice(None)] * values.ndim
+    if shift > 0:
+        into[axis], out[axis], edge[axis] = slice(0, size - shift), slice(shift, None), slice(size - 1, size)
+        result[tuple(into)] = values[tuple(out)]
+        into[axis] = slice(size - shift, None)
+    else:
+        into[axis], out[axis], edge[axis] = slice(-shift, None), slice(0, size + shift), slice(0, 1)
+        result[tuple(into)] = values[tuple(out)]
+        into[axis] = slice(0, -shift)
+    result[tuple(into)] = values[tuple(edge)]
+    return result
+
+def shifted(values, gold_shift, arcane_shift):
+    """
+    values[gold + gold_shift, arcane + arcane_shift, join] for every cell
+    of a build array, clamped at the edges. gold_shift is in buckets, and
+    a fractional one is split between the buckets either side. It can be
+    a number or differ by join column (an array over them).
+    """
+    values = clamped(values, arcane_shift, 1)
+    low = np.floor(gold_shift)
+    up = gold_shift - low
+    if np.ndim(gold_shift) == 0:
+        result = clamped(values, int(low), 0)
+        if up:
+            result = (1 - up) * result + up * clamped(values, int(low) + 1, 0)
+        return result
+    result = 0.0
+    for k in np.unique(np.concatenate([low, low + 1])):
+        weight = np.where(low == k, 1 - up, 0.0) + np.where(low + 1 == k, up, 0.0)
+        if weight.any():
+            result = result + weight * clamped(values, int(k), 0)
+    return result
+
+# -------------------------------------------------------------------
+# SOLVER
+# -------------------------------------------------------------------
+
+class Solver():
+    """
+    Best chance of slaying the Hydra by day `deadline` (the last day a
+    battle counts) from a state, and the plans that get it. Balance
+    tables are read when the solver is made, so sweeps can swap them
+    first. The race table carries over between solves.
+    """
+    def __init__(self, deadline, attempts=BATTLE_ATTEMPTS):
+        self.deadline = deadline
+        self.attempts = attempts
+        self.building_info = [hydragame.BUILDING_INFO[b] for b in BUILDING_NAMES]
+        self.xp_table = list(hydragame.HERO_XP_TABLE)
+        self.max_level = hydragame.HERO_MAX_LEVEL
+        self.top_levels = tuple(min(info["max_level"], USEFUL_LEVELS[name])
+                                for name, info in zip(BUILDING_NAMES, self.building_info))
+        self.golds = GOLD_CAP // GOLD_BUCKET + 1
+        self.arcanes = sum(cost[2] for info, top in zip(self.building_info, self.top_levels)
+                           for cost in info["upgrade_costs"][:top]) + 1
+        # What the race is run with (only the event odds care)
+        self.race_buildings = self.top_levels
+
+        # Transposition tables.
+        # Building up: (day, buildings, flags, fixed, axis) => (expected,
+        # plans, best). fixed is ((hero, join day), ...) since the origin,
+        # and axis the hero whose join day is the arrays' last index
+        # (None: there's one column). best is the best plan that morning
+        # (an index into plans) for every cell, and expected the chance
+        # of a kill from there averaged over the previous evening's event.
+        self.build_table = {}
+        # The chances of a kill on the origin's morning, by (buildings, flags)
+        self.first_values = {}
+        # The race: (day, heroes, flags) => chance
+        self.race_table = {}
+        self.stages = {}
+
+        # Heroes and XP. joins are the ones play_day() made since solve().
+        self.origin = None
+        self.joins = ()
+        self.mornings = {}
+        self.evenings = {}
+        # Chance nodes
+        self.odds = {}
+        self.mixes = {}
+        self.duels = {}
+
+    # -- the model ----------------------------------------------------
+
+    def trained(self, hero):
+        """A hero after every level-up they can afford (one skill rank each)."""
+        level, xp, skills = hero
+        while 0 < level < self.max_level and xp >= self.xp_table[level - 1]:
+            xp -= self.xp_table[level - 1]
+            level += 1
+            skills += 1
+        if level >= self.max_level:
+            xp = 0
+        return level, round(xp, 6), skills
+
+    def win_chance(self, heroes):
+        return self.win_power(sum(hero_power(h) for h in heroes if h[0]))
+
+    def win_power(self, power):
+        chance = self.odds.get(power)
+        if chance is None:
+            p = battle_odds(power)[0] if power else 0.0
+            chance = self.odds[power] = 1 - (1 - p) ** self.attempts
+        return chance
+
+    def event_mix(self, buildings, day):
+        """
+        [(event name, chance it happens on `day`'s evening)] for a kingdom
+        with these buildings. Conditions and weights are the game's own.
+        An event can't come back until repeat_block others have happened,
+        so the share of each one is the long-run share in the chain of
+        recent events, not just its weight.
+        """
+        key = (buildings, day // 5)
+        mix = self.mixes.get(key)
+        if mix is None:
+            view = SimpleNamespace(buildings=dict(zip(BUILDING_NAMES, buildings)), turn_count=day)
+            events = [(evt["name"], evt["base_weight"] + evt["weight_modifier"](view), evt["repeat_block"])
+                      for evt in EVENTS if evt["condition"](view)]
+            events = [(name, weight, block) for name, weight, block in events if weight > 0]
+            window = max((block for _, _, block in events), default=0)
+            chain = {(): 1.0}
+            share = dict.fromkeys((name for name, _, _ in events), 0.0)
+            for _ in range(60):
+                step = {}
+                for recent, chance in chain.items():
+                    allowed = [(name, weight) for name, weight, block in events
+                               if name not in recent[len(recent) - block:]]
+                    total = sum(weight for _, weight in allowed)
+                    for name, weight in allowed:
+                        nxt = (recent + (name,))[-window:]
+                        step[nxt] = step.get(nxt, 0.0) + chance * weight / total
+                chain = step
+            for recent, chance in chain.items():
+                share[recent[-1]] += chance
+            base = (15 + 5 * buildings[TOWN_CENTER]) / 100
+            mix = self.mixes[key] = [(name, base * s) for name, s in share.items() if s > 0]
+        return mix
+
+    def events(self, buildings, day):
+        """[(chance, gold, arcane)] that `day`'s evening event brings, no event included."""
+        outcomes = {}
+        left = 1.0
+        for name, chance in self.event_mix(buildings, day):
+            left -= chance
+            for part, gold, arcane in event_effects(name, day, buildings):
+                outcomes[gold, arcane] = outcomes.get((gold, arcane), 0.0) + chance * part
+        outcomes[0, 0] = outcomes.get((0, 0), 0.0) + left
+        return [(chance, gold, arcane) for (gold, arcane), chance in outcomes.items()]
+
+    def duel_chance(self, buildings, day):
+        key = (buildings, day)
+        chance = self.duels.get(key)
+        if chance is None:
+            chance = self.duels[key] = sum(chance for name, chance in self.event_mix(buildings, day)
+                                           if name == "wayward_adventurer")
+        return chance
+
+    def gathered(self, heroes, quests):
+        """
+        [(expected gold, heroes)] after 0, 1, ... `quests` gathering
+        quests, least experienced hero first.
+        """
+        active = [i for i, h in enumerate(heroes) if h[0]]
+        roster = list(heroes)
+        gold = 0.0
+        steps = [(gold, heroes)]
+        difficulty = QUEST_DIFFICULTIES[GATHER]
+        for _ in range(quests):
+            i = least_experienced(roster, active)
+            level, xp, skills = roster[i]
+            chance = min(95, difficulty + level * 10 + skills * 3) / 100
+            roster[i] = (level, xp + 1 + chance, skills)
+            gold += chance * (level * 10 + 10)
+            steps.append((gold, tuple(roster)))
+        return steps
+
+    # -- building up --------------------------------------------------
+    # Heroes follow from who joined when: every quest gathers, each one
+    # paying its expected XP and gold.
+
+    def evening(self, heroes):
+        """(expected gold, next morning's heroes) for a day of gathering."""
+        result = self.evenings.get(heroes)
+        if result is None:
+            gold, roster = self.gathered(heroes, 2 * sum(1 for h in heroes if h[0]))[-1]
+            result = self.evenings[heroes] = (gold, tuple(self.trained(h) for h in roster))
+        return result
+
+    def morning(self, joins, day):
+        """The heroes on the morning of `day`, once that day's recruits are in."""
+        key = (joins, day)
+        heroes = self.mornings.get(key)
+        if heroes is None:
+            origin_day, origin_heroes = self.origin
+            if day <= origin_day:
+                heroes = origin_heroes
+            else:
+                earlier = tuple(j for j in joins if j[1] < day)
+                heroes = self.evening(self.morning(earlier, day - 1))[1]
+            heroes = tuple((1, 0, 0) if (i, day) in joins else h for i, h in enumerate(heroes))
+            self.mornings[key] = heroes
+        return heroes
+
+    def columns(self, day, axis):
+        """Join columns in the arrays for `day`: one per day a recruit could have joined by then."""
+        return 1 if axis is None else day + 1
+
+    def join_day(self, column, day):
+        """The join day of a column; ones that can't be reached by `day` get the nearest that can."""
+        return min(max(column, self.origin[0]), day)
+
+    def rosters(self, day, fixed, axis):
+        """This morning's heroes in every join column."""
+        if axis is None:
+            return [self.morning(fixed, day)]
+        return [self.morning(fixed + ((axis, self.join_day(j, day)),), day) for j in range(day + 1)]
+
+    def build_plans(self, buildings):
+        """The building upgrades worth a try this morning (None: nothing)."""
+        plans = [None]
+        for b, level in enumerate(buildings):
+            if level < self.top_levels[b] and (b != TOWN_CENTER or level < 2 or gear_ready(buildings)):
+                plans.append(b)
+        return plans
+
+    def build_entry(self, day, buildings, flags, fixed, axis):
+        """The build_table entry for a morning, solving it if needed."""
+        key = (day, buildings, flags, fixed, axis)
+        entry = self.build_table.get(key)
+        if entry is not None:
+            return entry
+        gold = np.arange(self.golds)[:, None, None] * GOLD_BUCKET
+        arcane = np.arange(self.arcanes)[None, :, None]
+        heroes = self.rosters(day, fixed, axis)[-1]
+        plans = self.build_plans(buildings)
+        choices = []
+        for b in plans:
+            cost_gold = cost_arcane = 0
+            after = buildings
+            if b is not None:
+                cost_gold, _, cost_arcane = self.building_info[b]["upgrade_costs"][buildings[b]]
+                after = upgraded(buildings, b)
+            values = self.day_values(day, after, flags, fixed, axis, -cost_gold, -cost_arcane)
+            recruit = next_recruit(after, heroes)
+            if recruit is not None:
+                joined = self.joined_values(day, after, flags, fixed, axis, recruit,
+                                            -cost_gold - RECRUIT_GOLD, -cost_arcane)
+                values = np.where(gold - cost_gold >= RECRUIT_GOLD, joined, values)
+            affordable = (gold >= cost_gold) & (arcane >= cost_arcane)
+            choices.append(np.where(affordable, values, -1.0))
+        choices = np.array(choices, dtype=np.float32)
+        values = choices.max(axis=0)
+        expected = 0.0
+        for chance, gold_in, arcane_in in self.events(buildings, day):
+            expected = expected + np.float32(chance) * shifted(values, gold_in / GOLD_BUCKET, arcane_in)
+        if day == self.origin[0]:
+            self.first_values[buildings, flags] = values
+        entry = self.build_table[key] = (expected, plans, choices.argmax(axis=0).astype(np.int8))
+        return entry
+
+    def joined_values(self, day, buildings, flags, fixed, axis, recruit, gold_spent, arcane_spent):
+        """day_values() once `recruit` has joined this morning."""
+        if axis is None:
+            # The first recruit: today's column of the arrays with a join axis
+            values = self.day_values(day, buildings, flags, fixed, recruit, gold_spent, arcane_spent)
+            return values[:, :, day:day + 1]
+        # Another one: every column is a history of its own
+        return np.concatenate([self.day_values(day, buildings, flags, fixed + ((axis, self.join_day(j, day)), (recruit, day)),
+                                               None, gold_spent, arcane_spent)
+                               for j in range(day + 1)], axis=2)
+
+    def day_values(self, day, buildings, flags, fixed, axis, gold_spent, arcane_spent):
+        """Chance of a kill for every cell of a build array, from this morning's builds on."""
+        shape = (self.golds, self.arcanes, self.columns(day, axis))
+        rosters = self.rosters(day, fixed, axis)
+        if built_up(buildings, rosters[-1]):
+            return np.broadcast_to([self.race_value(day, heroes, flags) for heroes in rosters], shape)
+        wins = np.array([self.win_chance(heroes) if flags & UNLOCKED else 0.0 for heroes in rosters])
+        if day + 1 > self.deadline:
+            return np.broadcast_to(wins, shape)
+        income = np.array([self.evening(heroes)[0] for heroes in rosters])
+        hall = self.building_info[TRADING_HALL]["gold_production"][buildings[TRADING_HALL]]
+        tower = self.building_info[ARCANE_TOWER]["arcane_production"][buildings[ARCANE_TOWER]]
+        # A lost battle loses the lair
+        after = flags & ~LOCATED if flags & UNLOCKED else flags
+        later = self.build_entry(day + 1, buildings, after, fixed, axis)[0][:, :, :self.columns(day, axis)]
+        gold_shift = (gold_spent + income + hall) / GOLD_BUCKET
+        if axis is None:
+            gold_shift = gold_shift[0]
+        return wins + (1 - wins) * shifted(later, gold_shift, arcane_spent + tower)
+
+    # -- the race -----------------------------------------------------
+
+    def quest_hero(self, heroes, active):
+        """Who takes the prerequisite quests: the strongest hero who can still level up."""
+        growing = [i for i in active if heroes[i][0] < self.max_level] or active
+        return max(growing, key=lambda i: hero_power(heroes[i]))
+
+    def prerequisites(self, flags, quests, power):
+        """
+        ([((flags, quests left), chance)], expected XP) for the morning's
+        prerequisite quests in the race, sent by a hero of this power.
+        """
+        key = (flags, quests, power)
+        result = self.stages.get(key)
+        if result is None:
+            stage = {(flags, quests): 1.0}
+            done = {}
+            xp = 0.0
+            while stage:
+                step = {}
+                for (f, left), chance in stage.items():
+                    quest = next_prerequisite(f, self.race_buildings)
+                    if quest is None or left == 0:
+                        done[f, left] = done.get((f, left), 0.0) + chance
+                        continue
+                    bit, name = quest
+                    success = min(95, QUEST_DIFFICULTIES[name] + power) / 100
+                    xp += chance * (1 + 2 * success)
+                    for outcome, part in (((prerequisite_done(f, bit), left - 1), success),
+                                          ((f, left - 1), 1 - success)):
+                        step[outcome] = step.get(outcome, 0.0) + chance * part
+                stage = step
+            result = self.stages[key] = (list(done.items()), xp)
+        return result
+
+    def race_day(self, day, heroes, alive):
+        """
+        ({flags after the quests: chance}, each hero's expected XP by the
+        evening) for a race day from this morning, where `alive` is the
+        chance of each set of flags the team might have.
+        """
+        active = [i for i, h in enumerate(heroes) if h[0]]
+        hero = self.quest_hero(heroes, active)
+        power = hero_power(heroes[hero])
+        total = sum(alive.values())
+        done = {}
+        xp = 0.0
+        for flags, chance in alive.items():
+            outcomes, gained = self.prerequisites(flags, 2 * len(active), power)
+            xp += chance / total * gained
+            for outcome, part in outcomes:
+                done[outcome] = done.get(outcome, 0.0) + chance * part
+
+        roster = list(heroes)
+        level, x, skills = roster[hero]
+        roster[hero] = (level, x + xp, skills)
+        steps = self.gathered(roster, max(left for _, left in done))
+        evening = [0.0] * len(roster)
+        outcomes = {}
+        for (f, left), chance in done.items():
+            for i, h in enumerate(steps[left][1]):
+                evening[i] += chance / total * h[1]
+            outcomes[f] = outcomes.get(f, 0.0) + chance
+        if roster[KNIGHT][0] >= 2:
+            evening[KNIGHT] += 2 * self.duel_chance(self.race_buildings, day + 1)
+        return outcomes, evening
+
+    def hopeless(self, day, heroes):
+        """
+        True if the heroes can't get a chance of a kill worth the bother
+        (MIN_CHANCE) by the deadline, even with 3 XP from every quest
+        and a duel every day, levelling whoever's cheapest first.
+        """
+        days = self.deadline - day + 1
+        active = [h for h in heroes if h[0]]
+        xp = days * (3 * 2 * len(active) + 2)
+        costs = []
+        for level, have, _ in active:
+            for need in self.xp_table[level - 1:self.max_level - 1]:
+                costs.append(need - have)
+                have = 0
+        levels = 0
+        for cost in sorted(costs):
+            if cost > xp:
+                break
+            xp -= cost
+            levels += 1
+        power = sum(hero_power(h) for h in active) + levels * 13
+        return days * self.win_power(power) < MIN_CHANCE
+
+    def race_value(self, day, heroes, flags):
+        """
+        Chance of a kill from the morning of `day` in the race stage.
+        There's nothing left to choose, so rather than branching on every
+        quest roll this carries the chance of each set of Hydra flags
+        forward a day at a time, and the heroes with their expected XP
+        (the same whatever the flags).
+        """
+        key = (day, heroes, flags)
+        value = self.race_table.get(key)
+        if value is not None:
+            return value
+        value = 0.0
+        if self.hopeless(day, heroes):
+            self.race_table[key] = value
+            return value
+        alive = {flags: 1.0}
+        while day <= self.deadline and alive:
+            win = self.win_chance(heroes)
+            outcomes, evening = self.race_day(day, heroes, alive)
+            alive = {}
+            for f, chance in outcomes.items():
+                if f & UNLOCKED:
+                    value += chance * win
+                    # A lost battle loses the lair
+                    f &= ~LOCATED
+                    chance *= 1 - win
+                if chance > MIN_CHANCE * 1e-3:
+                    alive[f] = alive.get(f, 0.0) + chance
+            heroes = tuple(self.trained((level, x, skills)) for (level, _, skills), x in zip(heroes, evening))
+            day += 1
+        self.race_table[key] = value
+        return value
+
+    # -- solving ------------------------------------------------------
+
+    def solve(self, state):
+        """
+        Chance of a kill by the deadline when the solver plays on from a
+        GameState at the start of a day (the model's chance: main() and
+        the tests check it against the game). `state` becomes the origin
+        play_day() and schedule() count joins from.
+        """
+        if state.stats.hydras_slain:
+            return 1.0
+        day = state.turn_count
+        if day > self.deadline:
+            return 0.0
+        heroes = tuple(self.trained(h) for h in encode_heroes(state))
+        self.joins = ()
+        buildings, flags = encode_buildings(state), encode_flags(state)
+        if built_up(buildings, heroes):
+            return self.race_value(day, heroes, flags)
+        # Join days count from the origin, so the build table is only
+        # good for games starting on the same day with the same heroes
+        if self.origin != (day, heroes):
+            self.origin = (day, heroes)
+            self.mornings.clear()
+            self.build_table.clear()
+            self.first_values.clear()
+        self.build_entry(day, buildings, flags, (), None)
+        values = self.first_values[buildings, flags]
+        return float(values[self.cell(state.resources["Gold"], state.resources["Arcane"], None)])
+
+    def cell(self, gold, arcane, join):
+        """Where a purse and join day sit in the build arrays."""
+        bucket = min(max(round(gold / GOLD_BUCKET), 0), self.golds - 1)
+        return bucket, min(max(arcane, 0), self.arcanes - 1), join or 0
+
+    def plan(self, day, buildings, flags, gold, arcane):
+        """The best building to upgrade (or None) this morning, for the joins so far."""
+        fixed, axis, join = self.joins, None, None
+        if fixed:
+            (axis, join), fixed = fixed[-1], fixed[:-1]
+        _, plans, best = self.build_entry(day, buildings, flags, fixed, axis)
+        return plans[best[self.cell(gold, arcane, join)]]
+
+    # -- playing ------------------------------------------------------
+
+    def play_day(self, state):
+        """Play one day of `state` the solver's way, from the origin solve() was given."""
+        heroes = state.heroes
+        buildings = encode_buildings(state)
+        if not built_up(buildings, encode_heroes(state)):
+            b = self.plan(state.turn_count, buildings, encode_flags(state),
+                          state.resources["Gold"], state.resources["Arcane"])
+            if b is not None:
+                apply(state, Build(BUILDING_NAMES[b]))
+            for hero_class, _ in RECRUITS:
+                if apply(state, Recruit(hero_class)).ok:
+                    self.joins += ((HERO_CLASSES.index(hero_class), state.turn_count),)
+
+        for hero_class, h in zip(HERO_CLASSES, heroes.values()):
+            while 0 < h.level < self.max_level and h.xp >= self.xp_table[h.level - 1]:
+                skills = h.skills
+                apply(state, Train(hero_class, min(skills, key=skills.get)))
+
+        roster = encode_heroes(state)
+        active = [i for i, h in enumerate(roster) if h[0]]
+        racing = built_up(encode_buildings(state), roster)
+        hero = HERO_CLASSES[self.quest_hero(roster, active)]
+        while state.quests_today < state.quests_per_day:
+            quest = next_prerequisite(encode_flags(state), encode_buildings(state)) if racing else None
+            if quest is None:
+                apply(state, Quest(GATHER, HERO_CLASSES[least_experienced(encode_heroes(state), active)]))
+            else:
+                apply(state, Quest(quest[1], hero))
+
+        for _ in range(self.attempts):
+            if not state.hydra_progress["fight_unlocked"] or apply(state, Battle()).value:
+                break
+        apply(state, EndDay())
+
+    def play_game(self, state=None):
+        """Solve from `state` and play it the solver's way up to the deadline."""
+        if state is None:
+            state = GameState()
+        self.solve(state)
+        while state.stats.hydras_slain == 0 and state.turn_count <= self.deadline:
+            self.play_day(state)
+        return state
+
+    def schedule(self, state):
+        """
+        The solver's plans from `state` (at the start of a day) as
+        DayPlans up to the deadline, down the likeliest outcome of every
+        day: no events, every prerequisite quest done and every battle
+        lost.
+        """
+        self.solve(state)
+        day = state.turn_count
+        buildings, flags = encode_buildings(state), encode_flags(state)
+        gold, arcane = state.resources["Gold"], state.resources["Arcane"]
+        heroes = self.morning((), day)
+        plans = []
+        while day <= self.deadline and not built_up(buildings, heroes):
+            b = self.plan(day, buildings, flags, gold, arcane)
+            builds = recruits = ()
+            if b is not None:
+                cost_gold, _, cost_arcane = self.building_info[b]["upgrade_costs"][buildings[b]]
+                gold, arcane = gold - cost_gold, arcane - cost_arcane
+                buildings = upgraded(buildings, b)
+                builds = (BUILDING_NAMES[b],)
+            recruit = next_recruit(buildings, heroes)
+            if recruit is not None and gold >= RECRUIT_GOLD:
+                self.joins += ((recruit, day),)
+                gold -= RECRUIT_GOLD
+                recruits = (HERO_CLASSES[recruit],)
+                heroes = self.morning(self.joins, day)
+            if built_up(buildings, heroes):
+                break
+            plans.append(DayPlan(day, builds, recruits, (GATHER,) * (2 * sum(1 for h in heroes if h[0])),
+                                 bool(flags & UNLOCKED)))
+            if flags & UNLOCKED:
+                flags &= ~LOCATED
+            gold += self.evening(heroes)[0] + self.building_info[TRADING_HALL]["gold_production"][buildings[TRADING_HALL]]
+            arcane += self.building_info[ARCANE_TOWER]["arcane_production"][buildings[ARCANE_TOWER]]
+            day += 1
+            heroes = self.morning(self.joins, day)
+        else:
+            return plans
+
+        while day <= self.deadline:
+            quests = []
+            after = flags
+            for _ in range(2 * sum(1 for h in heroes if h[0])):
+                quest = next_prerequisite(after, self.race_buildings)
+                quests.append(GATHER if quest is None else quest[1])
+                if quest is not None:
+                    after = prerequisite_done(after, quest[0])
+            plans.append(DayPlan(day, builds, recruits, tuple(quests), bool(after & UNLOCKED)))
+            builds = recruits = ()
+            _, evening = self.race_day(day, heroes, {flags: 1.0})
+            heroes = tuple(self.trained((level, x, skills)) for (level, _, skills), x in zip(heroes, evening))
+            flags = after & ~LOCATED if after & UNLOCKED else after
+            day += 1
+        return plans
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Best chance of slaying the Hydra by a deadline.")
+    parser.add_argument("--deadline", type=int, default=60, help="last day a battle counts")
+    parser.add_argument("--attempts", type=int, default=BATTLE_ATTEMPTS, help="battles per unlocked day")
+    parser.add_argument("--games", type=int, default=GAMES, help="games the solver's plans are played for")
+    args = parser.parse_args(argv)
+
+    solver = Solver(args.deadline, args.attempts)
+    started = time.perf_counter()
+    chance = solver.solve(GameState(0))
+    elapsed = time.perf_counter() - started
+    print(f"Solver's chance of a kill by day {args.deadline}: {chance:.3f} (solved in {elapsed:.1f} s)")
+    for plan in solver.schedule(GameState(0)):
+        quests = ", ".join(f"{plan.quests.count(q)}x {q}" for q in dict.fromkeys(plan.quests))
+        extras = [f"build {b}" for b in plan.builds] + [f"recruit {h}" for h in plan.recruits]
+        extras += ["fight"] if plan.fight else []
+        print(f"  Day {plan.day:2}: {'; '.join(extras + [quests])}")
+    kills = sum(solver.play_game(GameState(seed)).stats.hydras_slain > 0 for seed in range(args.games))
+    print(f"Played on the game: {kills / args.games:.3f} ({args.games} games)")
+    autoplay_kills = sum(autoplay.play_game(GameState(seed), args.deadline).stats.hydras_slain > 0
+                         for seed in range(AUTOPLAY_GAMES))
+    print(f"Autoplay's, for comparison: {autoplay_kills / AUTOPLAY_GAMES:.3f} ({AUTOPLAY_GAMES} games)")
+
+if __name__ == "__main__":
+    main()
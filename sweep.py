@@ -0,0 +1,212 @@
+import argparse
+import copy
+import itertools
+import json
+import os
+import random
+import sys
+from multiprocessing import Pool
+
+import hydragame
+from hydragame import GameState, derive_seed, NULL_SINK
+from autoplay import play_game, MAX_DAYS
+
+"""
+BALANCE SWEEPS
+--------------
+
+Replays headless games (see autoplay.py) under lots of different balance
+settings, spread across every core, and streams back one line of results
+per configuration.
+
+A configuration is a dict of overrides. Keys are either "HERO_XP_TABLE"
+or "<Building>.<field>" for any field in BUILDING_INFO, e.g.
+
+    {"Farm.food_production": [0, 4, 8, 12], "HERO_XP_TABLE": [10, 20, 30, 40, 50]}
+
+Every configuration is played with the same list of game seeds (derived
+from --master-seed), so differences between configurations come from the
+settings and not from luck.
+
+    python sweep.py --random 200 --seeds 100 --out results.jsonl
+    python sweep.py --grid axes.json --seeds 1000
+"""
+
+# Pristine copies of the tables, so each configuration starts from scratch
+DEFAULT_BUILDING_INFO = copy.deepcopy(hydragame.BUILDING_INFO)
+DEFAULT_HERO_XP_TABLE = list(hydragame.HERO_XP_TABLE)
+
+# -------------------------------------------------------------------
+# CONFIGURATIONS
+# -------------------------------------------------------------------
+
+def check_override_key(key):
+    """Raise ValueError for override keys that don't name a balance table."""
+    if key == "HERO_XP_TABLE":
+        return
+    bld_name, _, field = key.partition(".")
+    if bld_name not in DEFAULT_BUILDING_INFO or field not in DEFAULT_BUILDING_INFO[bld_name]:
+        raise ValueError(f"Unknown balance setting: {key!r}")
+
+def apply_overrides(overrides):
+    """
+    Reset the balance tables in hydragame to their defaults, then apply
+    `overrides`. Only call this in a worker process (or a throwaway one):
+    it changes the tables for every game in the process.
+    """
+    building_info = copy.deepcopy(DEFAULT_BUILDING_INFO)
+    xp_table = list(DEFAULT_HERO_XP_TABLE)
+    for key, value in overrides.items():
+        check_override_key(key)
+        if key == "HERO_XP_TABLE":
+            xp_table = list(value)
+        else:
+            bld_name, _, field = key.partition(".")
+            building_info[bld_name][field] = value
+    hydragame.BUILDING_INFO = building_info
+    hydragame.HERO_XP_TABLE = xp_table
+    hydragame.HERO_MAX_LEVEL = len(xp_table)
+
+def grid(axes):
+    """Every combination of the values in `axes` ({key: [values, ...]})."""
+    for key in axes:
+        check_override_key(key)
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+
+def random_configs(count, seed=0, spread=0.5):
+    """
+    `count` random configurations that scale every upgrade cost, every
+    production table and the XP table by a factor in [1 - spread, 1 + spread].
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(count):
+        overrides = {}
+        for bld_name, info in DEFAULT_BUILDING_INFO.items():
+            for field, value in info.items():
+                if field == "max_level":
+                    continue
+                factor = rng.uniform(1 - spread, 1 + spread)
+                if field == "upgrade_costs":
+                    overrides[f"{bld_name}.{field}"] = [tuple(int(c * factor) for c in cost) for cost in value]
+                else:
+                    overrides[f"{bld_name}.{field}"] = [int(v * factor) for v in value]
+        factor = rng.uniform(1 - spread, 1 + spread)
+        overrides["HERO_XP_TABLE"] = [max(1, int(xp * factor)) for xp in DEFAULT_HERO_XP_TABLE]
+        configs.append(overrides)
+    return configs
+
+# -------------------------------------------------------------------
+# RUNNING
+# -------------------------------------------------------------------
+
+def run_config(task):
+    """
+    Worker: play every seed for one configuration and boil the games down
+    to a single result dict.
+    """
+    config_index, overrides, seeds, max_days, master_seed = task
+    apply_overrides(overrides)
+
+    wins = 0
+    kill_days = 0
+    gold_spent = 0
+    starvation_days = 0
+    quests_succeeded = 0
+    quests_failed = 0
+    for seed in seeds:
+        # Nobody reads the messages: don't build them
+        state = play_game(GameState(derive_seed(master_seed, "game", seed), NULL_SINK), max_days)
+        stats = state.stats
+        if stats.hydras_slain:
+            wins += 1
+            # play_game ends the day the Hydra falls, so it died yesterday
+            kill_days += state.turn_count - 1
+        gold_spent += stats.gold_spent
+        starvation_days += stats.starvation_days
+        quests_succeeded += stats.quests_succeeded
+        quests_failed += stats.quests_failed
+
+    games = len(seeds)
+    quests = quests_succeeded + quests_failed
+    return {
+        "config": config_index,
+        "overrides": overrides,
+        "games": games,
+        "hydra_kills": wins,
+        "avg_days_to_kill": kill_days / wins if wins else None,
+        "avg_gold_spent": gold_spent / games,
+        "avg_starvation_days": starvation_days / games,
+        "quest_success_rate": quests_succeeded / quests if quests else 0.0,
+    }
+
+def run_sweep(configs, seeds=100, processes=None, chunksize=1, max_days=MAX_DAYS, master_seed=0):
+    """
+    Play `seeds` games (seeds 0..seeds-1, or pass your own list) for each
+    configuration; each game's RNG is derived from master_seed and its
+    seed. Yields one result dict per configuration as soon as it finishes,
+    so results come back out of order; use result["config"] to match them
+    up. processes=1 runs everything in this process, and puts the balance
+    tables back as they were once the sweep finishes, fails or is closed
+    early (e.g. by breaking out of a for loop over it).
+    """
+    if isinstance(seeds, int):
+        seeds = list(range(seeds))
+    tasks = [(i, overrides, seeds, max_days, master_seed) for i, overrides in enumerate(configs)]
+    for overrides in configs:
+        for key in overrides:
+            check_override_key(key)
+
+    if processes == 1:
+        saved = hydragame.BUILDING_INFO, hydragame.HERO_XP_TABLE, hydragame.HERO_MAX_LEVEL
+        try:
+            for task in tasks:
+                yield run_config(task)
+        finally:
+            # Put the real tables back
+            hydragame.BUILDING_INFO, hydragame.HERO_XP_TABLE, hydragame.HERO_MAX_LEVEL = saved
+        return
+
+    with Pool(processes or os.cpu_count()) as pool:
+        for result in pool.imap_unordered(run_config, tasks, chunksize):
+            yield result
+
+# -------------------------------------------------------------------
+# COMMAND LINE
+# -------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay headless games across balance settings.")
+    parser.add_argument("--grid", help="JSON file of {setting: [values, ...]} to take every combination of")
+    parser.add_argument("--random", type=int, default=0, help="number of random configurations to add")
+    parser.add_argument("--spread", type=float, default=0.5, help="how far random configurations stray from the defaults")
+    parser.add_argument("--seeds", type=int, default=100, help="games per configuration")
+    parser.add_argument("--master-seed", type=int, default=0, help="seed every game's RNG is derived from")
+    parser.add_argument("--max-days", type=int, default=MAX_DAYS, help="give up on a game after this many days")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: every core)")
+    parser.add_argument("--chunksize", type=int, default=1, help="configurations handed to a worker at a time")
+    parser.add_argument("--out", help="write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    configs = []
+    if args.grid:
+        with open(args.grid) as f:
+            configs.extend(grid(json.load(f)))
+    if args.random:
+        configs.extend(random_configs(args.random, spread=args.spread))
+    if not configs:
+        configs.append({})  # Just the current balance
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        for result in run_sweep(configs, args.seeds, args.processes, args.chunksize,
+                                args.max_days, args.master_seed):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
+import ast
+import hashlib
+import heapq
+import json
+import marshal
 import random
 import sys
 import os
+import time
+from bisect import bisect_left
+from collections import deque
 
 # -------------------------------------------------------------------
 # GLOBALS & DATA
@@ -8,7 +16,9 @@ import os
 
 # We'll store any "action messages" that result from the player's
 # last action (like building, recruiting, quest results, etc.).
-last_action_messages = []
+# Only the latest MESSAGE_LIMIT are kept, so a long battle can't pile up.
+MESSAGE_LIMIT = 100
+last_action_messages = deque(maxlen=MESSAGE_LIMIT)
 
 last_quest_data = {
     "quest_name": None,
@@ -112,7 +122,7 @@ RECENT_EVENTS_MAX = 3
 # GOD / GODDESS SYSTEM
 # -------------------------------------------------------------------
 """
-We define 4 possible deities. Each one has:
+We define 4 possible deities (GODS, loaded from content.json). Each one has:
 - 'key': an internal identifier
 - 'base_name': e.g. "God of the Feast" (we'll coin-flip to 'Goddess' at runtime)
 - 'bonus_info': short description of the deity's perks
@@ -122,33 +132,6 @@ We'll keep it simple for the skeleton code:
 They activate once the Temple is built (Temple >= 1).
 """
 
-GODS = [
-    {
-        "key": "feast",
-        "base_name": "God of the Feast",
-        "bonus_info": "+1 quest/day, faster hero XP",
-        "penalty_info": "Heroes consume 50% more Food daily",
-    },
-    {
-        "key": "harvest",
-        "base_name": "God of the Harvest",
-        "bonus_info": "+50% Farm production",
-        "penalty_info": "No major downside (for now)",
-    },
-    {
-        "key": "hunt",
-        "base_name": "God of the Hunt",
-        "bonus_info": "Special hunting quest for extra Food & XP",
-        "penalty_info": "Could add some mild penalty if desired",
-    },
-    {
-        "key": "tides",
-        "base_name": "God of the Tides",
-        "bonus_info": "Special seafaring quest (Gold/Arcane gain)",
-        "penalty_info": "No direct penalty for now",
-    },
-]
-
 # Which deity the player is currently pledged to
 current_god = None  # Will be set to one of GODS[] after day 25
 
@@ -234,55 +217,60 @@ def apply_god_bonuses():
 # -------------------------------------------------------------------
 # CONFIG
 # -------------------------------------------------------------------
-BUILDING_INFO = {
-    "Town Center": {
-        "max_level": 3,
-        "upgrade_costs": [(0, 0, 0), (100, 50, 10), (300, 100, 25)],
-    },
-    "Farm": {
-        "max_level": 3,
-        "upgrade_costs": [(50, 0, 0), (150, 0, 0), (300, 0, 0)],
-        "food_production": [0, 3, 6, 10],
-    },
-    "Arcane Tower": {
-        "max_level": 3,
-        "upgrade_costs": [(75, 10, 0), (200, 20, 0), (400, 50, 0)],
-        "arcane_production": [0, 1, 3, 7],
-    },
-    "Barracks": {
-        "max_level": 3,
-        "upgrade_costs": [(100, 20, 0), (250, 50, 0), (500, 80, 0)],
-    },
-    "Trading Hall": {
-        "max_level": 3,
-        "upgrade_costs": [(100, 0, 0), (300, 0, 0), (600, 0, 0)],
-        "gold_production": [0, 5, 15, 50],
-    },
-    "Blacksmith": {
-        "max_level": 3,
-        "upgrade_costs": [(80, 20, 0), (200, 50, 10), (500, 100, 25)],
-    },
-    "Temple": {
-        # Allows receiving a chosen god's bonus once built
-        "max_level": 1,
-        "upgrade_costs": [(200, 50, 10)],  # cost to build it to Lv1
-    },
-}
-
-HERO_XP_TABLE = [10, 20, 40, 70, 110]
-HERO_MAX_LEVEL = len(HERO_XP_TABLE)
+# BUILDING_INFO, HERO_XP_TABLE and HERO_MAX_LEVEL come from content.json,
+# see CONTENT near the bottom.
 
 # -------------------------------------------------------------------
 # UTILITY & DISPLAY
 # -------------------------------------------------------------------
 def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    # ANSI escapes: wipe the screen and home the cursor, no subprocess needed
+    sys.stdout.write("\033[2J\033[H")
+    sys.stdout.flush()
+
+def weighted_choice(options):
+    """Pick from a list of (item, weight) pairs, odds in proportion to weight. None if empty."""
+    if not options:
+        return None
+    total_weight = sum(w for (_, w) in options)
+    r = random.uniform(0, total_weight)
+    cumulative = 0
+    for (item, weight) in options:
+        cumulative += weight
+        if r <= cumulative:
+            return item
+    return None
+
+# Hero totals get worked out once and reused until a hero levels up,
+# joins or learns a skill. Whatever changes those calls heroes_changed().
+hero_totals = None
+
+def heroes_changed():
+    global hero_totals
+    hero_totals = None
+
+def get_hero_totals():
+    global hero_totals
+    if hero_totals is None:
+        power = {}
+        active = []
+        total_levels = 0
+        for hclass, h in heroes.items():
+            power[hclass] = h["level"] * 10 + sum(h["skills"].values()) * 3
+            if h["level"] > 0:
+                active.append(hclass)
+                total_levels += h["level"]
+        hero_totals = {
+            "power": power,
+            "total_power": sum(power[h] for h in active),
+            "total_levels": total_levels,
+            "daily_food_need": total_levels * 5,
+            "active": active,
+        }
+    return hero_totals
 
 def get_hero_combat_power(hero_class):
-    h = heroes[hero_class]
-    base_power = h["level"] * 10
-    skill_bonus = sum(h["skills"].values()) * 3
-    return base_power + skill_bonus
+    return get_hero_totals()["power"][hero_class]
 
 def get_hero_level(hero_class):
     return heroes[hero_class]["level"]
@@ -303,12 +291,12 @@ def make_multi_column_status():
 
     right_lines = []
     right_lines.append("HEROES:")
-    for hclass, data in heroes.items():
-        if data["level"] > 0:
-            cpower = get_hero_combat_power(hclass)
-            right_lines.append(
-                f"  {hclass}: Lv {data['level']}, XP {data['xp']} (Pow {cpower})"
-            )
+    totals = get_hero_totals()
+    for hclass in totals["active"]:
+        data = heroes[hclass]
+        right_lines.append(
+            f"  {hclass}: Lv {data['level']}, XP {data['xp']} (Pow {totals['power'][hclass]})"
+        )
     right_lines.append("")
     right_lines.append("HYDRA PROGRESS:")
     right_lines.append(f"  Located?  {hydra_progress['located']}")
@@ -335,16 +323,17 @@ def make_multi_column_status():
     return "\n".join(combined_lines)
 
 def show_status_and_messages():
-    clear_screen()
-    status_text = make_multi_column_status()
-    print(status_text)
-    print("\n" + "="*72 + "\n")
-    if last_action_messages:
-        print("MESSAGES:")
-        for msg in last_action_messages:
-            print(f" - {msg}")
-        print("")
-    print("="*72)
+    with timed("render"):
+        # Build the whole frame first so it goes out in one write
+        lines = [make_multi_column_status(), "", "="*72, ""]
+        if last_action_messages:
+            lines.append("MESSAGES:")
+            for msg in last_action_messages:
+                lines.append(f" - {msg}")
+            lines.append("")
+        lines.append("="*72)
+        sys.stdout.write("\033[2J\033[H" + "\n".join(lines) + "\n")
+        sys.stdout.flush()
 
 def add_message(msg):
     last_action_messages.append(msg)
@@ -352,6 +341,107 @@ def add_message(msg):
 def reset_messages():
     last_action_messages.clear()
 
+# -------------------------------------------------------------------
+# TIMINGS
+# -------------------------------------------------------------------
+# Opt-in stopwatch for the phases of a day (production, food, god
+# bonuses, random events, citizen requests, drawing the screen) and for
+# quests and battles, to find out what makes a day feel slow:
+#
+#   debug timings on / off     start or stop recording
+#   debug timings              show calls, total and percentiles per phase
+#   debug timings dump FILE    write the same numbers to FILE as JSON
+#
+# While off, timed() hands back one shared do-nothing context manager,
+# so the hooks cost about as much as a function call. Anything that can
+# prompt (citizen requests, some events, picking a quest hero) includes
+# the player's think time.
+
+timings_enabled = False
+phase_timings = {}  # phase name => list of durations in nanoseconds
+
+class PhaseTimer():
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc):
+        phase_timings.setdefault(self.name, []).append(time.perf_counter_ns() - self.start)
+
+class NoTimer():
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+NO_TIMER = NoTimer()
+
+def timed(name):
+    """with timed("phase"): ... records how long the block took, if timings are on."""
+    if not timings_enabled:
+        return NO_TIMER
+    return PhaseTimer(name)
+
+def timed_function(name):
+    """Decorator version of timed() for whole functions."""
+    def decorate(func):
+        def wrapper(*args, **kwargs):
+            if not timings_enabled:
+                return func(*args, **kwargs)
+            with PhaseTimer(name):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorate
+
+def timings_report():
+    """Per-phase calls, total ms and mean/p50/p90/p99/max in microseconds."""
+    report = {}
+    for name, samples in phase_timings.items():
+        ordered = sorted(samples)
+        pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] / 1000
+        report[name] = {
+            "calls": len(ordered),
+            "total_ms": sum(ordered) / 1e6,
+            "mean_us": sum(ordered) / len(ordered) / 1000,
+            "p50_us": pick(50),
+            "p90_us": pick(90),
+            "p99_us": pick(99),
+            "max_us": ordered[-1] / 1000,
+        }
+    return report
+
+def timings_command(args):
+    """Handle 'debug timings [on|off|dump FILE]' from the main menu."""
+    global timings_enabled
+    command = args[0].lower() if args else None
+    if command == "on":
+        timings_enabled = True
+        add_message("Phase timings on.")
+    elif command == "off":
+        timings_enabled = False
+        add_message("Phase timings off.")
+    elif command == "dump":
+        path = args[1] if len(args) > 1 else "timings.json"
+        try:
+            with open(path, "w") as f:
+                json.dump(timings_report(), f, indent=2)
+        except OSError as e:
+            add_message(f"Couldn't write the timings to {path}: {e.strerror or e}.")
+        else:
+            add_message(f"Phase timings written to {path}.")
+    elif not phase_timings:
+        add_message("No timings yet. 'debug timings on' starts recording.")
+    else:
+        add_message(f"{'phase':<18}{'calls':>7}{'total ms':>10}{'p50 us':>9}{'p90 us':>9}{'p99 us':>9}")
+        for name, r in timings_report().items():
+            add_message(f"{name:<18}{r['calls']:>7}{r['total_ms']:>10.2f}"
+                        f"{r['p50_us']:>9.1f}{r['p90_us']:>9.1f}{r['p99_us']:>9.1f}")
+
 # -------------------------------------------------------------------
 # RANDOM EVENTS
 # -------------------------------------------------------------------
@@ -446,76 +536,75 @@ def event_royal_inspector():
         resources["Gold"] += gold_gain
         add_message(f"The inspector was impressed by your kingdom's development! You gained {gold_gain} Gold.")
 
-EVENTS = [
-    {
-        "name": "wandering_merchant",
-        "function": wandering_merchant,
-        "base_weight": 10,
-        "repeat_block": 1,
-        "condition": lambda: True,
-        "weight_modifier": lambda: 0
-    },
-    {
-        "name": "wayward_adventurer",
-        "function": wayward_adventurer,
-        "base_weight": 8,
-        "repeat_block": 2,
-        "condition": lambda: True,
-        "weight_modifier": lambda: 0
-    },
-    {
-        "name": "investor_visit",
-        "function": investor_visit,
-        "base_weight": 5,
-        "repeat_block": 2,
-        "condition": lambda: buildings["Trading Hall"] >= 2,
-        "weight_modifier": lambda: 0
-    },
-    {
-        "name": "farm_bumper_crop",
-        "function": event_farm_bumper_crop,
-        "base_weight": 7,
-        "repeat_block": 2,
-        "condition": lambda: buildings["Farm"] > 0,
-        "weight_modifier": lambda: buildings["Farm"] * 3
-    },
-    {
-        "name": "arcane_experiment",
-        "function": event_arcane_experiment,
-        "base_weight": 6,
-        "repeat_block": 1,
-        "condition": lambda: buildings["Arcane Tower"] > 0,
-        "weight_modifier": lambda: buildings["Arcane Tower"] * 2
-    },
-    {
-        "name": "local_festival",
-        "function": event_local_festival,
-        "base_weight": 8,
-        "repeat_block": 1,
-        "condition": lambda: True,
-        "weight_modifier": lambda: turn_count // 5
-    },
-    {
-        "name": "royal_inspector",
-        "function": event_royal_inspector,
-        "base_weight": 3,
-        "repeat_block": 2,
-        "condition": lambda: True,
-        "weight_modifier": lambda: 0
-    },
-]
-
 # CITIZEN REQUESTS ---------------
-def check_citizen_requests():
+# Citizens will wait a few days for an answer (a request's "expires_after"
+# in content.json, else REQUEST_EXPIRY_DAYS). A request function returns
+# DECIDE_LATER when the player wants to sleep on it.
+REQUEST_EXPIRY_DAYS = 3
+DECIDE_LATER = "later"
+
+# Requests waiting on an answer, as a heap of (due_day, seq, name), plus
+# name => last day they'll wait. Each night only pops what's due, so it
+# doesn't matter how many request types content.json has.
+pending_requests = []
+request_deadlines = {}
+request_seq = 0
+
+def due_citizen_request():
+    """Pop the next deferred request due tonight (dropping lapsed ones), or None."""
+    while pending_requests and pending_requests[0][0] <= turn_count:
+        _, _, name = heapq.heappop(pending_requests)
+        req = CITIZEN_REQUEST_INDEX[name]
+        if turn_count > request_deadlines[name] or not req["condition"]():
+            del request_deadlines[name]
+            add_message(f"Nobody answered them, so the {req['title']} request was dropped.")
+            continue
+        return req
+    return None
+
+def roll_citizen_request():
+    """Tonight's citizen request: a deferred one that's due, else maybe a new one. Returns its CITIZEN_REQUESTS entry, or None."""
+    global is_Surplus_Food
+    is_Surplus_Food = check_if_surplus_food()
+
+    request = due_citizen_request()
+    if request is not None:
+        return request
+
     roll = random.randint(1, 100)
     if roll > 40:
-        return  # no request today
-    
-    is_Surplus_Food = check_if_surplus_food()
+        return None  # no request today
 
+    _, possible_requests, cumulative = get_citizen_request_table()
+    if not possible_requests:
+        return None  # Nobody has anything to ask
+
+    # Weighted random choice: first request whose cumulative weight >= r
+    r = random.uniform(0, cumulative[-1])
+    request = possible_requests[bisect_left(cumulative, r)]
+    request_deadlines[request["name"]] = turn_count + request.get("expires_after", REQUEST_EXPIRY_DAYS)
+    return request
+
+# (key, possible_requests, cumulative_weights) from the last roll. Request
+# conditions and weights only look at building levels and is_Surplus_Food,
+# so the table is only rebuilt when one of those changes, or when a
+# request starts or stops waiting on an answer.
+citizen_request_table = None
+
+def get_citizen_request_table():
+    """Returns (key, possible_requests, cumulative_weights) for tonight."""
+    global citizen_request_table
+    key = (tuple(buildings.values()), is_Surplus_Food, frozenset(request_deadlines))
+    table = citizen_request_table
+    if table is not None and table[0] == key:
+        return table
 
     possible_requests = []
+    cumulative = []
+    total_weight = 0
     for req in CITIZEN_REQUESTS:
+        if req["name"] in request_deadlines:
+            continue  # Already waiting on an answer
         # Condition check
         if not req["condition"]():
             continue  # Skip if condition is false
@@ -525,21 +614,45 @@ def check_citizen_requests():
         if final_weight <= 0:
             continue  # Skip if weight is zero or less
 
-        # Add to possible requests
-        possible_requests.append((req, final_weight))
+        total_weight += final_weight
+        possible_requests.append(req)
+        cumulative.append(total_weight)
 
-    if not possible_requests:
-        return  # No eligible events
-    # % chance
+    table = (key, possible_requests, cumulative)
+    citizen_request_table = table
+    return table
+
+def answer_citizen_request(request):
+    """Put a request to the player. "Decide later" brings it back tomorrow."""
+    global request_seq
+    name = request["name"]
+    if request["function"]() != DECIDE_LATER:
+        request_deadlines.pop(name, None)
+        return
+    days_left = request_deadlines[name] - turn_count
+    if days_left <= 0:
+        del request_deadlines[name]
+        add_message(f"The {request['title']} request won't wait any longer, so it was dropped.")
+        return
+    request_seq += 1
+    heapq.heappush(pending_requests, (turn_count + 1, request_seq, name))
+    add_message(f"The {request['title']} request can wait {days_left} more day(s) for an answer.")
+
+def check_citizen_requests():
+    """Put tonight's citizen request (if any) to the player. Returns True if there was one."""
+    request = roll_citizen_request()
+    if request is None:
+        return False
+    answer_citizen_request(request)
+    return True
 
     # Example condition: If you have a large surplus of Food (15x daily usage),
     # and Trading Hall >= 1, farmers want to sell extra food.
 
 def check_if_surplus_food():
-    total_hero_levels = sum(h["level"] for h in heroes.values())
-    daily_food_need = total_hero_levels * 5
+    daily_food_need = get_hero_totals()["daily_food_need"]
     if daily_food_need <= 0:
-        return  # no heroes, no request
+        return False  # no heroes, no request
 
     # e.g., if you have at least 10x the daily requirement:
     surplus_threshold = daily_food_need * 10
@@ -551,8 +664,7 @@ def check_if_surplus_food():
         return False
 
 def request_surplus_food():
-    total_hero_levels = sum(h["level"] for h in heroes.values())
-    daily_food_need = total_hero_levels * 5
+    daily_food_need = get_hero_totals()["daily_food_need"]
     if daily_food_need <= 0:
         return  # no heroes, no request
 
@@ -567,7 +679,10 @@ def request_surplus_food():
         print(f"\nThey propose selling {sell_surplus_offer} surplus Food for {sell_surplus_offer * 10} Gold.")
         print(" (1) Approve the sale")
         print(" (2) Deny the request")
+        print(" (3) Decide later")
         choice = input("Enter choice: ").lower()
+        if choice == '3':
+            return DECIDE_LATER
         if choice == '1':
             if resources["Food"] >= sell_surplus_offer:
                 resources["Food"] -= sell_surplus_offer
@@ -586,7 +701,10 @@ def request_arts_district():
     print(f"\nThey are asking for {requested_gold} Gold for {random.choice(purpose)}.")
     print(" (1) Fund the request")
     print(" (2) Deny the request")
+    print(" (3) Decide later")
     choice = input("Enter choice: ").lower()
+    if choice == '3':
+        return DECIDE_LATER
     if choice == '1':
         if resources["Gold"] >= requested_gold:
             resources["Gold"] -= requested_gold
@@ -601,56 +719,30 @@ def request_arts_district():
 is_Surplus_Food = False
 hydra_Slain = False
 
-
-
-CITIZEN_REQUESTS = [
-    {
-        "name": "surplus_food",
-        "function": request_surplus_food,
-        "base_weight": 10,         # Higher = more likely
-        "condition": lambda: is_Surplus_Food and buildings["Trading Hall"] >= 1,
-        "weight_modifier": lambda: 0  # No dynamic changes
-    },
-    {
-        "name": "arts_district",
-        "function": request_arts_district,
-        "base_weight": 10,
-        "condition": lambda: buildings["Town Center"] >= 2, # Requires Lv2+ Town Center
-        "weight_modifier": lambda: 0
-    },
-]
 # -------------------------------------------------------------------
 # CORE GAME FUNCTIONS
 # -------------------------------------------------------------------
-def end_turn():
-    global quests_today
-    reset_messages()
-
-    # Resource production
-    f_level = buildings["Farm"]
+def daily_production():
+    """Today's (Food, Arcane, Gold) from the Farm, Arcane Tower and Trading Hall."""
     farm_output = 0
+    f_level = buildings["Farm"]
     if f_level > 0:
         # If current_god = "harvest" and Temple is built => +50% farm
         if current_god and current_god["key"] == "harvest" and buildings["Temple"] >= 1:
             farm_output = int(BUILDING_INFO["Farm"]["food_production"][f_level] * 1.5)
         else:
             farm_output = BUILDING_INFO["Farm"]["food_production"][f_level]
-        resources["Food"] += farm_output
 
     t_level = buildings["Arcane Tower"]
-    if t_level > 0:
-        arcane_gain = BUILDING_INFO["Arcane Tower"]["arcane_production"][t_level]
-        resources["Arcane"] += arcane_gain
-        Stats.arcane_made += arcane_gain
+    arcane_gain = BUILDING_INFO["Arcane Tower"]["arcane_production"][t_level] if t_level > 0 else 0
 
     h_level = buildings["Trading Hall"]
-    if h_level > 0:
-        gold_gain = BUILDING_INFO["Trading Hall"]["gold_production"][h_level]
-        resources["Gold"] += gold_gain
+    gold_gain = BUILDING_INFO["Trading Hall"]["gold_production"][h_level] if h_level > 0 else 0
+    return farm_output, arcane_gain, gold_gain
 
-    # Daily food consumption
-    total_hero_levels = sum(h["level"] for h in heroes.values())
-    base_food_ate = total_hero_levels * 5
+def feed_heroes(farm_output):
+    """The heroes eat for the day. Returns True if there wasn't enough food."""
+    base_food_ate = get_hero_totals()["daily_food_need"]
     # If "feast" god with Temple => +50% consumption
     if current_god and current_god["key"] == "feast" and buildings["Temple"] >= 1:
         base_food_ate = int(base_food_ate * 1.5)
@@ -665,22 +757,107 @@ def end_turn():
         for hclass, data in heroes.items():
             if data["level"] > 0:
                 heroes[hclass]["xp"] = max(0, heroes[hclass]["xp"] - 1)
-    else:
-        resources["Food"] -= food_ate
-        Stats.food_eaten += food_ate
-        add_message(f"Your Heroes ate {food_ate} food.")
-        if farm_output > 0:
-            add_message(f"Your Farms produced {farm_output} Food today.")
+        return True
+    resources["Food"] -= food_ate
+    Stats.food_eaten += food_ate
+    add_message(f"Your Heroes ate {food_ate} food.")
+    if farm_output > 0:
+        add_message(f"Your Farms produced {farm_output} Food today.")
+    return False
+
+def end_turn():
+    global quests_today
+    reset_messages()
+
+    # Resource production
+    with timed("production"):
+        farm_output, arcane_gain, gold_gain = daily_production()
+        resources["Food"] += farm_output
+        resources["Arcane"] += arcane_gain
+        Stats.arcane_made += arcane_gain
+        resources["Gold"] += gold_gain
+
+    # Daily food consumption
+    with timed("food"):
+        feed_heroes(farm_output)
 
     # Quests reset
     quests_today = 0
 
     # After resource consumption, apply daily god-based changes
-    apply_god_bonuses()
+    with timed("god_bonuses"):
+        apply_god_bonuses()
 
     # Then do random events
     day_transition()
 
+def fast_forward(days):
+    """
+    End up to `days` days in a row with a single screen at the end instead
+    of one per day. Nothing gets built meanwhile, so the Arcane Tower and
+    Trading Hall make the same every day and their output is added in one
+    lump; only food (production, jitter, hunger), the nightly event roll
+    and citizen requests are played day by day. Stops early after a day
+    with a random event, a citizen request or hungry heroes, and right
+    before Day 25's deity choice.
+    """
+    global quests_today
+    start_day = turn_count
+    start_resources = dict(resources)
+    farm_output, arcane_gain, gold_gain = daily_production()
+    unpaid_days = 0  # days of Gold/Arcane not added yet
+    reason = None
+    days_done = 0
+    while days_done < days:
+        days_done += 1
+        reset_messages()
+        with timed("production"):
+            resources["Food"] += farm_output
+            unpaid_days += 1
+        with timed("food"):
+            starved = feed_heroes(farm_output)
+        quests_today = 0
+        with timed("god_bonuses"):
+            apply_god_bonuses()
+
+        with timed("random_events"):
+            event = roll_random_event()
+        request = None
+        if event is None:
+            with timed("citizen_requests"):
+                request = roll_citizen_request()
+        if event or request or starved:
+            # Something needs the real numbers (and maybe the player)
+            clear_screen()
+            resources["Gold"] += gold_gain * unpaid_days
+            resources["Arcane"] += arcane_gain * unpaid_days
+            Stats.arcane_made += arcane_gain * unpaid_days
+            unpaid_days = 0
+            if event:
+                run_random_event(event)
+                reason = "a random event"
+            elif request:
+                answer_citizen_request(request)
+                reason = "a citizen request"
+            else:
+                reason = "your heroes went hungry"
+
+        if reason or days_done == days or (turn_count + 1 == 25 and current_god is None):
+            break
+        start_next_day()
+
+    resources["Gold"] += gold_gain * unpaid_days
+    resources["Arcane"] += arcane_gain * unpaid_days
+    Stats.arcane_made += arcane_gain * unpaid_days
+    changes = ", ".join(f"{r} {resources[r] - start_resources[r]:+}" for r in resources)
+    add_message(f"Fast-forwarded {days_done} day(s), Day {start_day} to Day {turn_count}: {changes}.")
+    if reason:
+        add_message(f"Stopped early: {reason}.")
+    elif days_done < days:
+        add_message("Stopped early: a deity is calling.")
+    clear_screen()
+    show_end_of_day()
+    start_next_day()
 
 def build_or_upgrade():
     reset_messages()
@@ -742,7 +919,7 @@ def build_or_upgrade():
 def recruit_or_train_hero():
     reset_messages()
     add_message("You chose: Recruit/Train a hero")
-    current_heroes = sum(1 for hero in heroes if heroes[hero]["level"] > 0)
+    current_heroes = len(get_hero_totals()["active"])
     max_heroes = buildings["Town Center"]
 
     print("\nWhich hero to recruit or train?")
@@ -789,6 +966,7 @@ def recruit_or_train_hero():
             Stats.gold_spent += cost_g
             resources["Food"] -= cost_f
             heroes[hero_class]["level"] = 1
+            heroes_changed()
             add_message(f"Recruited a Level 1 {hero_class}!")
         else:
             add_message("Not enough resources to recruit!")
@@ -803,6 +981,7 @@ def recruit_or_train_hero():
         if current_xp >= needed_xp:
             heroes[hero_class]["xp"] -= needed_xp
             heroes[hero_class]["level"] += 1
+            heroes_changed()
             new_lvl = heroes[hero_class]["level"]
             add_message(f"{hero_class} advanced to Level {new_lvl}!")
             upgrade_hero_skill(hero_class)
@@ -829,6 +1008,7 @@ def upgrade_hero_skill(hero_class):
         if 0 <= idx < len(skill_names):
             selected_skill = skill_names[idx]
             skill_dict[selected_skill] += 1
+            heroes_changed()
             add_message(f"{hero_class}'s {selected_skill} is now Rank {skill_dict[selected_skill]}!")
         else:
             add_message("Invalid skill choice.")
@@ -837,22 +1017,6 @@ def upgrade_hero_skill(hero_class):
 
 
 # QUESTS -----------------------------------------------------------------
-def can_gather_resources():
-    return True
-
-def can_scout_hydra_location():
-    if hydra_progress["located"]:
-        return False
-    return any(hero["level"] >= 2 for hero in heroes.values())
-
-def can_build_hydra_access():
-    return hydra_progress["located"] and not hydra_progress["access"]
-
-def can_craft_hydra_slaying_gear():
-    if hydra_progress["gear"]:
-        return False
-    return buildings["Blacksmith"] >= 2
-
 def on_success_gather_resources(hero_class):
     lvl = get_hero_level(hero_class)
     gold_gain = random.randint(lvl * 10, lvl * 10 + 20)
@@ -902,9 +1066,6 @@ def on_success_craft_hydra_slaying_gear(hero_class):
     add_message(f"Dragonsteel gear forged! +{xp_gain} XP")
 
 # Generic "pray at temple" quest
-def can_pray_at_temple():
-    return (current_god is not None and buildings["Temple"] >= 1)
-
 def on_success_pray_at_temple(hero_class):
     xp_gain = 2
     if current_god and current_god["key"] == "feast":
@@ -919,9 +1080,6 @@ def on_success_pray_at_temple(hero_class):
     add_message(f"You prayed at the Temple. +{xp_gain} XP to {hero_class}.")
 
 # A "god_special_quest" that changes effect based on which god is active
-def can_god_special_quest():
-    return (current_god is not None and buildings["Temple"] >= 1)
-
 def on_success_god_special_quest(hero_class):
     god_key = current_god["key"] if current_god else None
     xp_gain = 4
@@ -953,46 +1111,6 @@ def on_success_god_special_quest(hero_class):
     Stats.xp_gained += xp_gain
 
 
-QUESTS = {
-    "gather_resources": {
-        "name": "Gather Resources",
-        "difficulty": 50,
-        "enabled": can_gather_resources,
-        "on_success": on_success_gather_resources
-    },
-    "scout_hydra_location": {
-        "name": "Scout Hydra Location",
-        "difficulty": 40,
-        "enabled": can_scout_hydra_location,
-        "on_success": on_success_scout_hydra_location
-    },
-    "build_hydra_access": {
-        "name": "Build Hydra Access Route",
-        "difficulty": 30,
-        "enabled": can_build_hydra_access,
-        "on_success": on_success_build_hydra_access
-    },
-    "craft_hydra_slaying_gear": {
-        "name": "Craft Hydra-Slaying Gear",
-        "difficulty": 20,
-        "enabled": can_craft_hydra_slaying_gear,
-        "on_success": on_success_craft_hydra_slaying_gear
-    },
-
-    "pray_at_temple": {
-        "name": "Pray at the Temple",
-        "difficulty": 10,
-        "enabled": can_pray_at_temple,
-        "on_success": on_success_pray_at_temple
-    },
-    "god_special_quest": {
-        "name": "God's Special Quest",
-        "difficulty": 40,
-        "enabled": can_god_special_quest,
-        "on_success": on_success_god_special_quest
-    },
-}
-
 def send_quest(repeat, quest_key=None, hero_class=None):
     global quests_per_day, quests_today
     reset_messages()
@@ -1008,34 +1126,41 @@ def send_quest(repeat, quest_key=None, hero_class=None):
         run_quest(quest_key, hero_class)
     else:
         add_message("You chose: Send heroes on a quest")
+        chosen_key = choose_quest()
+        if chosen_key:
+            run_quest(chosen_key, hero_class)
 
-        available_quests = [k for k, q in QUESTS.items() if q["enabled"]()]
+def choose_quest():
+    """Ask which of the available quests to go on. Returns its QUESTS key, or None."""
+    available_quests = [k for k, q in QUESTS.items() if q["enabled"]()]
 
-        if not available_quests:
-            add_message("No quests are currently available.")
-            return
+    if not available_quests:
+        add_message("No quests are currently available.")
+        return None
 
-        print("\nAvailable Quests:")
-        for i, k in enumerate(available_quests, 1):
-            print(f"({i}) {QUESTS[k]['name']}")
-        print("(q) Cancel")
+    print("\nAvailable Quests:")
+    for i, k in enumerate(available_quests, 1):
+        print(f"({i}) {QUESTS[k]['name']}")
+    print("(q) Cancel")
 
-        choice = input("Pick a quest: ").lower()
-        if choice == 'q':
-            add_message("Cancelled sending on a quest.")
-            return
+    choice = input("Pick a quest: ").lower()
+    if choice == 'q':
+        add_message("Cancelled sending on a quest.")
+        return None
 
-        try:
-            q_idx = int(choice) - 1
-            if q_idx < 0 or q_idx >= len(available_quests):
-                add_message("Invalid quest.")
-                return
-            chosen_key = available_quests[q_idx]
-            run_quest(chosen_key, hero_class)
-        except ValueError:
-            add_message("Invalid input for quest choice.")
+    try:
+        q_idx = int(choice) - 1
+        if q_idx < 0 or q_idx >= len(available_quests):
+            add_message("Invalid quest.")
+            return None
+        return available_quests[q_idx]
+    except ValueError:
+        add_message("Invalid input for quest choice.")
+        return None
 
+@timed_function("run_quest")
 def run_quest(quest_key, hero_class=None):
+    """Send a hero on a quest. Returns True/False for success/failure, None if nobody went."""
     global quests_today
     if quest_key not in QUESTS:
         add_message("Invalid quest key.")
@@ -1049,7 +1174,7 @@ def run_quest(quest_key, hero_class=None):
     quest_name = qdata["name"]
     difficulty = qdata["difficulty"]
 
-    active_heroes = [h for h,d in heroes.items() if d["level"] > 0]
+    active_heroes = get_hero_totals()["active"]
     if not active_heroes:
         add_message("No heroes available. Recruit someone first.")
         return
@@ -1090,18 +1215,106 @@ def run_quest(quest_key, hero_class=None):
         add_message(f"Success on '{quest_name}'! (roll {roll} <= {success_chance})")
         qdata["on_success"](hero_class)
         Stats.quests_succeeded += 1
+        success = True
     else:
         add_message(f"Failure on '{quest_name}' (roll {roll} > {success_chance}). +1 XP to {hero_class}.")
         heroes[hero_class]["xp"] += 1
         Stats.quests_failed += 1
         Stats.xp_gained += 1
+        success = False
 
     quests_today += 1
 
     if hydra_progress["located"] and hydra_progress["access"] and hydra_progress["gear"]:
         hydra_progress["fight_unlocked"] = True
         add_message("All prerequisites met! Final battle unlocked.")
+    return success
+
+def bulk_quest(quest_key, hero_classes, times=None):
+    """
+    Go on the same quest over and over, taking turns between hero_classes,
+    until the heroes are tired (or `times` quests are done), the quest
+    isn't available any more, or a Hydra flag gets set. All of it ends up
+    in one summary message instead of a screen per attempt.
+    """
+    reset_messages()
+    qdata = QUESTS.get(quest_key)
+    if qdata is None or not hero_classes:
+        add_message("Nothing to send.")
+        return
+
+    start_resources = dict(resources)
+    start_xp = {h: heroes[h]["xp"] for h in hero_classes}
+    start_flags = dict(hydra_progress)
+    results = {True: 0, False: 0}
+    reason = "the heroes are tired"
+    sent = 0
+    while quests_today < quests_per_day:
+        if times is not None and sent >= times:
+            reason = f"{times} quest(s) done"
+            break
+        if not qdata["enabled"]():
+            reason = "the quest isn't available any more"
+            break
+        success = run_quest(quest_key, hero_classes[sent % len(hero_classes)])
+        if success is None:
+            reason = "a hero couldn't go"
+            break
+        results[success] += 1
+        sent += 1
+        if hydra_progress != start_flags:
+            reason = "Hydra progress was made"
+            break
 
+    # Swap the play-by-play for the totals
+    reset_messages()
+    changes = ", ".join(f"{r} {resources[r] - start_resources[r]:+}" for r in resources
+                        if resources[r] != start_resources[r]) or "no resources"
+    xp = ", ".join(f"{h} {heroes[h]['xp'] - start_xp[h]:+} XP"
+                   for h in hero_classes)
+    add_message(f"Sent {sent} quest(s) on '{qdata['name']}': {results[True]} succeeded, {results[False]} failed.")
+    add_message(f"Gained {changes}; {xp}.")
+    for flag, done in hydra_progress.items():
+        if done and not start_flags[flag]:
+            add_message(f"Hydra progress: {flag.replace('_', ' ')}!")
+    add_message(f"Stopped because {reason}.")
+
+def bulk_quest_menu():
+    """Pick a quest, the heroes and how many times, then bulk_quest()."""
+    reset_messages()
+    if quests_today >= quests_per_day:
+        add_message("Heroes are tired for today. Wait until tomorrow (End Day).")
+        return
+    quest_key = choose_quest()
+    if quest_key is None:
+        return
+
+    active_heroes = get_hero_totals()["active"]
+    if not active_heroes:
+        add_message("No heroes available. Recruit someone first.")
+        return
+    hero_classes = active_heroes
+    if len(active_heroes) > 1:
+        print("\nWhich heroes should take turns going?")
+        for i, h in enumerate(active_heroes, 1):
+            print(f"({i}) {h} (Lv {heroes[h]['level']}, XP {heroes[h]['xp']})")
+        picks = input("Pick heroes, e.g. '1 3' (blank = everyone): ").split()
+        try:
+            hero_classes = [active_heroes[int(p) - 1] for p in picks if 0 < int(p) <= len(active_heroes)]
+        except ValueError:
+            hero_classes = []
+        if picks and not hero_classes:
+            add_message("Invalid hero choice.")
+            return
+        hero_classes = hero_classes or active_heroes
+
+    times = input(f"How many quests? (blank = until tired, {quests_per_day - quests_today} left today): ")
+    if times and not times.isdigit():
+        add_message("Invalid number of quests.")
+        return
+    bulk_quest(quest_key, hero_classes, int(times) if times else None)
+
+@timed_function("final_battle")
 def attempt_final_battle():
     reset_messages()
     add_message("You chose: Attempt final Hydra battle")
@@ -1109,7 +1322,7 @@ def attempt_final_battle():
         add_message("You haven't completed all Hydra prerequisites!")
         return
 
-    total_power = sum(get_hero_combat_power(h) for h in heroes if heroes[h]["level"] > 0)
+    total_power = get_hero_totals()["total_power"]
     if total_power == 0:
         add_message("No heroes available to fight!")
         return
@@ -1140,18 +1353,18 @@ def attempt_final_battle():
 
 def victory():
     add_message("Congratulations! The Hydra is slain, your kingdom is saved!")
-    add_message(Stats.__dict__)
+    add_message(str(Stats.__dict__))
 
 # -------------------------------------------------------------------
 # DAY TRANSITION & RANDOM EVENT HOOK
 # -------------------------------------------------------------------
-def random_events():
-    global recent_events
+def roll_random_event():
+    """Roll for tonight's random event. Returns its EVENTS entry, or None."""
     base_chance = 15 + (buildings["Town Center"] * 5)
     roll = random.randint(1,100)
     if roll > base_chance:
         add_message("Nothing eventful happened.")
-        return False
+        return None
 
     possible = []
     for evt in EVENTS:
@@ -1166,39 +1379,37 @@ def random_events():
             continue
         possible.append((evt, final_weight))
 
-    if not possible:
-        return False
-
-    total_weight = sum(w for (_,w) in possible)
-    r = random.uniform(0, total_weight)
-    cumulative = 0
-    chosen_event = None
-    for (evt, weight) in possible:
-        cumulative += weight
-        if r <= cumulative:
-            chosen_event = evt
-            break
-
-    if not chosen_event:
-        return False
+    return weighted_choice(possible)
 
+def run_random_event(chosen_event):
     chosen_event["function"]()
     recent_events.append(chosen_event["name"])
     if len(recent_events) > RECENT_EVENTS_MAX:
         recent_events.pop(0)
 
     Stats.random_events_held += 1
+
+def random_events():
+    chosen_event = roll_random_event()
+    if not chosen_event:
+        return False
+    run_random_event(chosen_event)
     return True
 
 def day_transition():
-    global turn_count
     clear_screen()
     add_message(f"At the end of Day {turn_count - 1}...")
 
-    event_happened = random_events()
+    with timed("random_events"):
+        event_happened = random_events()
     if not event_happened:
-        check_citizen_requests()
+        with timed("citizen_requests"):
+            check_citizen_requests()
 
+    show_end_of_day()
+    start_next_day()
+
+def show_end_of_day():
     total_char = 72 - int(len(f" END OF DAY {turn_count}: "))
     half_char = int(total_char/2)
     print("\n" + "="*half_char + f" END OF DAY {turn_count} " + "="*half_char + "\n")
@@ -1209,6 +1420,8 @@ def day_transition():
     print("="*72)
     input("Press enter to continue...")
 
+def start_next_day():
+    global turn_count
     reset_messages()
     turn_count += 1
     Stats.turn_count += 1
@@ -1238,6 +1451,7 @@ def main_menu():
             #print("(4) //Attempt the final Hydra battle (if ready)")
             pass
         print("(5) End Day (resource collection & random events)")
+        print("(f) Fast-forward several days")
         if (last_quest_data["quest_name"] and last_quest_data["hero_class"]
             and quests_per_day > quests_today):
             print("(r) Repeat last quest "
@@ -1245,6 +1459,8 @@ def main_menu():
         else:
             #print("(r) //Repeat last quest (unavailable)")
             pass
+        if quests_per_day > quests_today:
+            print("(b) Bulk quest (repeat a quest until the heroes are tired)")
         print("(6) View Stats")
         if current_god is None and turn_count > 25:
             print("(g) Choose a God/Goddess")  
@@ -1254,7 +1470,8 @@ def main_menu():
         print("(?) Ask the Oracle for Help")
         print("(q) Quit Game")
 
-        choice = input("Enter choice: ").lower()
+        entered = input("Enter choice: ")
+        choice = entered.lower()
         if choice == '1':
             build_or_upgrade()
         elif choice == '2':
@@ -1265,6 +1482,14 @@ def main_menu():
             attempt_final_battle()
         elif choice == '5':
             end_turn()
+        elif choice == 'f':
+            days = input("How many days? ")
+            if days.isdigit() and int(days) > 0:
+                fast_forward(int(days))
+            else:
+                add_message("Invalid number of days.")
+        elif choice == 'b':
+            bulk_quest_menu()
         elif choice == '6':
             display_stats()
         elif choice == 'r':
@@ -1295,6 +1520,9 @@ def main_menu():
                 sys.exit(0)
             else:
                 continue
+        elif choice.startswith("debug timings"):
+            # File names keep their case
+            timings_command(entered.split()[2:])
         elif "debug" in choice:
             parts = choice.split()
             if len(parts) > 1:
@@ -1398,6 +1626,134 @@ You can only follow one at a time.
 def display_stats():
     add_message(str(Stats.__dict__))
 
+# -------------------------------------------------------------------
+# CONTENT
+# -------------------------------------------------------------------
+# Buildings, the XP table, gods, events, citizen requests and quests live
+# in content.json so they can be tweaked without touching code. In there:
+# - "condition", "weight_modifier" and "enabled" are small Python
+#   expressions over the game state (CONTENT_STATE_NAMES) and a few
+#   builtins (CONTENT_BUILTINS). Left out, a condition is "True" and a
+#   weight modifier is "0".
+# - "function" and "on_success" name a function in this file.
+#
+# Every expression gets compiled once into a `lambda: <expr>` closure, so
+# checking one is as cheap as the hand-written lambdas were. A content
+# pack can't reach anything else in here: any other name (or a _private
+# attribute) is an error at load time, the state names get rewritten into
+# lookups of our live globals, and the closures run with no builtins.
+# Parsing and compiling a big content pack isn't free though, so the
+# compiled tables get marshalled into __pycache__, keyed by the sha256 of
+# content.json. Edit the file and the next start recompiles.
+
+CONTENT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content.json")
+CONTENT_CACHE = os.path.join(os.path.dirname(CONTENT_FILE), "__pycache__",
+                             f"content.{sys.implementation.cache_tag}.marshal")
+CONTENT_EXPRESSIONS = {"condition": "True", "weight_modifier": "0", "enabled": "True"}
+CONTENT_FUNCTIONS = ("function", "on_success")
+CONTENT_STATE_NAMES = ("buildings", "resources", "heroes", "hydra_progress",
+                       "turn_count", "current_god", "is_Surplus_Food")
+CONTENT_BUILTINS = {"any": any, "all": all, "len": len, "min": min, "max": max, "sum": sum, "abs": abs}
+# Bump when compile_content() changes what it produces, so old caches get rebuilt
+CONTENT_FORMAT = 2
+
+def compile_expression(source, filename):
+    """Compile one content expression into the code of a `lambda: (<source>)`, checking every name it uses."""
+    tree = ast.parse(f"lambda: ({source})", filename, "eval")
+    # Comprehension variables are the expression's own
+    local_names = {node.id for node in ast.walk(tree)
+                   if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+            raise ValueError(f"{filename}: can't use .{node.attr}")
+        if isinstance(node, ast.Name):
+            known = node.id in local_names or node.id in CONTENT_STATE_NAMES or node.id in CONTENT_BUILTINS
+            if not known or node.id.startswith("_"):
+                raise ValueError(f"{filename}: unknown name {node.id!r}")
+
+    class StateLookups(ast.NodeTransformer):
+        # buildings => _game["buildings"], read when the lambda runs
+        def visit_Name(self, node):
+            if node.id in CONTENT_STATE_NAMES and node.id not in local_names:
+                lookup = ast.Subscript(ast.Name("_game", ast.Load()), ast.Constant(node.id), ast.Load())
+                return ast.copy_location(lookup, node)
+            return node
+
+    tree = ast.fix_missing_locations(StateLookups().visit(tree))
+    return compile(tree, filename, "eval")
+
+def compile_content(content):
+    """Turn parsed content.json into marshal-able tables: expressions become code objects."""
+    def compile_entries(table, entries, fields):
+        for key, entry in entries:
+            for field in fields:
+                source = entry.get(field, CONTENT_EXPRESSIONS[field])
+                entry[field] = compile_expression(source, f"<content.json {table} {key} {field}>")
+
+    for data in content["buildings"].values():
+        data["upgrade_costs"] = [tuple(cost) for cost in data["upgrade_costs"]]
+    compile_entries("events", ((e["name"], e) for e in content["events"]),
+                    ("condition", "weight_modifier"))
+    compile_entries("citizen_requests", ((r["name"], r) for r in content["citizen_requests"]),
+                    ("condition", "weight_modifier"))
+    compile_entries("quests", content["quests"].items(), ("enabled",))
+    return content
+
+def read_content(path=CONTENT_FILE, cache_path=CONTENT_CACHE):
+    """Compiled content tables, from the cache if content.json hasn't changed."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw + bytes([CONTENT_FORMAT])).hexdigest()
+
+    try:
+        with open(cache_path, "rb") as f:
+            cached_digest, content = marshal.load(f)
+        if cached_digest == digest:
+            return content
+    except (OSError, EOFError, ValueError, TypeError):
+        pass  # No cache yet, or a broken one
+
+    content = compile_content(json.loads(raw))
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "wb") as f:
+            marshal.dump((digest, content), f)
+    except OSError:
+        pass  # Read-only install; we'll just compile every time
+    return content
+
+def load_content(path=CONTENT_FILE):
+    """(Re)load content.json into BUILDING_INFO, HERO_XP_TABLE, GODS, EVENTS, CITIZEN_REQUESTS and QUESTS."""
+    global BUILDING_INFO, HERO_XP_TABLE, HERO_MAX_LEVEL, GODS, EVENTS, QUESTS
+    global CITIZEN_REQUESTS, CITIZEN_REQUEST_INDEX, citizen_request_table
+    content = read_content(path)
+    # All a content expression gets to see
+    namespace = {"__builtins__": {}, "_game": globals(), **CONTENT_BUILTINS}
+
+    def link(entry):
+        for field in CONTENT_EXPRESSIONS:
+            if field in entry:
+                entry[field] = eval(entry[field], namespace)
+        for field in CONTENT_FUNCTIONS:
+            if field in entry:
+                func = globals().get(entry[field])
+                if not callable(func):
+                    raise ValueError(f"content.json: no function called {entry[field]!r}")
+                entry[field] = func
+        return entry
+
+    BUILDING_INFO = content["buildings"]
+    HERO_XP_TABLE = content["hero_xp_table"]
+    HERO_MAX_LEVEL = len(HERO_XP_TABLE)
+    GODS = content["gods"]
+    EVENTS = [link(evt) for evt in content["events"]]
+    CITIZEN_REQUESTS = [link(req) for req in content["citizen_requests"]]
+    CITIZEN_REQUEST_INDEX = {req["name"]: req for req in CITIZEN_REQUESTS}
+    citizen_request_table = None
+    QUESTS = {key: link(quest) for key, quest in content["quests"].items()}
+
+load_content()
+
 # -------------------------------------------------------------------
 # ENTRY POINT
 # -------------------------------------------------------------------
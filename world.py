@@ -0,0 +1,258 @@
+import argparse
+import random
+import time
+from collections import namedtuple
+
+import hydragame
+from hydragame import (
+    GameState, apply, EndDay, add_message, derive_seed, NULL_SINK,
+    GOLD, FOOD, ARCANE, TRADING_HALL,
+)
+from autoplay import take_turn
+
+"""
+SHARED WORLD
+------------
+
+Lots of kingdoms on one calendar, trading Food and Arcane for Gold.
+Every tick is one day for everybody:
+
+1. each kingdom still after its Hydra takes its turn with the autoplay
+   policy (kingdoms that already won just keep their economy running),
+2. every kingdom with a Trading Hall posts buy and sell orders,
+3. the market matches them,
+4. every kingdom ends its day, then hears what it bought and sold.
+
+It's the wandering merchant and the farmers' surplus Food sale turned
+into a real market: instead of one fixed price, whoever has too much
+sells to whoever is short, at a price set by both sides.
+
+The market is a call auction, run once a day per good. All of the day's
+bids get sorted high to low and the asks low to high, then both lists
+are walked from the top until they stop crossing. Everything that trades
+goes at one clearing price, halfway between the last bid and ask that
+matched, so nobody pays more than their bid or gets less than their ask,
+and it doesn't matter who posted first. That's one sort per good per day,
+so most of a tick is the kingdoms' own turns and day ends; main() prints
+the average tick time for the run.
+
+Orders only last the day they're posted, and the Trading Hall's level
+caps how much a kingdom can move in a day (MARKET_LOTS). Trades don't go
+through apply(), so a Journal on a world kingdom won't replay them.
+
+    python world.py --kingdoms 1000 --days 120
+"""
+
+# Goods on the market => resource index and a rough fair price in Gold
+# (the wandering merchant pays 3 Gold for a Food)
+MARKET_GOODS = {
+    "Food": (FOOD, 3),
+    "Arcane": (ARCANE, 10),
+}
+
+# Trading Hall level => most units of each good a kingdom can buy or sell a day
+MARKET_LOTS = [0, 25, 75, 250]
+
+# Kingdoms keep this many days of their heroes' food, and sell past 3x that
+FOOD_RESERVE_DAYS = 5
+
+# Arcane kept on top of what the priciest next upgrade needs
+ARCANE_SPARE = 20
+
+# One day's trading in one good
+MarketDay = namedtuple("MarketDay", ["day", "good", "price", "volume", "bids", "asks"])
+
+# -------------------------------------------------------------------
+# MARKET
+# -------------------------------------------------------------------
+
+def match_orders(bids, asks):
+    """
+    Batch-match one good's orders for the day. bids are (-price, seq,
+    kingdom, qty) and asks (price, seq, kingdom, qty), so a plain sort puts
+    the best ones first and breaks ties by posting order. Both lists get
+    sorted in place.
+
+    Returns (price, fills), fills being a list of (buyer, seller, qty),
+    or (None, []) when no bid reaches any ask.
+    """
+    bids.sort()
+    asks.sort()
+    fills = []
+    i = j = 0
+    bid_left = ask_left = 0
+    while True:
+        if not bid_left:
+            if i == len(bids):
+                break
+            neg_bid, _, buyer, bid_left = bids[i]
+            i += 1
+        if not ask_left:
+            if j == len(asks):
+                break
+            ask, _, seller, ask_left = asks[j]
+            j += 1
+        if -neg_bid < ask:
+            break
+        qty = min(bid_left, ask_left)
+        fills.append((buyer, seller, qty))
+        bid_left -= qty
+        ask_left -= qty
+        last_bid, last_ask = -neg_bid, ask
+    if not fills:
+        return None, fills
+    return (last_bid + last_ask) // 2, fills
+
+def wanted_arcane(state):
+    """Arcane the priciest next building upgrade needs."""
+    levels = state.buildings.values()
+    wanted = 0
+    for i, bld_name in enumerate(hydragame.BUILDING_NAMES):
+        info = hydragame.BUILDING_INFO[bld_name]
+        if levels[i] < info["max_level"]:
+            wanted = max(wanted, info["upgrade_costs"][levels[i]][2])
+    return wanted
+
+def stock_targets(state):
+    """Good => (low, high): buy below low, sell above high."""
+    food_low = FOOD_RESERVE_DAYS * state.heroes.stats().food_need + 10
+    arcane_low = wanted_arcane(state)
+    return {
+        "Food": (food_low, 3 * food_low),
+        "Arcane": (arcane_low, arcane_low + ARCANE_SPARE),
+    }
+
+# -------------------------------------------------------------------
+# WORLD
+# -------------------------------------------------------------------
+
+class World():
+    """
+    `kingdoms` GameStates on one shared day, plus the market between them.
+    Every kingdom's seed is derived from `seed`, and so are the traders'
+    moods, so the same seed gives the same world.
+    """
+    def __init__(self, kingdoms=100, seed=0, sink=NULL_SINK):
+        self.seed = seed
+        self.day = 1
+        self.kingdoms = [GameState(derive_seed(seed, "kingdom", i), sink) for i in range(kingdoms)]
+        # How keen each trader is today; separate from the kingdoms' own dice
+        self.rng = random.Random(derive_seed(seed, "market"))
+        self.history = []
+        # (kingdom, "bought"/"sold", qty, good, price) not told yet
+        self.reports = []
+
+    def post_orders(self):
+        """Every Trading Hall kingdom's bids and asks: good => (bids, asks)."""
+        uniform = self.rng.uniform
+        book = {good: ([], []) for good in MARKET_GOODS}
+        seq = 0
+        for k, state in enumerate(self.kingdoms):
+            lot = MARKET_LOTS[state.buildings.values()[TRADING_HALL]]
+            if not lot:
+                continue
+            resources = state.resources.values()
+            budget = resources[GOLD]
+            for good, (low, high) in stock_targets(state).items():
+                index, fair_price = MARKET_GOODS[good]
+                stock = resources[index]
+                bids, asks = book[good]
+                seq += 1
+                if stock < low:
+                    # Short: happy to pay over the odds
+                    price = max(1, round(fair_price * uniform(1.0, 1.6)))
+                    qty = min(low - stock, lot, budget // price)
+                    if qty > 0:
+                        bids.append((-price, seq, k, qty))
+                        budget -= qty * price
+                elif stock > high:
+                    # Surplus: happy to take a bit less
+                    price = max(1, round(fair_price * uniform(0.5, 1.1)))
+                    asks.append((price, seq, k, min(stock - high, lot)))
+        return book
+
+    def trade(self):
+        """
+        Post, match and settle the day's orders for every good. The
+        kingdoms hear about their trades from report_trades().
+        """
+        kingdoms = self.kingdoms
+        reports = self.reports
+        for good, (bids, asks) in self.post_orders().items():
+            index = MARKET_GOODS[good][0]
+            price, fills = match_orders(bids, asks)
+            volume = 0
+            bought = {}
+            sold = {}
+            for buyer, seller, qty in fills:
+                cost = qty * price
+                buyer_res = kingdoms[buyer].resources.values()
+                seller_res = kingdoms[seller].resources.values()
+                buyer_res[GOLD] -= cost
+                buyer_res[index] += qty
+                seller_res[GOLD] += cost
+                seller_res[index] -= qty
+                bought[buyer] = bought.get(buyer, 0) + qty
+                sold[seller] = sold.get(seller, 0) + qty
+                volume += qty
+            reports += [(k, "bought", qty, good, price) for k, qty in bought.items()]
+            reports += [(k, "sold", qty, good, price) for k, qty in sold.items()]
+            self.history.append(MarketDay(self.day, good, price, volume, len(bids), len(asks)))
+
+    def report_trades(self):
+        """Tell each kingdom what it bought and sold since the last report."""
+        kingdoms = self.kingdoms
+        for k, verb, qty, good, price in self.reports:
+            add_message(kingdoms[k], "Market: {verb} {qty} {good} at {price} Gold each.", "market",
+                        verb=verb, qty=qty, good=good, price=price)
+        self.reports = []
+
+    def tick(self):
+        """One day for the whole world."""
+        for state in self.kingdoms:
+            if state.stats.hydras_slain == 0:
+                take_turn(state)
+        self.trade()
+        for state in self.kingdoms:
+            apply(state, EndDay())
+        # After the day ends: end_turn() starts each day's messages afresh
+        self.report_trades()
+        self.day += 1
+
+    def run(self, days):
+        for _ in range(days):
+            self.tick()
+        return self
+
+# -------------------------------------------------------------------
+# ENTRY POINT
+# -------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many kingdoms trading on one market.")
+    parser.add_argument("--kingdoms", type=int, default=1000, help="kingdoms in the world")
+    parser.add_argument("--days", type=int, default=100, help="days to run")
+    parser.add_argument("--seed", type=int, default=0, help="world seed")
+    parser.add_argument("--every", type=int, default=10, help="print a line every this many days")
+    args = parser.parse_args(argv)
+
+    world = World(args.kingdoms, args.seed)
+    print(f"{'day':>5}{'tick ms':>9}{'traders':>9}{'Food':>13}{'Arcane':>13}{'slain':>7}")
+    tick_times = []
+    for _ in range(args.days):
+        start = time.perf_counter()
+        world.tick()
+        tick_times.append(time.perf_counter() - start)
+        day = world.day - 1
+        if day % args.every and day != args.days:
+            continue
+        markets = {m.good: m for m in world.history[-len(MARKET_GOODS):]}
+        traders = sum(1 for s in world.kingdoms if s.buildings["Trading Hall"])
+        prices = "".join(
+            f"{(str(m.volume) + ' @ ' + str(m.price)) if m.price else '-':>13}" for m in markets.values())
+        slain = sum(1 for s in world.kingdoms if s.stats.hydras_slain)
+        print(f"{day:>5}{tick_times[-1] * 1000:>9.1f}{traders:>9}{prices}{slain:>7}")
+    print(f"\n{args.kingdoms} kingdoms: {sum(tick_times) / len(tick_times) * 1000:.1f} ms per tick on average")
+
+if __name__ == "__main__":
+    main()